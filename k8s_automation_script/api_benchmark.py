@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from tabulate import tabulate
+
+from defaults import DEFAULT_CHART_PATH
+
+DEFAULT_SIZES = "1,100,1000"
+DEFAULT_MAX_REGRESSION = 0.25 # Fraction a median may grow over the baseline before the run fails
+BENCH_NAMESPACE = "bench"
+
+# The deployment_utils functions the CLI and the daemon call, and their async_deployment_utils versions (_async)
+OPERATIONS = [
+    "create_keda_deployment",
+    "create_keda_deployment_async",
+    "create_keda_deployment_with_helm",
+    "get_deployment_health_status",
+    "get_deployment_health_status_async",
+    "get_fleet_health_status",
+    "get_cluster_summary",
+]
+
+# The same release settings as the create-deployment defaults
+RELEASE = dict(
+    image="nginx", tag="latest", cpu_request="100m", cpu_limit="200m", mem_request="128Mi", mem_limit="256Mi",
+    container_port=80, min_replicas=1, max_replicas=10, scaling_metric_type="cpu", scaling_metric_value="50",
+    event_source_config={},
+)
+
+
+async def _create_deployments(names: list, kubeconfig: str, concurrency: int):
+    from async_client_utils import AsyncClientContext
+    from async_deployment_utils import create_keda_deployment
+    limit = asyncio.Semaphore(concurrency)
+
+    async def create(name):
+        async with limit:
+            return await create_keda_deployment(name, BENCH_NAMESPACE, client_context=client_context, **RELEASE)
+
+    async with AsyncClientContext(config_file=kubeconfig, pool_size=concurrency) as client_context:
+        return await asyncio.gather(*(create(name) for name in names))
+
+
+async def _read_health(names: list, kubeconfig: str, concurrency: int):
+    from async_client_utils import AsyncClientContext
+    from async_deployment_utils import get_deployment_health_status
+    limit = asyncio.Semaphore(concurrency)
+
+    async def read(name):
+        async with limit:
+            return await get_deployment_health_status(name, BENCH_NAMESPACE, client_context=client_context)
+
+    async with AsyncClientContext(config_file=kubeconfig, pool_size=concurrency) as client_context:
+        return await asyncio.gather(*(read(name) for name in names))
+
+
+def run_operation(operation: str, size: int, run, kubeconfig: str, concurrency: int):
+    """Runs one operation over size objects; raises when any of them fails."""
+    from client_utils import ClientContext
+    names = [f"app-{index}" for index in range(size)]
+
+    if operation == "create_keda_deployment_async":
+        # New names on every run, so each one creates its objects rather than re-applying them
+        results = asyncio.run(_create_deployments([f"run{run}-{name}" for name in names], kubeconfig, concurrency))
+        failed = sum(1 for result in results if not result)
+    elif operation == "get_deployment_health_status_async":
+        results = asyncio.run(_read_health(names, kubeconfig, concurrency))
+        failed = sum(1 for result in results if not result)
+    else:
+        client_context = ClientContext(config_file=kubeconfig, pool_size=concurrency * 2)
+        try:
+            if operation == "create_keda_deployment":
+                from deployment_utils import create_keda_deployment
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = list(executor.map(
+                        lambda name: create_keda_deployment(
+                            f"run{run}-{name}", BENCH_NAMESPACE, client_context=client_context, **RELEASE
+                        ),
+                        names
+                    ))
+                failed = sum(1 for result in results if not result)
+            elif operation == "get_deployment_health_status":
+                from deployment_utils import get_deployment_health_status
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = list(executor.map(
+                        lambda name: get_deployment_health_status(name, BENCH_NAMESPACE, client_context=client_context), names
+                    ))
+                failed = sum(1 for result in results if not result)
+            elif operation == "create_keda_deployment_with_helm":
+                from fleet_utils import deploy_fleet
+                releases = [
+                    dict(RELEASE, release_name=f"run{run}-{name}", namespace=BENCH_NAMESPACE, chart_path=DEFAULT_CHART_PATH)
+                    for name in names
+                ]
+                failed = sum(1 for result in deploy_fleet(releases, concurrency, client_context) if not result["ok"])
+            elif operation == "get_fleet_health_status":
+                from status_utils import get_fleet_health_status
+                statuses = get_fleet_health_status(BENCH_NAMESPACE, "app", client_context=client_context)
+                failed = max(0, size - len(statuses or []))
+            else:
+                from cluster_utils import get_cluster_summary
+                rows = dict(get_cluster_summary(client_context))
+                failed = 0 if rows.get("Number of Nodes", 0) >= size else 1
+        finally:
+            client_context.close()
+    if failed:
+        raise click.ClickException(f"{operation} failed for {failed} of {size} object(s)")
+
+
+def measure(
+    operation: str, size: int, runs: int, latency: float, failure_rate: float, failure_status: int, concurrency: int, tools_dir: str
+):
+    """Median wall time of the operation and the API requests one run makes, on a fresh fake cluster seeded with size objects."""
+    from fake_cluster import FakeApiServer, seed_objects, install_stub_tools
+    from output_utils import capture_output
+
+    with FakeApiServer(latency=latency, failure_rate=failure_rate, failure_status=failure_status, seed=size) as server, \
+            tempfile.NamedTemporaryFile(suffix=".yaml") as kubeconfig:
+        seed_objects(server, size, BENCH_NAMESPACE)
+        server.write_kubeconfig(kubeconfig.name)
+        install_stub_tools(tools_dir, server.url)
+        with capture_output(): # Warm-up on one object, so imports and the kubeconfig load aren't timed
+            run_operation(operation, 1, "warmup", kubeconfig.name, concurrency)
+        timings = []
+        server.requests.clear()
+        for run in range(runs):
+            started = time.perf_counter()
+            with capture_output(): # The summary table and per-deployment logs would swamp the report
+                run_operation(operation, size, run, kubeconfig.name, concurrency)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), sum(server.requests.values()) // runs
+
+
+@click.command()
+@click.option('--sizes', default=DEFAULT_SIZES, show_default=True, help='Comma-separated object counts to measure at.')
+@click.option('--operations', default=','.join(OPERATIONS), show_default=True, help='Comma-separated operations to measure.')
+@click.option('--runs', type=click.IntRange(min=1), default=3, show_default=True, help='Runs per operation and size; the median is reported.')
+@click.option('--latency', type=float, default=0.0, show_default=True, help='Seconds the fake API server adds to every request.')
+@click.option('--failure-rate', type=click.FloatRange(0, 1), default=0.0, show_default=True, help='Fraction of API requests answered with --failure-status.')
+@click.option('--failure-status', type=click.Choice(['429', '500', '503']), default='500', show_default=True, help='HTTP status of the injected failures; 429s carry a Retry-After.')
+@click.option('--concurrency', type=click.IntRange(min=1), default=16, show_default=True, help='Objects worked on at once.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the results to this JSON file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Results JSON of an earlier run to compare against.')
+@click.option('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION, show_default=True, help='Allowed growth of a median over the baseline (0.25 = 25%).')
+def main(sizes, operations, runs, latency, failure_rate, failure_status, concurrency, output, baseline, max_regression):
+    """
+    Measures the deploy and status calls against the in-process fake API server (fake_cluster.py)
+    and stub helm/kubectl, so no cluster is needed. Exits with status 1 when a median regresses
+    by more than --max-regression against --baseline. For CI:
+    python api_benchmark.py --sizes 1,100 --baseline bench.json
+    """
+    from log_utils import configure_logging
+    from output_utils import install_output_capture
+    configure_logging(logging.WARNING)
+    install_output_capture()
+
+    sizes = [int(size) for size in sizes.split(',') if size.strip()]
+    operations = [operation.strip() for operation in operations.split(',') if operation.strip()]
+    unknown = sorted(set(operations) - set(OPERATIONS))
+    if unknown:
+        raise click.UsageError(f"Unknown operation(s): {', '.join(unknown)} (available: {', '.join(OPERATIONS)})")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tools_dir:
+        os.environ["PATH"] = tools_dir + os.pathsep + os.environ.get("PATH", "")
+        for operation in operations:
+            for size in sizes:
+                seconds, requests = measure(
+                    operation, size, runs, latency, failure_rate, int(failure_status), concurrency, tools_dir
+                )
+                results.setdefault(operation, {})[str(size)] = {"median_seconds": seconds, "api_requests": requests}
+                click.echo(f"{operation} x {size}: {seconds:.3f}s", err=True)
+
+    rows = [
+        [operation, size, f"{result['median_seconds']:.3f}", f"{result['median_seconds'] / int(size) * 1000:.2f}", result["api_requests"]]
+        for operation, by_size in results.items() for size, result in by_size.items()
+    ]
+    click.echo(tabulate(rows, headers=["Operation", "Objects", "Median (s)", "Per object (ms)", "API requests"], tablefmt="grid"))
+
+    if output:
+        with open(output, "w") as output_file:
+            json.dump({"python": sys.version.split()[0], "latency": latency, "concurrency": concurrency, "results": results}, output_file, indent=2)
+
+    if baseline:
+        with open(baseline) as baseline_file:
+            previous = json.load(baseline_file)["results"]
+        failures = [
+            f"{operation} x {size}: {result['median_seconds']:.3f}s vs {previous[operation][size]['median_seconds']:.3f}s"
+            for operation, by_size in results.items() for size, result in by_size.items()
+            if size in previous.get(operation, {})
+            and result["median_seconds"] > previous[operation][size]["median_seconds"] * (1 + max_regression)
+        ]
+        for failure in failures:
+            click.echo(f"FAIL: {failure}", err=True)
+        if failures:
+            raise SystemExit(1)
+        click.echo("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import json
+import asyncio
+import threading
+import contextlib
+import contextvars
+from urllib.parse import urlencode
+
+from kubernetes_asyncio import client, config
+
+from client_utils import ClientContext, get_client_context, DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT
+from metrics_utils import instrument_async_rest_client
+from retry_utils import RateLimiter, install_async_retries
+
+
+class AsyncClientContext:
+    """
+    Async counterpart of ClientContext: one kubeconfig load and one aiohttp session shared by
+    every coroutine on the event loop. Use it as an async context manager, which loads the
+    kubeconfig on entry and closes the session on exit:
+
+        async with AsyncClientContext() as client_context:
+            await asyncio.gather(*(get_deployment_health_status(name, "apps", client_context) for name in names))
+    """
+
+    def __init__(
+        self,
+        config_file: str = None,
+        context: str = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout=DEFAULT_REQUEST_TIMEOUT,
+        rate_limiter: RateLimiter = None
+    ):
+        self.config_file = config_file
+        self.context = context
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._api_client = None
+        self._apis = {}
+
+    @classmethod
+    def from_client_context(cls, client_context: ClientContext):
+        """Same kubeconfig, context, pool size, timeouts and rate limiter as a (sync) ClientContext."""
+        return cls(
+            config_file=client_context.config_file,
+            context=client_context.context,
+            pool_size=client_context.pool_size,
+            request_timeout=client_context.request_timeout,
+            rate_limiter=client_context.rate_limiter
+        )
+
+    async def __aenter__(self):
+        if self._api_client is None:
+            configuration = client.Configuration()
+            await config.load_kube_config(
+                config_file=self.config_file, context=self.context, client_configuration=configuration
+            )
+            # The aiohttp connector limit: requests to the API server allowed in flight at once
+            configuration.connection_pool_maxsize = self.pool_size
+            self._api_client = client.ApiClient(configuration)
+            _apply_default_request_timeout(self._api_client, self.request_timeout)
+            instrument_async_rest_client(self._api_client)
+            install_async_retries(self._api_client, self.rate_limiter)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def api_client(self) -> client.ApiClient:
+        if self._api_client is None:
+            raise RuntimeError("AsyncClientContext must be entered with 'async with' before use")
+        return self._api_client
+
+    @property
+    def core_v1(self) -> client.CoreV1Api:
+        return self._api(client.CoreV1Api)
+
+    @property
+    def apps_v1(self) -> client.AppsV1Api:
+        return self._api(client.AppsV1Api)
+
+    @property
+    def custom_objects(self) -> client.CustomObjectsApi:
+        return self._api(client.CustomObjectsApi)
+
+    async def api_request(
+        self,
+        method: str,
+        path: str,
+        query: dict = None,
+        body=None,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+        timeout=None
+    ):
+        """
+        Async ClientContext.api_request: calls an API path directly on the shared session, e.g. for
+        server-side apply, and returns the decoded JSON body. Raises client.ApiException on a non-2xx response.
+        """
+        api_client = self.api_client
+        configuration = api_client.configuration
+        url = configuration.host + path + ("?" + urlencode(query) if query else "")
+
+        headers = {"Accept": accept, "User-Agent": api_client.user_agent, "Content-Type": content_type}
+        for auth in (await configuration.auth_settings()).values():
+            if auth["in"] == "header" and auth["value"]:
+                headers[auth["key"]] = auth["value"]
+
+        response = await api_client.rest_client.request(method, url, headers=headers, body=body, _request_timeout=timeout)
+        return json.loads(response.data) if response.data else None
+
+    def helm_kube_args(self) -> list:
+        """Helm flags that point it at the same kubeconfig and context as this client."""
+        return [
+            *(["--kubeconfig", self.config_file] if self.config_file else []),
+            *(["--kube-context", self.context] if self.context else [])
+        ]
+
+    async def close(self):
+        if self._api_client is not None:
+            await self._api_client.close()
+        self._api_client = None
+        self._apis = {}
+
+    def _api(self, api_class):
+        api = self._apis.get(api_class)
+        if api is None:
+            api = api_class(self.api_client)
+            self._apis[api_class] = api
+        return api
+
+
+def _apply_default_request_timeout(api_client: client.ApiClient, request_timeout):
+    """Gives every request a timeout unless the caller passed its own _request_timeout."""
+    rest_request = api_client.rest_client.request
+
+    async def request(method, url, *args, **kwargs):
+        if kwargs.get("_request_timeout") is None:
+            kwargs["_request_timeout"] = request_timeout
+        return await rest_request(method, url, *args, **kwargs)
+
+    api_client.rest_client.request = request
+
+
+@contextlib.asynccontextmanager
+async def use_client_context(client_context: AsyncClientContext = None):
+    """
+    Yields client_context, or when it is None a context built from the process-wide ClientContext
+    that is closed again afterwards.
+    """
+    if client_context is not None:
+        yield client_context
+        return
+    async with AsyncClientContext.from_client_context(get_client_context()) as owned_context:
+        yield owned_context
+
+
+
+class AsyncRunner:
+    """
+    An event loop on its own thread, with an AsyncClientContext built from a ClientContext, on which
+    blocking code runs the async functions. The kubeconfig is loaded and the session opened once,
+    when the runner starts, and reused by every call until close().
+    """
+
+    def __init__(self, client_context: ClientContext):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-runner", daemon=True)
+        self._thread.start()
+        self.client_context = AsyncClientContext.from_client_context(client_context)
+        try:
+            asyncio.run_coroutine_threadsafe(self.client_context.__aenter__(), self.loop).result()
+        except BaseException:
+            self.close()
+            raise
+
+    def run(self, async_function, *args, **kwargs):
+        """
+        Runs async_function(*args, client_context=<the runner's AsyncClientContext>, **kwargs) on the
+        runner's loop and returns its result, see run_coroutine.
+        """
+        return self.run_coroutine(async_function(*args, client_context=self.client_context, **kwargs))
+
+    def run_coroutine(self, coroutine):
+        """
+        Runs the coroutine on the runner's loop, in a copy of the caller's contextvars, and returns its
+        result. Works from any thread, including one running an event loop of its own. When the caller
+        is interrupted (Ctrl-C), the task is cancelled and its cleanup, such as a Helm rollback,
+        finishes before the KeyboardInterrupt goes on.
+        """
+        context = contextvars.copy_context()
+        task_created = threading.Event()
+        task_done = threading.Event()
+        tasks = []
+
+        def create_task():
+            task = self.loop.create_task(coroutine, context=context)
+            task.add_done_callback(lambda _: task_done.set())
+            tasks.append(task)
+            task_created.set()
+
+        self.loop.call_soon_threadsafe(create_task)
+        task_created.wait()
+        try:
+            # Timed waits, so Ctrl-C gets through on Windows too, where an untimed lock wait can't be interrupted
+            while not task_done.wait(0.5):
+                pass
+        except BaseException:
+            self.loop.call_soon_threadsafe(tasks[0].cancel)
+            task_done.wait()
+            raise
+        return tasks[0].result()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.client_context.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_runner_lock = threading.Lock()
+
+
+def get_async_runner(client_context: ClientContext = None) -> AsyncRunner:
+    """The AsyncRunner of client_context (default: the process-wide one), started on first use."""
+    client_context = client_context or get_client_context()
+    if client_context.async_runner is None:
+        with _runner_lock:
+            if client_context.async_runner is None:
+                client_context.async_runner = AsyncRunner(client_context)
+    return client_context.async_runner
+
+
+def run_blocking(async_function, *args, client_context: ClientContext = None, **kwargs):
+    """
+    Blocking call of one of the async functions, e.g.
+    run_blocking(async_deployment_utils.get_deployment_health_status, name, namespace, client_context=ctx).
+    It runs on the AsyncRunner of the (sync) client_context, so every call shares one async client.
+    """
+    return get_async_runner(client_context).run(async_function, *args, **kwargs)
@@ -0,0 +1,622 @@
+import os
+import yaml
+import asyncio
+import logging
+import tempfile
+import subprocess
+
+from kubernetes_asyncio import client
+
+from async_client_utils import AsyncClientContext, use_client_context
+from cache_utils import DIGEST_ANNOTATION
+from defaults import DEFAULT_HELM_TIMEOUT
+from helm_utils import run_helm
+from log_utils import log_event
+from metrics_utils import count_operation, record_deployment_replicas
+from profile_utils import get_profiler, span
+from render_utils import FIELD_MANAGER, render_key, render_release, apply_native, chart_fullname, coalesce_values, load_chart
+from wait_utils import wait_for_workload, DEFAULT_WAIT_TIMEOUT
+
+APPLY_PATCH_CONTENT_TYPE = "application/apply-patch+yaml"
+
+# The deployment operations. Every function can be run many times at once on one event loop,
+# sharing one AsyncClientContext. deployment_utils has blocking wrappers of the same names, which
+# run these on the event loop thread of the shared sync ClientContext.
+
+
+async def ensure_namespace(core_v1: client.CoreV1Api, namespace: str):
+    """Creates the namespace if it doesn't exist."""
+    try:
+        await core_v1.read_namespace(name=namespace)
+    except client.ApiException as e:
+        if e.status != 404:
+            raise
+        logging.debug("Namespace '%s' not found. Creating...", namespace)
+        namespace_body = client.V1Namespace(metadata=client.V1ObjectMeta(name=namespace))
+        try:
+            await core_v1.create_namespace(body=namespace_body)
+            log_event("namespace.created", namespace=namespace)
+        except client.ApiException as create_e:
+            # Another coroutine may have created it in the meantime
+            if create_e.status != 409:
+                raise
+
+
+@count_operation("deploy")
+async def create_keda_deployment(
+    deployment_name: str,
+    namespace: str,
+    image: str,
+    tag: str,
+    cpu_request: str,
+    cpu_limit: str,
+    mem_request: str,
+    mem_limit: str,
+    container_port: int,
+    min_replicas: int,
+    max_replicas: int,
+    scaling_metric_type: str,
+    scaling_metric_value: str,
+    event_source_config: dict,
+    field_manager: str = FIELD_MANAGER,
+    force: bool = True, # Take over fields another field manager set, instead of failing with a conflict
+    client_context: AsyncClientContext = None
+):
+    """
+    Creates or updates a Kubernetes deployment with KEDA autoscaling using server-side apply.
+    """
+    async with use_client_context(client_context) as client_context:
+        apps_v1 = client_context.apps_v1
+        core_v1 = client_context.core_v1
+        autoscaling_v1 = client_context.custom_objects # For ScaledObject
+
+        # Create Namespace if it doesn't exist
+        await ensure_namespace(core_v1, namespace)
+
+        deployment_manifest, scaled_object_manifest = build_keda_manifests(
+            deployment_name, namespace, image, tag, cpu_request, cpu_limit, mem_request, mem_limit,
+            container_port, min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config
+        )
+
+        # Both objects are applied at once: KEDA reconciles a ScaledObject whose target doesn't exist yet,
+        # so there is no ordering to respect and nothing to roll back when one of them fails.
+        # Server-side apply creates or updates, so re-running with the same spec is a no-op patch.
+        logging.debug("Applying deployment '%s' and its KEDA ScaledObject in namespace '%s'...", deployment_name, namespace)
+        apply_options = {"field_manager": field_manager, "force": force, "_content_type": APPLY_PATCH_CONTENT_TYPE}
+        results = await asyncio.gather(
+            apps_v1.patch_namespaced_deployment(
+                name=deployment_name, namespace=namespace, body=deployment_manifest, **apply_options
+            ),
+            autoscaling_v1.patch_namespaced_custom_object(
+                group="keda.sh",
+                version="v1alpha1",
+                namespace=namespace,
+                plural="scaledobjects",
+                name=scaled_object_manifest["metadata"]["name"],
+                body=scaled_object_manifest,
+                **apply_options
+            ),
+            return_exceptions=True
+        )
+        if not check_apply_results(results, deployment_name, namespace):
+            return None
+
+        # The apply response is the Deployment as stored, status included, so no extra read is needed
+        status = results[0].status
+        return report_keda_deployment(
+            deployment_name, namespace, image, tag, container_port, min_replicas, max_replicas,
+            scaling_metric_type, scaling_metric_value, event_source_config,
+            replicas=status.replicas if status else None, available_replicas=status.available_replicas if status else None
+        )
+
+
+def build_keda_manifests(
+    deployment_name: str,
+    namespace: str,
+    image: str,
+    tag: str,
+    cpu_request: str,
+    cpu_limit: str,
+    mem_request: str,
+    mem_limit: str,
+    container_port: int,
+    min_replicas: int,
+    max_replicas: int,
+    scaling_metric_type: str,
+    scaling_metric_value: str,
+    event_source_config: dict
+):
+    """The (Deployment, ScaledObject) manifests create_keda_deployment applies."""
+    # 1. Deployment
+    deployment_manifest = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {
+            "name": deployment_name,
+            "namespace": namespace,
+            "labels": {"app": deployment_name}
+        },
+        "spec": {
+            "replicas": min_replicas,
+            "selector": {"matchLabels": {"app": deployment_name}},
+            "template": {
+                "metadata": {"labels": {"app": deployment_name}},
+                "spec": {
+                    "containers": [
+                        {
+                            "name": deployment_name,
+                            "image": f"{image}:{tag}",
+                            "ports": [{"containerPort": container_port}],
+                            "resources": {
+                                "requests": {
+                                    "cpu": cpu_request,
+                                    "memory": mem_request
+                                },
+                                "limits": {
+                                    "cpu": cpu_limit,
+                                    "memory": mem_limit
+                                }
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+    }
+
+    # 2. ScaledObject (KEDA)
+    scaled_object_manifest = {
+        "apiVersion": "keda.sh/v1alpha1",
+        "kind": "ScaledObject",
+        "metadata": {
+            "name": f"{deployment_name}-scaledobject",
+            "namespace": namespace,
+            "labels": {"deploymentName": deployment_name}
+        },
+        "spec": {
+            "scaleTargetRef": {
+                "kind": "Deployment",
+                "name": deployment_name
+            },
+            "minReplicaCount": min_replicas,
+            "maxReplicaCount": max_replicas,
+            "triggers": [
+                {
+                    "type": scaling_metric_type,
+                    "metadata": {
+                        "value": str(scaling_metric_value), # Generic value
+                        **event_source_config # Merge event source specific config
+                    }
+                }
+            ]
+        }
+    }
+    return deployment_manifest, scaled_object_manifest
+
+
+def check_apply_results(results: list, deployment_name: str, namespace: str):
+    """
+    Logs the API errors among the (Deployment, ScaledObject) apply results, which may come from
+    either the sync or the asyncio client. Returns whether both were applied; other exceptions are raised.
+    """
+    failed = False
+    for kind, result in zip(("deployment", "ScaledObject"), results):
+        if not isinstance(result, BaseException):
+            continue
+        if getattr(result, "status", None) is None:
+            raise result
+        failed = True
+        if result.status == 409:
+            log_event(
+                "apply.failed", logging.ERROR, kind=kind, name=deployment_name, namespace=namespace, status=409,
+                error="fields are owned by another manager (use force to take them over)", body=result.body
+            )
+        else:
+            log_event(
+                "apply.failed", logging.ERROR, kind=kind, name=deployment_name, namespace=namespace,
+                status=result.status, error=result.reason, body=result.body
+            )
+    return not failed
+
+
+def report_keda_deployment(
+    deployment_name: str,
+    namespace: str,
+    image: str,
+    tag: str,
+    container_port: int,
+    min_replicas: int,
+    max_replicas: int,
+    scaling_metric_type: str,
+    scaling_metric_value: str,
+    event_source_config: dict,
+    replicas: int = None,
+    available_replicas: int = None
+):
+    """Logs the applied Deployment and returns the details create_keda_deployment reports."""
+    endpoints = []
+    endpoints.append(f"Internal Port: {container_port}")
+
+    log_event(
+        "deployment.applied", deployment=deployment_name, namespace=namespace, image=f"{image}:{tag}",
+        replicas=replicas, available_replicas=available_replicas,
+        endpoints=endpoints, min_replicas=min_replicas, max_replicas=max_replicas,
+        metric_type=scaling_metric_type, metric_value=scaling_metric_value, event_source=event_source_config
+    )
+
+    return {
+        "deployment_name": deployment_name,
+        "namespace": namespace,
+        "image": f"{image}:{tag}",
+        "endpoints": endpoints,
+        "scaling_config": {
+            "min_replicas": min_replicas,
+            "max_replicas": max_replicas,
+            "metric_type": scaling_metric_type,
+            "metric_value": scaling_metric_value,
+            "event_source": event_source_config
+        }
+    }
+
+
+def build_health_status(deployment):
+    """Builds the health status dict reported by get-status from a Deployment object."""
+    status = deployment.status
+    health_status = {
+        "Deployment Name": deployment.metadata.name,
+        "Namespace": deployment.metadata.namespace,
+        "Ready Replicas": status.ready_replicas if status.ready_replicas is not None else 0,
+        "Updated Replicas": status.updated_replicas if status.updated_replicas is not None else 0,
+        "Available Replicas": status.available_replicas if status.available_replicas is not None else 0,
+        "Total Replicas": status.replicas if status.replicas is not None else 0,
+        "Conditions": []
+    }
+
+    for condition in status.conditions or []:
+        health_status["Conditions"].append({
+            "Type": condition.type,
+            "Status": condition.status,
+            "Reason": condition.reason,
+            "Message": condition.message
+        })
+    record_deployment_replicas(health_status)
+    return health_status
+
+
+def report_health_status(deployment):
+    """build_health_status, logged as one deployment.health event."""
+    health_status = build_health_status(deployment)
+    log_event(
+        "deployment.health", deployment=health_status["Deployment Name"], namespace=health_status["Namespace"],
+        ready_replicas=health_status["Ready Replicas"], total_replicas=health_status["Total Replicas"],
+        updated_replicas=health_status["Updated Replicas"], available_replicas=health_status["Available Replicas"],
+        conditions={cond["Type"]: cond["Status"] for cond in health_status["Conditions"]}
+    )
+    return health_status
+
+
+async def read_deployment(deployment_name: str, namespace: str, client_context: AsyncClientContext = None):
+    """Reads a Deployment, or logs a failed deployment.health event and returns None."""
+    async with use_client_context(client_context) as client_context:
+        try:
+            return await client_context.apps_v1.read_namespaced_deployment(name=deployment_name, namespace=namespace)
+        except client.ApiException as e:
+            log_event(
+                "deployment.health", logging.ERROR, deployment=deployment_name, namespace=namespace,
+                error="not found" if e.status == 404 else f"{e.status} {e.reason}"
+            )
+            return None
+
+
+async def get_deployment_health_status(
+    deployment_name: str, namespace: str, client_context: AsyncClientContext = None
+):
+    """
+    Provides the health status of a given deployment.
+    """
+    deployment = await read_deployment(deployment_name, namespace, client_context)
+    return report_health_status(deployment) if deployment is not None else None
+
+
+def build_helm_values(
+    image: str,
+    tag: str,
+    cpu_request: str,
+    cpu_limit: str,
+    mem_request: str,
+    mem_limit: str,
+    container_port: int,
+    min_replicas: int,
+    max_replicas: int,
+    scaling_metric_type: str,
+    scaling_metric_value: str,
+    event_source_config: dict
+):
+    """
+    Builds the values passed to my-app-chart for a KEDA-enabled deployment.
+    """
+    # IMPORTANT: These keys must match the structure expected by your Helm chart's values.yaml
+    # and the templates after our previous modifications (e.g., kedaConfig, disabled autoscaling for HPA).
+    return {
+        "image": {
+            "repository": image,
+            "tag": tag
+        },
+        "service": {
+            "type": "ClusterIP", # Added for NOTES.txt fix if needed, assuming default chart service type
+            "port": container_port
+        },
+        "resources": {
+            "requests": {
+                "cpu": cpu_request,
+                "memory": mem_request
+            },
+            "limits": {
+                "cpu": cpu_limit,
+                "memory": mem_limit
+            }
+        },
+        # Native Kubernetes HPA Configuration (from Helm's default chart, disable this!)
+        "autoscaling": {
+            "enabled": False, # Set this to False to avoid conflict with KEDA
+            # Default values from Helm's autoscaling block, even if not used, can be left here
+            "minReplicas": 1,
+            "maxReplicas": 100,
+            "targetCPUUtilizationPercentage": 80
+        },
+        # KEDA-specific configuration (renamed from 'autoscaling' to avoid collision)
+        "kedaConfig": {
+            "enabled": True,
+            "minReplicas": min_replicas,
+            "maxReplicas": max_replicas,
+            "metricType": scaling_metric_type,
+            "metricValue": scaling_metric_value,
+            "eventSourceConfig": event_source_config
+        },
+        "replicaCount": min_replicas, # Initial replica count for the deployment itself
+        "serviceAccount": { # Added for serviceaccount.yaml fix if using default chart
+            "create": True,
+            "automount": True
+        },
+        "ingress": { # Added for ingress.yaml fix if using default chart
+            "enabled": False,
+            "className": "",
+            "annotations": {},
+            "hosts": [
+                {
+                    "host": "chart-example.local",
+                    "paths": [
+                        {
+                            "path": "/",
+                            "pathType": "ImplementationSpecific"
+                        }
+                    ]
+                }
+            ],
+            "tls": []
+        }
+    }
+
+
+async def install_with_helm(
+    release_name: str, namespace: str, chart_path: str, helm_values: dict, upgrade: bool = False,
+    kube_args: list = None, # e.g. ClientContext.helm_kube_args(), to install on a cluster other than the current context
+    timeout: float = DEFAULT_HELM_TIMEOUT
+):
+    """
+    Runs 'helm install' (or 'helm upgrade --install' when upgrade is set) for the release with the given values.
+    Helm runs through helm_utils.run_helm: its output is logged line by line as it arrives, and many
+    installs can be awaited at once. Retries after an unreachable API server use 'helm upgrade --install',
+    which also completes a release the failed attempt left behind. When Helm runs past timeout or the
+    task is cancelled, the release is rolled back (or uninstalled if it is new).
+    Raises subprocess.CalledProcessError when Helm fails, subprocess.TimeoutExpired when it runs out of
+    time and FileNotFoundError when it isn't installed.
+    """
+    profiling = get_profiler().enabled
+    fd, temp_values_file_path = tempfile.mkstemp(suffix='.yaml')
+    try:
+        with span("helm.values_file"), os.fdopen(fd, 'w') as temp_file:
+            yaml.dump(helm_values, temp_file, Dumper=yaml.SafeDumper)
+
+        helm_args = [
+            release_name, chart_path,
+            '--namespace', namespace,
+            '-f', temp_values_file_path,
+            *(kube_args or []),
+            # Helm's debug log marks where each of its phases starts
+            *(['--debug'] if profiling else [])
+        ]
+        # No '--wait': the caller watches readiness, which returns as soon as the rollout completes
+        logging.debug("Installing Helm chart '%s' as release '%s' in namespace '%s'...", chart_path, release_name, namespace)
+        with span("helm.install", release=release_name, upgrade=upgrade):
+            try:
+                await run_helm(
+                    [*(['upgrade', '--install'] if upgrade else ['install']), *helm_args],
+                    release=release_name, namespace=namespace, timeout=timeout, cleanup=True,
+                    retry_args=['upgrade', '--install', *helm_args]
+                )
+            except subprocess.CalledProcessError as e:
+                log_event(
+                    "helm.install", logging.ERROR, release=release_name, namespace=namespace,
+                    exit_code=e.returncode, error=(e.stderr or "").strip()
+                )
+                raise
+        log_event("helm.install", release=release_name, namespace=namespace, chart=chart_path, upgrade=upgrade)
+    finally:
+        os.remove(temp_values_file_path)
+
+
+@count_operation("deploy")
+async def create_keda_deployment_with_helm(
+    release_name: str, # Helm release name
+    namespace: str,
+    chart_path: str,   # Path to your Helm chart directory (e.g., "my-app-chart")
+    image: str,
+    tag: str,
+    cpu_request: str,
+    cpu_limit: str,
+    mem_request: str,
+    mem_limit: str,
+    container_port: int,
+    min_replicas: int,
+    max_replicas: int,
+    scaling_metric_type: str,
+    scaling_metric_value: str,
+    event_source_config: dict,
+    wait_timeout: float = DEFAULT_WAIT_TIMEOUT, # Seconds to wait for the rollout after Helm returns
+    helm_timeout: float = DEFAULT_HELM_TIMEOUT, # Seconds Helm may run before it is stopped and the release rolled back
+    engine: str = "helm", # "helm" runs 'helm install'; "native" renders the chart in Python and server-side applies it
+    idempotent: bool = False, # Skip unchanged releases and 'helm upgrade --install' changed ones
+    dry_run: bool = False, # Only render the manifests (through the render cache) and return them
+    client_context: AsyncClientContext = None
+):
+    """
+    Creates a Kubernetes deployment with KEDA autoscaling using a Helm chart.
+
+    With idempotent set, the render_key of the chart, values and renderer is compared with the digest
+    recorded on the Deployment by the last deploy; when they match nothing is installed and the details are returned
+    with "unchanged" set. With dry_run set the cluster isn't touched; the details hold the rendered
+    "manifests" instead.
+    """
+    # Prepare Helm values
+    helm_values = build_helm_values(
+        image, tag, cpu_request, cpu_limit, mem_request, mem_limit, container_port,
+        min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config
+    )
+    # The deployment name is the chart's "fullname" (e.g., release-name-chart-name), see _helpers.tpl
+    with span("chart.load"):
+        chart, chart_values = load_chart(chart_path)
+    deployment_name_in_k8s = chart_fullname(release_name, chart, coalesce_values(chart_values, helm_values))
+
+    if dry_run:
+        details = _release_details(
+            release_name, deployment_name_in_k8s, namespace, image, tag, container_port, min_replicas,
+            max_replicas, scaling_metric_type, scaling_metric_value, event_source_config, scaled_object_ready=None
+        )
+        with span("chart.render", engine=engine):
+            # 'helm template' blocks, so a cache miss renders on a worker thread
+            details["manifests"] = await asyncio.to_thread(
+                render_release, release_name, namespace, chart_path, helm_values, engine
+            )
+        return details
+
+    async with use_client_context(client_context) as client_context:
+        core_v1 = client_context.core_v1
+        apps_v1 = client_context.apps_v1 # For status checks
+
+        digest = None
+        if idempotent:
+            with span("release.digest_check") as attributes:
+                # The render cache key, so a deploy with an unchanged render is skipped; may run 'helm version'
+                digest = await asyncio.to_thread(render_key, release_name, namespace, chart_path, helm_values, engine)
+                deployed = await _read_deployment_if_exists(apps_v1, deployment_name_in_k8s, namespace)
+                attributes["unchanged"] = bool(deployed) and (deployed.metadata.annotations or {}).get(DIGEST_ANNOTATION) == digest
+            if deployed and (deployed.metadata.annotations or {}).get(DIGEST_ANNOTATION) == digest:
+                log_event("release.deployed", release=release_name, namespace=namespace, unchanged=True)
+                return _release_details(
+                    release_name, deployment_name_in_k8s, namespace, image, tag, container_port, min_replicas,
+                    max_replicas, scaling_metric_type, scaling_metric_value, event_source_config,
+                    scaled_object_ready=None, unchanged=True
+                )
+
+        # Create Namespace if it doesn't exist
+        with span("namespace.ensure"):
+            await ensure_namespace(core_v1, namespace)
+
+        if engine == "native":
+            # Render the chart in-process and server-side apply it instead of running 'helm install'
+            try:
+                with span("native.apply"):
+                    await apply_native(release_name, namespace, chart_path, helm_values, client_context=client_context)
+            except client.ApiException as e:
+                log_event(
+                    "release.deployed", logging.ERROR, release=release_name, namespace=namespace, engine=engine,
+                    status=e.status, error=e.reason, body=e.body
+                )
+                raise
+        else:
+            await install_with_helm(
+                release_name, namespace, chart_path, helm_values, upgrade=idempotent,
+                kube_args=client_context.helm_kube_args(), timeout=helm_timeout
+            )
+
+        # Now retrieve details after Helm install
+        try:
+            with span("rollout.wait") as attributes:
+                readiness = await wait_for_workload(
+                    client_context, namespace, deployment_name_in_k8s,
+                    scaled_object_name=f"{deployment_name_in_k8s}-scaledobject",
+                    timeout=wait_timeout
+                )
+                attributes.update(readiness)
+            if not readiness["deployment_ready"]:
+                log_event(
+                    "release.deployed", logging.ERROR, release=release_name, namespace=namespace,
+                    deployment=deployment_name_in_k8s, error="deployment did not become ready", **readiness
+                )
+                return None
+
+            if digest:
+                # Recorded only once the rollout succeeded, so a failed deploy is retried on the next run
+                with span("release.digest_record"):
+                    await apps_v1.patch_namespaced_deployment(
+                        name=deployment_name_in_k8s, namespace=namespace,
+                        body={"metadata": {"annotations": {DIGEST_ANNOTATION: digest}}}
+                    )
+
+            with span("deployment.status_read"):
+                deployment_status = await apps_v1.read_namespaced_deployment_status(name=deployment_name_in_k8s, namespace=namespace)
+            endpoints = []
+            endpoints.append(f"Internal Container Port: {container_port}")
+
+            log_event(
+                "release.deployed", release=release_name, namespace=namespace, deployment=deployment_name_in_k8s,
+                engine=engine, image=f"{image}:{tag}", replicas=deployment_status.status.replicas,
+                available_replicas=deployment_status.status.available_replicas, endpoints=endpoints,
+                min_replicas=min_replicas, max_replicas=max_replicas, metric_type=scaling_metric_type,
+                metric_value=scaling_metric_value, event_source=event_source_config,
+                scaled_object_ready=readiness["scaled_object_ready"]
+            )
+
+            return _release_details(
+                release_name, deployment_name_in_k8s, namespace, image, tag, container_port, min_replicas,
+                max_replicas, scaling_metric_type, scaling_metric_value, event_source_config,
+                scaled_object_ready=readiness["scaled_object_ready"]
+            )
+
+        except client.ApiException as e:
+            log_event(
+                "release.deployed", logging.ERROR, release=release_name, namespace=namespace,
+                error=f"could not read the deployment after the install: {e.status} {e.reason}"
+            )
+            return None
+
+
+async def _read_deployment_if_exists(apps_v1: client.AppsV1Api, name: str, namespace: str):
+    try:
+        return await apps_v1.read_namespaced_deployment(name=name, namespace=namespace)
+    except client.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+def _release_details(
+    release_name, deployment_name_in_k8s, namespace, image, tag, container_port, min_replicas, max_replicas,
+    scaling_metric_type, scaling_metric_value, event_source_config, scaled_object_ready, unchanged=False
+):
+    return {
+        "helm_release_name": release_name,
+        "deployment_name_in_k8s": deployment_name_in_k8s,
+        "namespace": namespace,
+        "image": f"{image}:{tag}",
+        "endpoints": [f"Internal Container Port: {container_port}"],
+        "unchanged": unchanged,
+        "scaling_config": {
+            "min_replicas": min_replicas,
+            "max_replicas": max_replicas,
+            "metric_type": scaling_metric_type,
+            "metric_value": scaling_metric_value,
+            "event_source": event_source_config,
+            "scaled_object_ready": scaled_object_ready
+        }
+    }
\ No newline at end of file
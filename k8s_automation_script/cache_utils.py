@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+
+import yaml
+
+# Annotation on the Deployment recording the digest of the chart and values it was deployed from
+DIGEST_ANNOTATION = "k8s-automation/release-digest"
+
+# Rendered manifests are cached here unless K8S_AUTOMATION_CACHE_DIR points elsewhere
+DEFAULT_RENDER_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "k8s-automation", "renders"
+)
+DEFAULT_RENDER_CACHE_BYTES = 64 * 1024 * 1024
+
+_chart_digests = {} # chart path -> (stat signature, digest)
+_chart_digests_lock = threading.Lock()
+
+
+def chart_digest(chart_path: str):
+    """
+    SHA-256 over the relative paths and contents of every file in a chart directory.
+    Memoized on the files' sizes and modification times, so a fleet sharing one chart
+    reads it from disk once.
+    """
+    chart_path = os.path.abspath(chart_path)
+    files = []
+    for root, dirs, names in os.walk(chart_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append((os.path.relpath(path, chart_path).replace(os.sep, '/'), stat.st_size, stat.st_mtime_ns))
+    signature = tuple(files)
+
+    with _chart_digests_lock:
+        cached = _chart_digests.get(chart_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    digest = hashlib.sha256()
+    for relative_path, _, _ in files:
+        digest.update(relative_path.encode() + b'\0')
+        with open(os.path.join(chart_path, relative_path), 'rb') as chart_file:
+            digest.update(hashlib.sha256(chart_file.read()).digest())
+    digest = digest.hexdigest()
+
+    with _chart_digests_lock:
+        _chart_digests[chart_path] = (signature, digest)
+    return digest
+
+
+def values_digest(values: dict):
+    """SHA-256 of the values in canonical JSON form (sorted keys), so key order doesn't matter."""
+    canonical = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed on-disk cache of rendered manifests, one YAML file per key.
+
+    Entries are never stale: the key covers everything the render depends on, so a changed chart
+    or changed values simply produce a new key. Reads touch the file's modification time, and
+    the least recently used entries are evicted once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_RENDER_CACHE_BYTES):
+        self.directory = directory or os.environ.get("K8S_AUTOMATION_CACHE_DIR") or DEFAULT_RENDER_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(renderer: str, release_name: str, namespace: str, chart_path: str, values: dict):
+        """Cache key for one render; renderer identifies the tool and its version, e.g. 'helm v3.15.2'."""
+        combined = f"{renderer}:{release_name}:{namespace}:{chart_digest(chart_path)}:{values_digest(values)}"
+        return hashlib.sha256(combined.encode()).hexdigest()
+
+    def get(self, key: str):
+        """The cached manifests for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path) as cache_file:
+                manifests = [doc for doc in yaml.safe_load_all(cache_file) if doc]
+            os.utime(path)
+        except FileNotFoundError:
+            manifests = None
+        except (OSError, yaml.YAMLError) as e:
+            logging.warning("Ignoring unreadable render cache entry '%s': %s", path, e)
+            manifests = None
+
+        with self._lock:
+            if manifests is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return manifests
+
+    def put(self, key: str, manifests: list):
+        temp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file and rename, so concurrent readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as cache_file:
+                yaml.safe_dump_all(manifests, cache_file, default_flow_style=False)
+            os.replace(temp_path, self._path(key))
+            temp_path = None
+            self._evict()
+        except OSError as e:
+            logging.warning("Could not write render cache entry to '%s': %s", self.directory, e)
+        finally:
+            if temp_path: # Not renamed: the write failed or was interrupted
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, f"{key}.yaml")
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".yaml"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries): # Oldest first
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Process-wide RenderCache, so hit/miss counters cover the whole command."""
+    global _render_cache
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                _render_cache = RenderCache()
+    return _render_cache
@@ -0,0 +1,198 @@
+import json
+import socket
+import threading
+from urllib.parse import urlencode
+
+import urllib3
+from kubernetes import client, config
+
+from metrics_utils import instrument_rest_client
+from defaults import DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT, DEFAULT_QPS, DEFAULT_BURST
+from retry_utils import RateLimiter, install_retries
+from profile_utils import span
+
+# TCP keep-alive so idle pooled connections survive NATs and load balancers in front of the API server
+KEEPALIVE_SOCKET_OPTIONS = urllib3.connection.HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+for _name, _value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+    if hasattr(socket, _name):
+        KEEPALIVE_SOCKET_OPTIONS.append((socket.IPPROTO_TCP, getattr(socket, _name), _value))
+
+
+class ClientContext:
+    """
+    Loads the kubeconfig once and hands out API objects that all share one pooled ApiClient.
+    Nothing is loaded until the first API object is requested, so creating a context is free.
+    Every request goes through one rate limiter (qps/burst) and is retried as retry_utils.RETRY_POLICIES says.
+    """
+
+    def __init__(
+        self,
+        config_file: str = None,
+        context: str = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        request_timeout=DEFAULT_REQUEST_TIMEOUT,
+        qps: float = DEFAULT_QPS,
+        burst: int = DEFAULT_BURST
+    ):
+        self.config_file = config_file
+        self.context = context
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.qps = qps
+        self.burst = burst
+        # Shared with the AsyncClientContexts built from this context, so sync and async calls share the budget
+        self.rate_limiter = RateLimiter(qps, burst)
+        self._api_client = None
+        self._apis = {}
+        self._lock = threading.Lock()
+        # async_client_utils.AsyncRunner: the event loop thread and async client the blocking
+        # wrappers of the async functions run on, started by the first of them
+        self.async_runner = None
+
+    @property
+    def api_client(self) -> client.ApiClient:
+        """The shared ApiClient. Raises config.ConfigException if the kubeconfig can't be loaded."""
+        if self._api_client is None:
+            with self._lock:
+                if self._api_client is None:
+                    self._api_client = self._build_api_client()
+        return self._api_client
+
+    @property
+    def core_v1(self) -> client.CoreV1Api:
+        return self._api(client.CoreV1Api)
+
+    @property
+    def apps_v1(self) -> client.AppsV1Api:
+        return self._api(client.AppsV1Api)
+
+    @property
+    def autoscaling_v2(self) -> client.AutoscalingV2Api:
+        return self._api(client.AutoscalingV2Api)
+
+    @property
+    def custom_objects(self) -> client.CustomObjectsApi:
+        return self._api(client.CustomObjectsApi)
+
+    @property
+    def apiextensions_v1(self) -> client.ApiextensionsV1Api:
+        return self._api(client.ApiextensionsV1Api)
+
+    def api_request(
+        self,
+        method: str,
+        path: str,
+        query: dict = None,
+        body=None,
+        content_type: str = "application/json",
+        accept: str = "application/json",
+        timeout=None
+    ):
+        """
+        Calls an API path directly on the shared connection pool and returns the decoded JSON body.
+        For requests the generated API classes can't express, such as metadata-only lists
+        or server-side apply. Raises client.ApiException on a non-2xx response.
+        """
+        api_client = self.api_client
+        configuration = api_client.configuration
+        url = configuration.host + path + ("?" + urlencode(query) if query else "")
+
+        headers = {"Accept": accept, "User-Agent": api_client.user_agent}
+        for auth in configuration.auth_settings().values():
+            if auth["in"] == "header" and auth["value"]:
+                headers[auth["key"]] = auth["value"]
+        if body is not None:
+            # Passed on as a dict: the REST client JSON-encodes it for JSON and apply-patch+yaml bodies.
+            # Serializing it here would have older clients encode the string a second time.
+            headers["Content-Type"] = content_type
+
+        response = api_client.rest_client.request(method, url, headers=headers, body=body, _request_timeout=timeout)
+        data = response.read() if callable(getattr(response, "read", None)) else response.data
+        if not 200 <= response.status <= 299:
+            exception = client.ApiException(status=response.status, reason=response.reason)
+            exception.body = data
+            raise exception
+        return json.loads(data) if data else None
+
+    def helm_kube_args(self) -> list:
+        """Helm flags that point it at the same kubeconfig and context as this client."""
+        return [
+            *(["--kubeconfig", self.config_file] if self.config_file else []),
+            *(["--kube-context", self.context] if self.context else [])
+        ]
+
+    def ensure_pool_size(self, size: int):
+        """Grows the connection pool, e.g. so that every worker of a thread pool gets its own connection."""
+        with self._lock:
+            self.pool_size = max(self.pool_size, size)
+            if self._api_client is not None:
+                # Applies to connection pools created from now on
+                self._api_client.configuration.connection_pool_maxsize = self.pool_size
+                self._api_client.rest_client.pool_manager.connection_pool_kw["maxsize"] = self.pool_size
+
+    def close(self):
+        with self._lock:
+            if self._api_client is not None:
+                self._api_client.close()
+            self._api_client = None
+            self._apis = {}
+            if self.async_runner is not None:
+                self.async_runner.close()
+            self.async_runner = None
+
+    def _api(self, api_class):
+        api = self._apis.get(api_class)
+        if api is None:
+            api = api_class(self.api_client)
+            self._apis[api_class] = api
+        return api
+
+    def _build_api_client(self) -> client.ApiClient:
+        configuration = client.Configuration()
+        with span("kubeconfig.load"):
+            config.load_kube_config(
+                config_file=self.config_file, context=self.context, client_configuration=configuration
+            )
+        configuration.connection_pool_maxsize = self.pool_size
+        api_client = client.ApiClient(configuration)
+
+        api_client.rest_client.pool_manager.connection_pool_kw["socket_options"] = KEEPALIVE_SOCKET_OPTIONS
+        _apply_default_request_timeout(api_client, self.request_timeout)
+        instrument_rest_client(api_client)
+        install_retries(api_client, self.rate_limiter)
+        return api_client
+
+
+def _apply_default_request_timeout(api_client: client.ApiClient, request_timeout):
+    """Gives every request a timeout unless the caller passed its own _request_timeout."""
+    rest_request = api_client.rest_client.request
+
+    def request(method, url, *args, **kwargs):
+        if kwargs.get("_request_timeout") is None:
+            kwargs["_request_timeout"] = request_timeout
+        return rest_request(method, url, *args, **kwargs)
+
+    api_client.rest_client.request = request
+
+
+_default_context = None
+_default_context_lock = threading.Lock()
+
+
+def get_client_context() -> ClientContext:
+    """Process-wide ClientContext used when a caller doesn't pass one."""
+    global _default_context
+    if _default_context is None:
+        with _default_context_lock:
+            if _default_context is None:
+                _default_context = ClientContext()
+    return _default_context
+
+
+def set_client_context(client_context: ClientContext):
+    """Makes client_context the process-wide default, e.g. the one built from the CLI options."""
+    global _default_context
+    with _default_context_lock:
+        _default_context = client_context
@@ -1,12 +1,25 @@
 import subprocess
+import time
+import contextvars
+import kubernetes
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from kubernetes import client, config
 from tabulate import tabulate
 
-def connect_to_cluster():
+from client_utils import ClientContext, get_client_context
+from profile_utils import span
+
+PROBE_TIMEOUT = 10 # Seconds each summary probe may take before it is reported as timed out
+PAGE_SIZE = 500 # Objects per list call when counting nodes and namespaces
+
+# Ask for PartialObjectMetadataList so node and namespace lists don't carry specs and statuses
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+def connect_to_cluster(client_context: ClientContext = None):
     """Connects to the Kubernetes cluster using kubectl's default config."""
+    client_context = client_context or get_client_context()
     try:
-        config.load_kube_config()
-        v1 = client.CoreV1Api()
+        v1 = client_context.core_v1
         print("Successfully connected to Kubernetes cluster.")
         return v1
     except config.ConfigException as e:
@@ -14,62 +27,131 @@ def connect_to_cluster():
         print("Please ensure kubectl is configured correctly and can access the cluster.")
         return None
 
-def get_cluster_summary():
-    """Provides a summary of the Kubernetes cluster setup."""
+def get_cluster_summary(client_context: ClientContext = None, probe_timeout: float = PROBE_TIMEOUT):
+    """
+    Provides a summary of the Kubernetes cluster setup.
+    All probes run at the same time; a probe that doesn't answer within probe_timeout
+    is reported as timed out and the summary shows the results of the others.
+    """
+    client_context = client_context or get_client_context()
+    probes = [
+        ("Kubernetes version", _probe_kubernetes_version),
+        ("Nodes", _probe_nodes),
+        ("Namespaces", _probe_namespaces),
+        ("Helm", _probe_helm),
+        ("KEDA CRD", _probe_keda_crd),
+        ("KEDA operator", _probe_keda_operator),
+    ]
+
     summary_data = []
+    probe_timings = []
+    executor = ThreadPoolExecutor(max_workers=len(probes))
     try:
-        # Get Kubernetes version
-        version_output = subprocess.run(['kubectl', 'version', '--short'], capture_output=True, text=True, check=True)
-        version_lines = version_output.stdout.strip().split('\n')
-        client_version = version_lines[0].replace('Client Version: ', '')
-        server_version = version_lines[1].replace('Server Version: ', '')
-        summary_data.append(["Kubernetes Client Version", client_version])
-        summary_data.append(["Kubernetes Server Version", server_version])
-
-        # Get nodes information
-        api = client.CoreV1Api()
-        nodes = api.list_node().items
-        node_names = [node.metadata.name for node in nodes]
-        summary_data.append(["Number of Nodes", len(nodes)])
-        summary_data.append(["Node Names", ", ".join(node_names)])
-
-        # Check namespaces
-        namespaces = api.list_namespace().items
-        namespace_names = [ns.metadata.name for ns in namespaces]
-        summary_data.append(["Number of Namespaces", len(namespaces)])
-        summary_data.append(["Namespaces", ", ".join(namespace_names[:5]) + ("..." if len(namespace_names) > 5 else "")])
-
-        # Check Helm installation
-        try:
-            helm_version_output = subprocess.run(['helm', 'version', '--short'], capture_output=True, text=True, check=True)
-            summary_data.append(["Helm Installed", "Yes"])
-            summary_data.append(["Helm Version", helm_version_output.stdout.strip()])
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            summary_data.append(["Helm Installed", "No"])
-            summary_data.append(["Helm Version", "N/A"])
-
-        # Check KEDA installation
-        try:
-            # Check for KEDA CRDs
-            crd_output = subprocess.run(['kubectl', 'get', 'crd', 'scaledobjects.keda.sh'], capture_output=True, text=True)
-            if "scaledobjects.keda.sh" in crd_output.stdout:
-                summary_data.append(["KEDA Installed", "Yes"])
-                # Check KEDA operator deployment
-                keda_deployment_output = subprocess.run(['kubectl', 'get', 'deployment', '-n', 'keda', 'keda-operator'], capture_output=True, text=True)
-                if "keda-operator" in keda_deployment_output.stdout:
-                    summary_data.append(["KEDA Operator Running", "Yes"])
-                else:
-                    summary_data.append(["KEDA Operator Running", "No (Deployment not found)"])
-            else:
-                summary_data.append(["KEDA Installed", "No (CRD not found)"])
-                summary_data.append(["KEDA Operator Running", "N/A"])
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            summary_data.append(["KEDA Installed", "No (kubectl command failed)"])
-            summary_data.append(["KEDA Operator Running", "N/A"])
-
-        print("\n--- Kubernetes Cluster Summary ---")
-        print(tabulate(summary_data, headers=["Metric", "Value"], tablefmt="grid"))
-        print("----------------------------------\n")
-
-    except Exception as e:
-        print(f"Error getting cluster summary: {e}")
\ No newline at end of file
+        started = time.monotonic()
+        deadline = started + probe_timeout
+        futures = [
+            # Each probe runs in a copy of this context, so its span nests under the caller's
+            (name, executor.submit(contextvars.copy_context().run, _timed, name, probe, client_context, probe_timeout))
+            for name, probe in probes
+        ]
+        for name, future in futures:
+            try:
+                rows, seconds = future.result(timeout=max(0, deadline - time.monotonic()))
+                summary_data.extend(rows)
+                probe_timings.append(f"{name} {seconds:.2f}s")
+            except FutureTimeoutError:
+                summary_data.append([name, f"Timed out after {probe_timeout:g}s"])
+                probe_timings.append(f"{name} timed out")
+            except Exception as e:
+                summary_data.append([name, f"Error: {_short_error(e)}"])
+                probe_timings.append(f"{name} failed")
+    finally:
+        # Don't wait for probes that timed out; their own request timeouts will end them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print("\n--- Kubernetes Cluster Summary ---")
+    print(tabulate(summary_data, headers=["Metric", "Value"], tablefmt="grid"))
+    print(f"Probes ({time.monotonic() - started:.2f}s): {', '.join(probe_timings)}")
+    print("----------------------------------\n")
+    return summary_data
+
+def _timed(name: str, probe, client_context: ClientContext, timeout: float):
+    started = time.monotonic()
+    with span("probe", probe=name):
+        rows = probe(client_context, timeout)
+    return rows, time.monotonic() - started
+
+def _probe_kubernetes_version(client_context: ClientContext, timeout: float):
+    version = client.VersionApi(client_context.api_client).get_code(_request_timeout=timeout)
+    return [
+        ["Kubernetes Client Version", f"python-kubernetes {kubernetes.__version__}"],
+        ["Kubernetes Server Version", version.git_version],
+    ]
+
+def _probe_nodes(client_context: ClientContext, timeout: float):
+    node_names = _list_names(client_context, "/api/v1/nodes", timeout)
+    return [
+        ["Number of Nodes", len(node_names)],
+        ["Node Names", ", ".join(node_names[:10]) + ("..." if len(node_names) > 10 else "")],
+    ]
+
+def _probe_namespaces(client_context: ClientContext, timeout: float):
+    namespace_names = _list_names(client_context, "/api/v1/namespaces", timeout)
+    return [
+        ["Number of Namespaces", len(namespace_names)],
+        ["Namespaces", ", ".join(namespace_names[:5]) + ("..." if len(namespace_names) > 5 else "")],
+    ]
+
+def _probe_helm(client_context: ClientContext, timeout: float):
+    try:
+        helm_version_output = subprocess.run(
+            ['helm', 'version', '--short'], capture_output=True, text=True, check=True, timeout=timeout
+        )
+        return [["Helm Installed", "Yes"], ["Helm Version", helm_version_output.stdout.strip()]]
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return [["Helm Installed", "No"], ["Helm Version", "N/A"]]
+
+def _probe_keda_crd(client_context: ClientContext, timeout: float):
+    try:
+        client_context.apiextensions_v1.read_custom_resource_definition(
+            name="scaledobjects.keda.sh", _request_timeout=timeout
+        )
+        return [["KEDA Installed", "Yes"]]
+    except client.ApiException as e:
+        if e.status == 404:
+            return [["KEDA Installed", "No (CRD not found)"]]
+        raise
+
+def _probe_keda_operator(client_context: ClientContext, timeout: float):
+    try:
+        deployment = client_context.apps_v1.read_namespaced_deployment(
+            name="keda-operator", namespace="keda", _request_timeout=timeout
+        )
+    except client.ApiException as e:
+        if e.status == 404:
+            return [["KEDA Operator Running", "No (Deployment not found)"]]
+        raise
+    ready = deployment.status.ready_replicas or 0
+    desired = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+    return [["KEDA Operator Running", f"{'Yes' if ready >= 1 else 'No'} ({ready}/{desired} ready)"]]
+
+def _list_names(client_context: ClientContext, path: str, timeout: float):
+    """Names of all objects under a list path, fetched page by page as metadata only."""
+    names = []
+    continue_token = None
+    while True:
+        query = {"limit": PAGE_SIZE}
+        if continue_token:
+            query["continue"] = continue_token
+        page = client_context.api_request("GET", path, query=query, accept=METADATA_ACCEPT, timeout=timeout)
+        names.extend(item["metadata"]["name"] for item in page.get("items", []))
+        continue_token = page.get("metadata", {}).get("continue")
+        if not continue_token:
+            return names
+
+def _short_error(e: Exception):
+    if isinstance(e, client.ApiException):
+        return f"{e.status} {e.reason}"
+    if isinstance(e, subprocess.TimeoutExpired):
+        return "timed out"
+    return str(e).splitlines()[0] if str(e) else e.__class__.__name__
@@ -0,0 +1,159 @@
+import os
+import hmac
+import json
+import socket
+import signal
+import logging
+import secrets
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from async_client_utils import get_async_runner
+from client_utils import ClientContext
+from k8s_automation_client import DAEMON_COMMANDS, DEFAULT_PORT
+from metrics_utils import REGISTRY
+from output_utils import capture_output, install_output_capture
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /run runs one CLI command; GET /healthz and GET /metrics are for monitoring.
+    When the server has a token (TCP), /run and /metrics need it as 'Authorization: Bearer <token>'.
+    """
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send(200, b"ok\n", "text/plain")
+        elif self.path == "/metrics":
+            if self._authorized():
+                self._send(200, generate_latest(REGISTRY), CONTENT_TYPE_LATEST)
+        else:
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+
+    def do_POST(self):
+        if self.path != "/run":
+            self._send_json(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            args = json.loads(self.rfile.read(length))["args"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Expected a JSON body with 'args': {e}"})
+            return
+        if not args or args[0] not in DAEMON_COMMANDS:
+            self._send_json(400, {"error": f"The daemon runs only {', '.join(sorted(DAEMON_COMMANDS))}."})
+            return
+        self._send_json(200, run_command(self.server.cli, args, self.server.client_context))
+
+    def log_message(self, format, *args):
+        logging.debug("Daemon request: " + format, *args) # client_address is empty on a Unix socket
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if token is None:
+            return True # Unix socket: the file mode already limits it to the owner
+        scheme, _, given = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme == "Bearer" and hmac.compare_digest(given.encode(), token.encode()):
+            return True
+        self._send_json(401, {"error": "Missing or wrong daemon token."})
+        return False
+
+    def _send_json(self, status: int, body: dict):
+        self._send(status, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def run_command(cli: click.Group, args: list, client_context: ClientContext) -> dict:
+    """
+    Runs the CLI in this process with the daemon's warm client_context and returns its exit code
+    and output, the way running 'k8s_automation.py <args>' would have printed them.
+    """
+    with capture_output() as (stdout, stderr):
+        exit_code = 0
+        try:
+            cli.main(args=args, prog_name="k8s_automation.py", standalone_mode=False, obj=client_context)
+        except click.ClickException as e:
+            e.show(file=stderr)
+            exit_code = e.exit_code
+        except click.exceptions.Exit as e:
+            exit_code = e.exit_code
+        except click.Abort:
+            stderr.write("Aborted!\n")
+            exit_code = 1
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            logging.exception("Command %s failed", args)
+            exit_code = 1
+    return {"exit_code": exit_code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def serve(
+    cli: click.Group, client_context: ClientContext, socket_path: str = None, port: int = None, token_path: str = None
+):
+    """
+    Serves CLI commands on a Unix socket (mode 0600), or on 127.0.0.1:port when port is given or
+    Unix sockets aren't available, until interrupted. Any local user can connect to a port, so there
+    every request must carry a random token that is written to token_path (mode 0600) for the
+    owner's clients. Every command shares client_context, whose kubeconfig and connection pool
+    are set up once, before the first request.
+    """
+    install_output_capture()
+    client_context.api_client # Load the kubeconfig now rather than on the first request
+    get_async_runner(client_context) # And start the event loop the deployment and status commands run on
+
+    token = None
+    if port or not hasattr(socket, "AF_UNIX"):
+        server = ThreadingHTTPServer(("127.0.0.1", port or DEFAULT_PORT), DaemonRequestHandler)
+        address = f"http://127.0.0.1:{server.server_address[1]}"
+        token = secrets.token_urlsafe(32)
+        write_token_file(token_path, token)
+    else:
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left behind by a daemon that didn't shut down cleanly
+        old_umask = os.umask(0o177) # Only the owner may connect
+        try:
+            server = ThreadingUnixHTTPServer(socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        address = socket_path
+    server.cli = cli
+    server.client_context = client_context
+    server.token = token
+
+    logging.info("Serving %s on %s (Ctrl-C to stop).", ", ".join(sorted(DAEMON_COMMANDS)), address)
+    if token:
+        logging.info("Clients authenticate with the token in %s.", token_path)
+    signal.signal(signal.SIGTERM, signal.default_int_handler) # Stop on 'kill' the same way as on Ctrl-C
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for path in ([token_path] if token else [socket_path]):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def write_token_file(path: str, token: str):
+    """Writes the token to a new file only its owner can read."""
+    if os.path.exists(path):
+        os.remove(path) # A new file, so no other user can hold it open or have been granted access
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as token_file:
+        token_file.write(token)
@@ -0,0 +1,26 @@
+import os
+
+# Defaults shared by the library modules and the CLI options. This module imports nothing heavy,
+# so k8s_automation.py can declare its options without loading the Kubernetes client.
+
+DEFAULT_POOL_SIZE = 16 # Connections kept open to the API server
+DEFAULT_REQUEST_TIMEOUT = (5, 60) # (connect, read) seconds for calls that don't set their own timeout
+DEFAULT_QPS = 50 # Sustained API requests per second per cluster (client-side rate limit)
+DEFAULT_BURST = 100 # Requests allowed at once above DEFAULT_QPS
+DEFAULT_MAX_RETRIES = 5 # Retries of an API request after a 429, a 5xx or a dropped connection
+
+FIELD_MANAGER = "k8s-automation"
+DEFAULT_HELM_TIMEOUT = 600 # Seconds a Helm command may run before it is stopped and its release cleaned up
+
+DEFAULT_CHART_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'charts', 'my-app-chart')
+
+DEFAULT_FLUSH_ROWS = 4096 # Events buffered before a chunk is written
+DEFAULT_FLUSH_INTERVAL = 10.0 # Seconds; a partial chunk is written at least this often
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024 # Oldest chunks are deleted beyond this total size
+
+HPA_SYNC_PERIOD = 15 # Seconds between scaling decisions
+HPA_TOLERANCE = 0.1 # Ratios within 10% of the target don't scale
+
+DEFAULT_RECOMMENDATION_MARGIN = 0.15 # Headroom 'recommend' adds on top of the observed usage
+
+DEFAULT_CLUSTER_CONCURRENCY = 16 # Clusters worked on at once by --contexts/--all-contexts
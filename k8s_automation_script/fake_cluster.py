@@ -0,0 +1,707 @@
+import os
+import re
+import sys
+import copy
+import json
+import time
+import uuid
+import random
+import itertools
+import logging
+import threading
+import collections
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+# In-process stand-in for the Kubernetes API server and the helm/kubectl CLIs, so the commands can be
+# benchmarked without a cluster or network (see api_benchmark.py). Objects live in memory; every
+# resource under /api/v1 and /apis/<group>/<version> can be created, read, listed (with label and field
+# selectors and limit/continue), watched, patched (merge, strategic merge, JSON and server-side apply)
+# and deleted. Deployments report themselves rolled out and ScaledObjects Ready as soon as they are
+# written, the way a healthy cluster with KEDA would. Not a conformance test: just enough of the API
+# for the calls this tool makes.
+#
+#     with FakeApiServer(latency=0.005) as server:
+#         server.write_kubeconfig("fake-kubeconfig")
+#         install_stub_tools("bin", server.url) # then put bin first on PATH
+
+# kind -> (API path prefix, resource, namespaced)
+KINDS = {
+    "Namespace": ("/api/v1", "namespaces", False),
+    "Node": ("/api/v1", "nodes", False),
+    "Pod": ("/api/v1", "pods", True),
+    "Service": ("/api/v1", "services", True),
+    "ServiceAccount": ("/api/v1", "serviceaccounts", True),
+    "Event": ("/api/v1", "events", True),
+    "Deployment": ("/apis/apps/v1", "deployments", True),
+    "Ingress": ("/apis/networking.k8s.io/v1", "ingresses", True),
+    "HorizontalPodAutoscaler": ("/apis/autoscaling/v2", "horizontalpodautoscalers", True),
+    "ScaledObject": ("/apis/keda.sh/v1alpha1", "scaledobjects", True),
+    "CustomResourceDefinition": ("/apis/apiextensions.k8s.io/v1", "customresourcedefinitions", False),
+    "APIService": ("/apis/apiregistration.k8s.io/v1", "apiservices", False),
+}
+RESOURCE_KINDS = {(prefix, resource): kind for kind, (prefix, resource, _) in KINDS.items()}
+
+WATCH_HISTORY = 10000 # Events kept for watches that resume from a resourceVersion; older ones get 410 Gone
+FAKE_SERVER_VERSION = "v1.30.0-fake"
+FAKE_HELM_VERSION = "v3.15.2+gfake"
+
+# Helm flags that take a value, so the stub can tell them from the release name and chart
+HELM_VALUE_FLAGS = {
+    "--namespace", "-n", "-f", "--values", "--version", "--kubeconfig", "--kube-context", "--timeout", "--set"
+}
+
+
+class FakeApiServer:
+    """
+    The fake API server, listening on 127.0.0.1 on a free port from a background thread.
+    latency is added to every request (seconds); failure_rate of the requests (0-1) are answered
+    with failure_status instead, with a Retry-After header for 429s. requests counts the calls
+    by (verb, resource), e.g. ("list", "deployments"), and connections the TCP connections opened.
+    helm_commands holds the arguments of every stub helm run, and helm_releases the status of each
+    revision of the releases it installed. helm_delay is how long (seconds) an install or upgrade
+    takes, e.g. to interrupt one.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 500, seed: int = None, keda: bool = True):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.requests = collections.Counter()
+        self.connections = 0
+        self.helm_commands = []
+        self.helm_releases = {} # release -> Helm status of each revision, oldest first
+        self.helm_delay = 0.0
+        self._stopped = threading.Event()
+        self._random = random.Random(seed)
+        self._objects = {} # (prefix, resource, namespace, name) -> object
+        self._events = collections.deque(maxlen=WATCH_HISTORY) # (resourceVersion, type, key, object)
+        self._resource_version = 0
+        self._changed = threading.Condition()
+        self._server = None
+        self._thread = None
+        for namespace in ("default", "kube-system"):
+            self.add({"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": namespace}})
+        if keda:
+            seed_keda(self)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._server = _FakeHTTPServer(("127.0.0.1", 0), FakeApiRequestHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-api-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set() # Ends delayed helm runs
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            with self._changed:
+                self._changed.notify_all() # Ends open watches
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def write_kubeconfig(self, path: str, context: str = "fake"):
+        """Writes a kubeconfig whose current context points at this server."""
+        kubeconfig = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": context, "cluster": {"server": self.url}}],
+            "users": [{"name": context, "user": {"token": "fake"}}],
+            "contexts": [{"name": context, "context": {"cluster": context, "user": context}}],
+            "current-context": context,
+        }
+        with open(path, "w") as kubeconfig_file:
+            yaml.safe_dump(kubeconfig, kubeconfig_file)
+        return path
+
+    def add(self, obj: dict):
+        """Stores an object as if it had been created through the API; returns the stored copy."""
+        prefix, resource, namespaced = KINDS[obj["kind"]]
+        namespace = obj["metadata"].get("namespace", "default") if namespaced else ""
+        return self._write((prefix, resource, namespace, obj["metadata"]["name"]), copy.deepcopy(obj))[1]
+
+    def get(self, kind: str, name: str, namespace: str = "default"):
+        prefix, resource, namespaced = KINDS[kind]
+        obj = self._objects.get((prefix, resource, namespace if namespaced else "", name))
+        return copy.deepcopy(obj) if obj else None
+
+    def count(self, kind: str):
+        prefix, resource, _ = KINDS[kind]
+        return sum(1 for key in self._objects if key[:2] == (prefix, resource))
+
+    def _write(self, key, obj: dict, event_type: str = None):
+        """Stores obj under key, filling in the metadata and status the API server and controllers would."""
+        with self._changed:
+            old = self._objects.get(key)
+            prefix, resource, namespace, name = key
+            metadata = obj.setdefault("metadata", {})
+            metadata["name"] = name
+            if namespace:
+                metadata["namespace"] = namespace
+            kind = RESOURCE_KINDS.get((prefix, resource))
+            if kind:
+                obj.setdefault("kind", kind)
+                obj.setdefault("apiVersion", prefix.split("/", 2)[-1] if prefix.startswith("/apis/") else "v1")
+            if old:
+                metadata["uid"] = old["metadata"]["uid"]
+                metadata["creationTimestamp"] = old["metadata"]["creationTimestamp"]
+                generation = old["metadata"].get("generation", 1)
+                metadata["generation"] = generation + 1 if obj.get("spec") != old.get("spec") else generation
+            else:
+                metadata.setdefault("uid", str(uuid.uuid4()))
+                metadata.setdefault("creationTimestamp", _now())
+                metadata["generation"] = 1
+            self._resource_version += 1
+            metadata["resourceVersion"] = str(self._resource_version)
+            _simulate_controllers(resource, obj)
+            self._objects[key] = obj
+            self._events.append((self._resource_version, event_type or ("MODIFIED" if old else "ADDED"), key, copy.deepcopy(obj)))
+            self._changed.notify_all()
+            return old, copy.deepcopy(obj)
+
+    def _delete(self, key):
+        with self._changed:
+            obj = self._objects.pop(key, None)
+            if obj is not None:
+                self._resource_version += 1
+                self._events.append((self._resource_version, "DELETED", key, copy.deepcopy(obj)))
+                self._changed.notify_all()
+            return obj
+
+    def _list(self, prefix: str, resource: str, namespace: str, label_selector: str = None, field_selector: str = None):
+        with self._changed:
+            items = [
+                copy.deepcopy(obj) for (p, r, ns, _), obj in sorted(self._objects.items())
+                if p == prefix and r == resource and (namespace is None or ns == namespace)
+            ]
+            resource_version = str(self._resource_version)
+        return [obj for obj in items if _matches(obj, label_selector, field_selector)], resource_version
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose, e.g. when a watch has seen what it waited for or a retry gives up
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            logging.debug("Fake API server request failed", exc_info=True)
+
+
+class FakeApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Without TCP_NODELAY the body, written after the headers, waits for the client's delayed ACK
+    # (about 40 ms) on every keep-alive request, which would swamp what the benchmarks measure
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.fake._changed:
+            self.fake.connections += 1
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        logging.debug("Fake API server: " + format, *args)
+
+    @property
+    def fake(self) -> FakeApiServer:
+        return self.server.fake
+
+    def _handle(self, method: str):
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        body = self._read_body()
+        if parts.path.startswith("/fake/"):
+            return self._send(200, handle_stub_command(self.fake, parts.path, body))
+
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        route = _route(parts.path)
+        verb = _verb(method, route, query)
+        self.fake.requests[(verb, route["resource"] if route else parts.path)] += 1
+        if self.fake.failure_rate and self.fake._random.random() < self.fake.failure_rate:
+            headers = {"Retry-After": "1"} if self.fake.failure_status == 429 else {}
+            return self._send(self.fake.failure_status, _status(self.fake.failure_status, "Injected failure"), headers)
+
+        if parts.path.rstrip("/") == "/version":
+            return self._send(200, {"major": "1", "minor": "30", "gitVersion": FAKE_SERVER_VERSION, "platform": "linux/amd64"})
+        if route is None:
+            return self._send(404, _status(404, f"the server could not find the requested resource ({parts.path})"))
+        try:
+            if verb == "watch":
+                return self._watch(route, query)
+            status, result = self._dispatch(verb, method, route, query, body)
+        except ValueError as e:
+            status, result = 400, _status(400, str(e))
+        self._send(status, result)
+
+    def _dispatch(self, verb: str, method: str, route: dict, query: dict, body: bytes):
+        fake = self.fake
+        key = (route["prefix"], route["resource"], route["namespace"] or "", route["name"])
+        if verb == "list":
+            return 200, self._list_response(route, query)
+        if verb == "get":
+            obj = fake._objects.get(key)
+            return (200, copy.deepcopy(obj)) if obj else (404, _status(404, f"{route['resource']} \"{route['name']}\" not found"))
+        if verb == "delete":
+            obj = fake._delete(key)
+            return (200, obj) if obj else (404, _status(404, f"{route['resource']} \"{route['name']}\" not found"))
+
+        if route["namespace"] and not fake._objects.get(("/api/v1", "namespaces", "", route["namespace"])):
+            return 404, _status(404, f"namespaces \"{route['namespace']}\" not found")
+        content_type = (self.headers.get("Content-Type") or "application/json").split(";")[0]
+        if verb == "create":
+            obj = _parse_body(body, content_type)
+            key = key[:3] + (obj.get("metadata", {}).get("name"),)
+            if fake._objects.get(key):
+                return 409, _status(409, f"{route['resource']} \"{key[3]}\" already exists", "AlreadyExists")
+            return 201, fake._write(key, obj)[1]
+        if verb == "update":
+            obj = _parse_body(body, content_type)
+            if route["subresource"] == "status" and fake._objects.get(key):
+                obj = dict(copy.deepcopy(fake._objects[key]), status=obj.get("status"))
+            old, stored = fake._write(key, obj)
+            return (200 if old else 201), stored
+
+        # PATCH
+        existing = copy.deepcopy(fake._objects.get(key))
+        if content_type == "application/apply-patch+yaml":
+            patched = _merge(existing or {}, _parse_body(body, content_type))
+        elif existing is None:
+            return 404, _status(404, f"{route['resource']} \"{route['name']}\" not found")
+        elif content_type == "application/json-patch+json":
+            patched = _json_patch(existing, json.loads(body))
+        else: # Merge and strategic merge patches; lists are replaced rather than merged by key
+            patched = _merge(existing, _parse_body(body, content_type))
+        old, stored = fake._write(key, patched)
+        return (200 if old else 201), stored
+
+    def _list_response(self, route: dict, query: dict):
+        items, resource_version = self.fake._list(
+            route["prefix"], route["resource"], route["namespace"], query.get("labelSelector"), query.get("fieldSelector")
+        )
+        start = int(query.get("continue") or 0)
+        limit = int(query.get("limit") or 0)
+        page = items[start:start + limit] if limit else items[start:]
+        more = bool(limit) and start + limit < len(items)
+        kind = RESOURCE_KINDS.get((route["prefix"], route["resource"]), "")
+        metadata = {"resourceVersion": resource_version, **({"continue": str(start + limit)} if more else {})}
+        if "as=PartialObjectMetadataList" in (self.headers.get("Accept") or ""):
+            return {
+                "apiVersion": "meta.k8s.io/v1", "kind": "PartialObjectMetadataList", "metadata": metadata,
+                "items": [{"apiVersion": "meta.k8s.io/v1", "kind": "PartialObjectMetadata", "metadata": item["metadata"]} for item in page],
+            }
+        api_version = route["prefix"].split("/", 2)[-1] if route["prefix"].startswith("/apis/") else "v1"
+        return {"apiVersion": api_version, "kind": f"{kind}List", "metadata": metadata, "items": page}
+
+    def _watch(self, route: dict, query: dict):
+        """Streams watch events as chunked JSON lines until timeoutSeconds passes or the server stops."""
+        fake = self.fake
+        deadline = time.monotonic() + float(query.get("timeoutSeconds") or 60)
+        label_selector, field_selector = query.get("labelSelector"), query.get("fieldSelector")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        since = query.get("resourceVersion")
+        if since and since != "0":
+            since = int(since)
+            oldest = fake._events[0][0] if fake._events else fake._resource_version + 1
+            if since < oldest - 1:
+                self._write_chunk({"type": "ERROR", "object": _status(410, "too old resource version", "Expired")})
+                return self._write_chunk(None)
+        else:
+            items, resource_version = fake._list(route["prefix"], route["resource"], route["namespace"], label_selector, field_selector)
+            for item in items:
+                self._write_chunk({"type": "ADDED", "object": item})
+            since = int(resource_version)
+
+        while fake._server and time.monotonic() < deadline:
+            with fake._changed:
+                events = list(itertools.takewhile(lambda event: event[0] > since, reversed(fake._events)))[::-1]
+                if not events:
+                    fake._changed.wait(timeout=max(0, min(1, deadline - time.monotonic())))
+                    continue
+            for resource_version, event_type, key, obj in events:
+                since = resource_version
+                if key[:2] == (route["prefix"], route["resource"]) and route["namespace"] in (None, key[2]) \
+                        and _matches(obj, label_selector, field_selector):
+                    self._write_chunk({"type": event_type, "object": obj})
+        self._write_chunk(None)
+
+    def _write_chunk(self, event):
+        data = json.dumps(event).encode() + b"\n" if event is not None else b""
+        try:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def seed_keda(server: FakeApiServer):
+    """Adds what a healthy KEDA install has: its CRDs, its Deployments and the external metrics APIService."""
+    from install_utils import KEDA_NAMESPACE, KEDA_DEPLOYMENTS, KEDA_CRDS, KEDA_METRICS_API_SERVICE
+    server.add({"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": KEDA_NAMESPACE}})
+    for name in KEDA_CRDS:
+        plural, group = name.split(".", 1)
+        server.add({
+            "apiVersion": "apiextensions.k8s.io/v1", "kind": "CustomResourceDefinition", "metadata": {"name": name},
+            "spec": {"group": group, "scope": "Namespaced", "names": {"plural": plural, "kind": plural.capitalize()[:-1]}, "versions": []},
+        })
+    for name in KEDA_DEPLOYMENTS:
+        server.add(fake_deployment(name, KEDA_NAMESPACE))
+    server.add({
+        "apiVersion": "apiregistration.k8s.io/v1", "kind": "APIService", "metadata": {"name": KEDA_METRICS_API_SERVICE},
+        "spec": {"group": "external.metrics.k8s.io", "version": "v1beta1", "groupPriorityMinimum": 100, "versionPriority": 100},
+    })
+
+
+def seed_objects(server: FakeApiServer, count: int, namespace: str = "bench"):
+    """Adds count Nodes and Namespaces, and count Deployments with a ScaledObject each in namespace."""
+    server.add({"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": namespace}})
+    for index in range(count):
+        server.add({"apiVersion": "v1", "kind": "Node", "metadata": {"name": f"node-{index}"}})
+        server.add({"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": f"team-{index}"}})
+        name = f"app-{index}"
+        server.add(fake_deployment(name, namespace))
+        server.add({
+            "apiVersion": "keda.sh/v1alpha1", "kind": "ScaledObject",
+            "metadata": {"name": f"{name}-scaledobject", "namespace": namespace},
+            "spec": {"scaleTargetRef": {"name": name}, "minReplicaCount": 1, "maxReplicaCount": 10,
+                     "triggers": [{"type": "cpu", "metadata": {"value": "50"}}]},
+        })
+
+
+def fake_deployment(name: str, namespace: str, replicas: int = 1):
+    labels = {"app": name}
+    return {
+        "apiVersion": "apps/v1", "kind": "Deployment",
+        "metadata": {"name": name, "namespace": namespace, "labels": labels},
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": labels},
+            "template": {"metadata": {"labels": labels}, "spec": {"containers": [{"name": name, "image": "nginx"}]}},
+        },
+    }
+
+
+def install_stub_tools(directory: str, server_url: str):
+    """
+    Writes 'helm' and 'kubectl' stubs into directory that hand their arguments to the fake server,
+    which renders and applies charts in-process. Put directory first on PATH to use them.
+    Helm's install, upgrade, template, history, uninstall, rollback, repo and version commands are understood;
+    kubectl understands 'version' and 'get'.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for tool in ("helm", "kubectl"):
+        path = os.path.join(directory, tool)
+        with open(path, "w") as stub:
+            stub.write(STUB_TEMPLATE.format(python=sys.executable, tool=tool, url=server_url))
+        os.chmod(path, 0o755)
+    return directory
+
+
+# Standard library only, so a stub starts as fast as Python does
+STUB_TEMPLATE = '''#!{python}
+import os, sys, json, urllib.request
+args = sys.argv[1:]
+files = {{}}
+for flag, value in zip(args, args[1:]):
+    if flag in ("-f", "--values") and os.path.exists(value):
+        with open(value) as values_file:
+            files[value] = values_file.read()
+request = urllib.request.Request(
+    "{url}/fake/{tool}", data=json.dumps({{"args": args, "files": files, "cwd": os.getcwd()}}).encode(),
+    headers={{"Content-Type": "application/json"}}, method="POST"
+)
+with urllib.request.urlopen(request) as response:
+    result = json.load(response)
+sys.stdout.write(result["stdout"])
+sys.stderr.write(result["stderr"])
+sys.exit(result["exit_code"])
+'''
+
+
+def handle_stub_command(server: FakeApiServer, path: str, body: bytes):
+    """Runs a stub helm or kubectl command; returns {"exit_code", "stdout", "stderr"}."""
+    request = json.loads(body)
+    try:
+        if path == "/fake/helm":
+            return _run_helm(server, request["args"], request["files"], request["cwd"])
+        return _run_kubectl(server, request["args"])
+    except Exception as e:
+        return {"exit_code": 1, "stdout": "", "stderr": f"Error: {e}\n"}
+
+
+def _run_helm(server: FakeApiServer, args: list, files: dict, cwd: str):
+    server.helm_commands.append(args)
+    command = args[0] if args else ""
+    if command == "version":
+        return _result(FAKE_HELM_VERSION + "\n")
+    if command == "history":
+        history = server.helm_releases.get(args[1])
+        if history is None:
+            return _result(stderr="Error: release: not found\n", exit_code=1)
+        return _result(json.dumps([{"revision": index + 1, "status": status} for index, status in enumerate(history)]))
+    if command == "uninstall":
+        server.helm_releases.pop(args[1], None)
+        return _result()
+    if command in ("repo", "rollback", "status"):
+        return _result()
+    if command not in ("install", "upgrade", "template"):
+        return _result(stderr=f"Error: unknown command \"{command}\" for \"helm\"\n", exit_code=1)
+
+    positional, options, flag = [], {}, None
+    for arg in args[1:]:
+        if flag:
+            options.setdefault(flag, []).append(arg)
+            flag = None
+        elif arg in HELM_VALUE_FLAGS:
+            flag = arg
+        elif not arg.startswith("-"):
+            positional.append(arg)
+        else:
+            options[arg] = True
+    release_name, chart = positional[0], positional[1]
+    namespace = (options.get("--namespace") or options.get("-n") or ["default"])[-1]
+    values = {}
+    for values_path in options.get("-f", []) + options.get("--values", []):
+        values = _merge(values, yaml.safe_load(files.get(values_path, "")) or {})
+
+    if release_name == "keda":
+        if not server.get("Namespace", namespace) and "--create-namespace" not in options:
+            return _result(stderr=f"Error: namespaces \"{namespace}\" not found\n", exit_code=1)
+        if command != "template":
+            seed_keda(server)
+        return _result(f"Release \"keda\" has been upgraded. Happy Helming!\nNAMESPACE: {namespace}\n")
+
+    from render_utils import render_chart
+    manifests = render_chart(release_name, namespace, os.path.join(cwd, chart), values)
+    if command == "template":
+        return _result(yaml.safe_dump_all(manifests, default_flow_style=False))
+    if not server.get("Namespace", namespace):
+        if "--create-namespace" not in options:
+            return _result(stderr=f"Error: namespaces \"{namespace}\" not found\n", exit_code=1)
+        server.add({"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": namespace}})
+    # Like Helm, record the revision as pending before applying anything
+    history = server.helm_releases.setdefault(release_name, [])
+    history.append("pending-upgrade" if history else "pending-install")
+    if server.helm_delay and server._stopped.wait(server.helm_delay):
+        return _result(stderr="Error: the fake API server stopped\n", exit_code=1)
+    for manifest in manifests:
+        if manifest.get("kind") in KINDS:
+            manifest.setdefault("metadata", {}).setdefault("namespace", namespace)
+            server.add(manifest)
+    history[:] = ["superseded" if status == "deployed" else status for status in history[:-1]] + ["deployed"]
+    return _result(f"NAME: {release_name}\nNAMESPACE: {namespace}\nSTATUS: deployed\n")
+
+
+def _run_kubectl(server: FakeApiServer, args: list):
+    if args[:1] == ["version"]:
+        return _result(f"Client Version: {FAKE_SERVER_VERSION}\nServer Version: {FAKE_SERVER_VERSION}\n")
+    if args[:1] == ["get"] and len(args) > 1:
+        kind = next((k for k, (_, resource, _) in KINDS.items() if args[1] in (resource, resource[:-1], k.lower())), None)
+        if kind is None:
+            return _result(stderr=f"error: the server doesn't have a resource type \"{args[1]}\"\n", exit_code=1)
+        namespace = next((value for flag, value in zip(args, args[1:]) if flag in ("-n", "--namespace")), "default")
+        name = args[2] if len(args) > 2 and not args[2].startswith("-") else None
+        prefix, resource, namespaced = KINDS[kind]
+        if name:
+            obj = server.get(kind, name, namespace)
+            if obj is None:
+                return _result(stderr=f"Error from server (NotFound): {resource} \"{name}\" not found\n", exit_code=1)
+            return _result(json.dumps(obj, indent=2) + "\n")
+        items, _ = server._list(prefix, resource, namespace if namespaced else "")
+        return _result(json.dumps({"apiVersion": "v1", "kind": "List", "items": items}, indent=2) + "\n")
+    return _result(stderr=f"error: unsupported kubectl command: {' '.join(args)}\n", exit_code=1)
+
+
+def _result(stdout: str = "", stderr: str = "", exit_code: int = 0):
+    return {"exit_code": exit_code, "stdout": stdout, "stderr": stderr}
+
+
+def _route(path: str):
+    """Splits an API path into prefix, namespace, resource, name and subresource; None if it isn't one."""
+    segments = [segment for segment in path.split("/") if segment]
+    if segments[:1] == ["api"] and len(segments) >= 3:
+        prefix, rest = "/" + "/".join(segments[:2]), segments[2:]
+    elif segments[:1] == ["apis"] and len(segments) >= 4:
+        prefix, rest = "/" + "/".join(segments[:3]), segments[3:]
+    else:
+        return None
+    namespace = None
+    if rest[0] == "namespaces" and len(rest) >= 3:
+        namespace, rest = rest[1], rest[2:]
+    return {
+        "prefix": prefix,
+        "namespace": namespace,
+        "resource": rest[0],
+        "name": rest[1] if len(rest) > 1 else None,
+        "subresource": rest[2] if len(rest) > 2 else None,
+    }
+
+
+def _verb(method: str, route: dict, query: dict):
+    if route is None:
+        return method.lower()
+    named = route["name"] is not None
+    if method == "GET":
+        # Parsed like Go's strconv.ParseBool, as the API server does: kubernetes_asyncio sends "True"
+        return "watch" if query.get("watch") in ("1", "t", "T", "true", "TRUE", "True") else ("get" if named else "list")
+    if method == "POST":
+        return "create"
+    if method == "PUT":
+        return "update"
+    if method == "DELETE":
+        return "delete"
+    return "patch"
+
+
+def _simulate_controllers(resource: str, obj: dict):
+    """Fills in the status a healthy cluster would report shortly after the write."""
+    if resource == "deployments":
+        replicas = obj.get("spec", {}).get("replicas", 1)
+        obj["status"] = {
+            "observedGeneration": obj["metadata"]["generation"],
+            "replicas": replicas, "updatedReplicas": replicas, "readyReplicas": replicas, "availableReplicas": replicas,
+            "conditions": [
+                {"type": "Available", "status": "True", "reason": "MinimumReplicasAvailable", "message": "Deployment has minimum availability."},
+                {"type": "Progressing", "status": "True", "reason": "NewReplicaSetAvailable", "message": "ReplicaSet has successfully progressed."},
+            ],
+        }
+    elif resource == "scaledobjects":
+        obj["status"] = {"conditions": [
+            {"type": "Ready", "status": "True", "reason": "ScaledObjectReady"},
+            {"type": "Active", "status": "False", "reason": "ScalerNotActive"},
+        ]}
+    elif resource == "customresourcedefinitions":
+        obj["status"] = {"conditions": [{"type": "Established", "status": "True", "reason": "InitialNamesAccepted"}]}
+    elif resource == "apiservices":
+        obj["status"] = {"conditions": [{"type": "Available", "status": "True", "reason": "Passed"}]}
+
+
+def _matches(obj: dict, label_selector: str = None, field_selector: str = None):
+    labels = obj.get("metadata", {}).get("labels") or {}
+    for term in _split_selector(label_selector):
+        match = re.fullmatch(r"\s*(!?)([\w./-]+)\s*(?:(==|=|!=)\s*([\w./-]*)|\s+(in|notin)\s*\(([^)]*)\))?\s*", term)
+        if not match:
+            raise ValueError(f"unable to parse requirement: {term}")
+        negated, key, operator, value, set_operator, values = match.groups()
+        if operator in ("=", "=="):
+            ok = labels.get(key) == value
+        elif operator == "!=":
+            ok = labels.get(key) != value
+        elif set_operator:
+            ok = (labels.get(key) in [v.strip() for v in values.split(",")]) == (set_operator == "in")
+        else:
+            ok = (key in labels) != bool(negated)
+        if not ok:
+            return False
+    for term in _split_selector(field_selector):
+        key, operator, value = re.fullmatch(r"\s*([\w.]+)\s*(==|=|!=)\s*(.*?)\s*", term).groups()
+        actual = obj
+        for part in key.split("."):
+            actual = actual.get(part) if isinstance(actual, dict) else None
+        if (str(actual) == value if actual is not None else value == "") != (operator != "!="):
+            return False
+    return True
+
+
+def _split_selector(selector: str):
+    """Selector terms split on the commas outside parentheses."""
+    return [term for term in re.split(r",(?![^(]*\))", selector or "") if term.strip()]
+
+
+def _parse_body(body: bytes, content_type: str):
+    if not body:
+        return {}
+    try:
+        return json.loads(body)
+    except ValueError:
+        if content_type.endswith("yaml"):
+            return yaml.safe_load(body) or {}
+        raise ValueError("request body is not valid JSON")
+
+
+def _merge(target: dict, patch: dict):
+    """JSON merge patch: dicts are merged recursively, None deletes, everything else replaces."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    merged = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = _merge(merged.get(key), value) if isinstance(value, dict) else copy.deepcopy(value)
+    return merged
+
+
+def _json_patch(target: dict, operations: list):
+    for operation in operations:
+        *parents, last = [part.replace("~1", "/").replace("~0", "~") for part in operation["path"].split("/")[1:]]
+        node = target
+        for part in parents:
+            node = node[int(part)] if isinstance(node, list) else node.setdefault(part, {})
+        if operation["op"] in ("add", "replace"):
+            if isinstance(node, list):
+                node.insert(len(node) if last == "-" else int(last), operation["value"]) if operation["op"] == "add" \
+                    else node.__setitem__(int(last), operation["value"])
+            else:
+                node[last] = operation["value"]
+        elif operation["op"] == "remove":
+            del node[int(last) if isinstance(node, list) else last]
+        else:
+            raise ValueError(f"unsupported JSON patch operation '{operation['op']}'")
+    return target
+
+
+def _status(code: int, message: str, reason: str = None):
+    reasons = {400: "BadRequest", 404: "NotFound", 409: "Conflict", 410: "Expired", 429: "TooManyRequests", 500: "InternalError"}
+    return {
+        "kind": "Status", "apiVersion": "v1", "metadata": {}, "status": "Failure",
+        "message": message, "reason": reason or reasons.get(code, "Unknown"), "code": code,
+    }
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,199 @@
+import subprocess
+import time
+import asyncio
+
+import yaml
+from tabulate import tabulate
+
+from async_client_utils import AsyncClientContext, run_blocking
+from async_deployment_utils import create_keda_deployment_with_helm
+from client_utils import ClientContext, get_client_context
+from defaults import DEFAULT_CHART_PATH, DEFAULT_HELM_TIMEOUT
+from log_utils import log_event
+from profile_utils import span
+from wait_utils import DEFAULT_WAIT_TIMEOUT
+
+# Fleet file keys use the same names as the create-deployment CLI options.
+# Maps each key to the matching keyword argument of create_keda_deployment_with_helm.
+FLEET_KEYS = {
+    "name": "release_name",
+    "namespace": "namespace",
+    "chart-path": "chart_path",
+    "image": "image",
+    "tag": "tag",
+    "cpu-req": "cpu_request",
+    "cpu-limit": "cpu_limit",
+    "mem-req": "mem_request",
+    "mem-limit": "mem_limit",
+    "port": "container_port",
+    "min-replicas": "min_replicas",
+    "max-replicas": "max_replicas",
+    "scaling-metric-type": "scaling_metric_type",
+    "scaling-metric-value": "scaling_metric_value",
+    "event-source-config": "event_source_config",
+    "wait-timeout": "wait_timeout",
+    "helm-timeout": "helm_timeout",
+    "engine": "engine",
+    "idempotent": "idempotent",
+}
+
+# Same defaults as the create-deployment command
+FLEET_DEFAULTS = {
+    "namespace": "default",
+    "chart-path": DEFAULT_CHART_PATH,
+    "tag": "latest",
+    "cpu-req": "100m",
+    "cpu-limit": "200m",
+    "mem-req": "128Mi",
+    "mem-limit": "256Mi",
+    "port": 80,
+    "min-replicas": 1,
+    "max-replicas": 10,
+    "event-source-config": {},
+    "wait-timeout": DEFAULT_WAIT_TIMEOUT,
+    "helm-timeout": DEFAULT_HELM_TIMEOUT,
+    "engine": "helm",
+    "idempotent": False,
+}
+
+REQUIRED_FLEET_KEYS = ["name", "image", "scaling-metric-type", "scaling-metric-value"]
+
+
+def load_fleet_file(path: str):
+    """
+    Reads a fleet file and returns one keyword-argument dict per release.
+
+    The file holds an optional 'defaults' mapping and a 'releases' list, e.g.:
+
+        defaults:
+          namespace: apps
+          scaling-metric-type: cpu
+        releases:
+          - name: orders
+            image: my-repo/orders
+            scaling-metric-value: "50"
+    """
+    with open(path) as fleet_file:
+        fleet = yaml.safe_load(fleet_file) or {}
+
+    defaults = dict(FLEET_DEFAULTS)
+    defaults.update(_normalize_keys(fleet.get("defaults") or {}))
+
+    releases = []
+    seen = set()
+    for index, entry in enumerate(fleet.get("releases") or []):
+        spec = dict(defaults)
+        spec.update(_normalize_keys(entry))
+
+        missing = [key for key in REQUIRED_FLEET_KEYS if spec.get(key) in (None, "")]
+        if missing:
+            raise ValueError(f"Release #{index + 1} in '{path}' is missing: {', '.join(missing)}")
+        unknown = [key for key in spec if key not in FLEET_KEYS]
+        if unknown:
+            raise ValueError(f"Release '{spec['name']}' in '{path}' has unknown keys: {', '.join(unknown)}")
+        if (spec["namespace"], spec["name"]) in seen:
+            raise ValueError(f"Release '{spec['name']}' is listed twice for namespace '{spec['namespace']}'")
+        seen.add((spec["namespace"], spec["name"]))
+
+        spec["scaling-metric-value"] = str(spec["scaling-metric-value"])
+        releases.append({FLEET_KEYS[key]: value for key, value in spec.items()})
+
+    return releases
+
+
+def _normalize_keys(mapping: dict):
+    """Accepts both 'cpu-req' and 'cpu_req' style keys."""
+    return {key.replace('_', '-'): value for key, value in mapping.items()}
+
+
+def deploy_fleet(releases: list, concurrency: int = 4, client_context: ClientContext = None):
+    """
+    Installs many Helm releases, at most concurrency at a time, sharing one API client.
+    Returns one result dict per release, in the order of the fleet file.
+
+    The installs run as tasks on the client's event loop thread (async_client_utils.AsyncRunner).
+    On Ctrl-C they are cancelled: running Helm processes are stopped and their releases rolled back,
+    releases that haven't started are skipped, and the KeyboardInterrupt is raised once that is done.
+    """
+    client_context = client_context or get_client_context()
+    # Each install watches its rollout, which holds a connection, so size the pool to match
+    client_context.ensure_pool_size(concurrency * 2)
+
+    started = time.monotonic()
+    results = run_blocking(_deploy_releases, releases, concurrency, client_context=client_context)
+
+    log_event(
+        "fleet.rollout", releases=len(releases), failed=sum(1 for result in results if not result["ok"]),
+        seconds=round(time.monotonic() - started, 3)
+    )
+    return results
+
+
+async def _deploy_releases(releases: list, concurrency: int, client_context: AsyncClientContext):
+    limit = asyncio.Semaphore(concurrency)
+    # _deploy_release only raises when cancelled. return_exceptions makes a cancelled gather wait
+    # for every install to finish its cleanup, instead of returning when the first one is cancelled.
+    return await asyncio.gather(
+        *(_deploy_release(release, limit, client_context) for release in releases), return_exceptions=True
+    )
+
+
+async def _deploy_release(release: dict, limit: asyncio.Semaphore, client_context: AsyncClientContext):
+    """Runs one Helm install and records its duration. Never raises, except when cancelled."""
+    async with limit:
+        started = time.monotonic()
+        error = None
+        details = None
+        try:
+            with span("release", release=release["release_name"], namespace=release["namespace"]):
+                details = await create_keda_deployment_with_helm(client_context=client_context, **release)
+            if not details:
+                error = "Deployment details could not be retrieved"
+        except subprocess.CalledProcessError as e:
+            error = (e.stderr or "").strip() or str(e)
+        except subprocess.TimeoutExpired as e:
+            error = f"Helm did not finish within {e.timeout:g}s; the release was rolled back"
+        except Exception as e:
+            error = str(e).strip() or e.__class__.__name__
+
+    return {
+        "release": release["release_name"],
+        "namespace": release["namespace"],
+        "ok": error is None,
+        "seconds": time.monotonic() - started,
+        "error": error,
+        "details": details,
+    }
+
+
+def print_fleet_report(results: list, wall_seconds: float):
+    """Prints the per-release timing table."""
+    rows = [
+        [
+            result["release"],
+            result["namespace"],
+            _report_status(result),
+            f"{result['seconds']:.1f}",
+            _first_line(result["error"]) if result["error"] else "",
+        ]
+        for result in sorted(results, key=lambda r: r["seconds"], reverse=True)
+    ]
+    succeeded = sum(1 for result in results if result["ok"])
+    serial_seconds = sum(result["seconds"] for result in results)
+
+    print("\n--- Fleet Rollout Summary ---")
+    print(tabulate(rows, headers=["Release", "Namespace", "Status", "Duration (s)", "Error"], tablefmt="grid"))
+    print(f"{succeeded}/{len(results)} release(s) deployed in {wall_seconds:.1f}s "
+          f"(sum of release durations: {serial_seconds:.1f}s)")
+    print("-----------------------------\n")
+
+
+def _report_status(result: dict):
+    if not result["ok"]:
+        return "FAILED"
+    return "UNCHANGED" if (result["details"] or {}).get("unchanged") else "OK"
+
+
+def _first_line(text: str, width: int = 80):
+    line = text.splitlines()[0] if text else ""
+    return line if len(line) <= width else line[:width - 3] + "..."
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+import subprocess
+
+from defaults import DEFAULT_HELM_TIMEOUT
+from metrics_utils import RETRIES, time_helm
+from profile_utils import record_helm_phases
+from retry_utils import HELM_RETRY_POLICY, is_transient_helm_error
+
+HELM_CLEANUP_TIMEOUT = 120 # Seconds the rollback or uninstall after an interrupted install may take
+TERMINATE_GRACE = 5 # Seconds Helm gets to exit after SIGTERM before it is killed
+
+# Helm's own statuses for a revision that was live at some point, so it can be rolled back to
+ROLLBACK_STATUSES = {"deployed", "superseded"}
+
+# Helm runs in its own session (POSIX) or process group (Windows), so a Ctrl-C reaches us first and
+# Helm is stopped in order. Only POSIX has killpg to signal the whole group, Helm plugins included.
+if hasattr(os, "killpg"):
+    SUBPROCESS_GROUP = {"start_new_session": True}
+else:
+    SUBPROCESS_GROUP = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+
+async def run_helm(
+    args: list,
+    release: str = None,
+    namespace: str = None,
+    timeout: float = DEFAULT_HELM_TIMEOUT,
+    cleanup: bool = False,
+    retry: bool = True,
+    retry_args: list = None, # Arguments for the retries, e.g. 'upgrade --install' for an 'install' that may have got halfway
+    log_output: bool = True # False logs Helm's output at DEBUG, for commands whose output is parsed
+):
+    """
+    Runs 'helm *args' as an asyncio subprocess and returns (stdout, stderr). Many runs can be awaited
+    at once on one event loop; no thread is needed per process or pipe.
+
+    Each line Helm prints is logged as it arrives, tagged with the release and stream. Failures
+    caused by a busy or unreachable API server are retried with backoff when retry is set.
+    When the run takes longer than timeout seconds, or the awaiting task is cancelled (Ctrl-C),
+    Helm is stopped; with cleanup set the release is then rolled back to its last good revision,
+    or uninstalled when it never had one, so it isn't left pending.
+
+    Raises subprocess.CalledProcessError when Helm fails, subprocess.TimeoutExpired when it runs
+    out of time and FileNotFoundError when it isn't installed.
+    """
+    command = ['helm', *args]
+    deadline = time.monotonic() + timeout if timeout else None
+    attempt = 0
+    while True:
+        try:
+            returncode, stdout, stderr = await _run_until(command, release, deadline, log_output)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if cleanup and release:
+                # Shielded: a second Ctrl-C must not leave the release half cleaned up
+                await asyncio.shield(cleanup_release(release, namespace, _kube_args(args)))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise subprocess.TimeoutExpired(command, timeout) from None
+
+        if returncode == 0:
+            return stdout, stderr
+        if not (retry and is_transient_helm_error(stderr) and attempt < HELM_RETRY_POLICY.max_retries):
+            raise subprocess.CalledProcessError(returncode, command, stdout, stderr)
+        delay = HELM_RETRY_POLICY.delay(attempt)
+        if deadline and time.monotonic() + delay >= deadline:
+            raise subprocess.CalledProcessError(returncode, command, stdout, stderr)
+        RETRIES.labels("helm").inc()
+        logging.warning("helm %s%s could not reach the API server, retrying in %.1fs", args[0], _for(release), delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+        command = ['helm', *(retry_args or args)]
+
+
+async def cleanup_release(release: str, namespace: str = None, kube_args: list = None):
+    """
+    Leaves an interrupted release in a known state: rolled back to its last deployed revision, or
+    uninstalled when no revision was ever deployed. Logs rather than raises when that fails.
+    """
+    scope = [*(['--namespace', namespace] if namespace else []), *(kube_args or [])]
+    try:
+        stdout, _ = await run_helm(
+            ['history', release, '--max', '20', '--output', 'json', *scope], timeout=HELM_CLEANUP_TIMEOUT, log_output=False
+        )
+        history = json.loads(stdout or "[]")
+    except subprocess.CalledProcessError as e:
+        if "not found" in (e.stderr or ""):
+            return # Helm was stopped before it recorded the release
+        logging.error("Could not read the history of release '%s' to clean it up: %s", release, (e.stderr or '').strip())
+        return
+    except (subprocess.TimeoutExpired, ValueError) as e:
+        logging.error("Could not read the history of release '%s' to clean it up: %s", release, e)
+        return
+
+    good = [entry["revision"] for entry in history[:-1] if entry.get("status") in ROLLBACK_STATUSES]
+    if history and history[-1].get("status") == "deployed":
+        return # The interrupted run had already finished its part
+    cleanup_args = ['rollback', release, str(good[-1])] if good else ['uninstall', release]
+    logging.warning("Cleaning up interrupted release '%s': helm %s", release, ' '.join(cleanup_args))
+    try:
+        await run_helm([*cleanup_args, *scope], release=release, timeout=HELM_CLEANUP_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logging.error("Cleaning up release '%s' failed, check it with 'helm status %s': %s", release, release, e)
+
+
+async def _run_until(command: list, release: str, deadline: float, log_output: bool):
+    """One Helm run, streamed; returns (exit code, stdout, stderr). Stops Helm on timeout or cancellation."""
+    label = "_".join(command[1:3]) if command[1] == "repo" else command[1]
+    stdout_lines, stderr_lines = [], []
+    try:
+        with time_helm(label):
+            started = time.monotonic_ns()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **SUBPROCESS_GROUP
+                )
+            except FileNotFoundError:
+                logging.error("Error: 'helm' command not found. Please ensure Helm CLI is installed and in your PATH.")
+                raise
+            try:
+                remaining = deadline - time.monotonic() if deadline else None
+                await asyncio.wait_for(
+                    _communicate(process, stdout_lines, stderr_lines, release, log_output), timeout=remaining
+                )
+            except BaseException:
+                await asyncio.shield(_stop(process))
+                raise
+            finally:
+                record_helm_phases(started, time.monotonic_ns(), stderr_lines)
+            if process.returncode != 0:
+                # Raised inside time_helm so the run is counted as a failure
+                raise subprocess.CalledProcessError(process.returncode, command, _join(stdout_lines), _join(stderr_lines))
+    except subprocess.CalledProcessError as e:
+        return e.returncode, e.output, e.stderr
+    return 0, _join(stdout_lines), _join(stderr_lines)
+
+
+async def _communicate(process, stdout_lines: list, stderr_lines: list, release: str, log_output: bool):
+    await asyncio.gather(
+        _stream(process.stdout, stdout_lines, release, "stdout", log_output),
+        _stream(process.stderr, stderr_lines, release, "stderr", log_output),
+        process.wait()
+    )
+
+
+async def _stream(stream: asyncio.StreamReader, lines: list, release: str, name: str, log_output: bool):
+    """Logs each line of a Helm output stream as it arrives and keeps (monotonic ns, text) for later."""
+    async for raw in stream:
+        line = raw.decode(errors="replace")
+        lines.append((time.monotonic_ns(), line))
+        text = line.rstrip()
+        if not text:
+            continue
+        if "[debug]" in text or not log_output:
+            level = logging.DEBUG
+        else:
+            level = logging.INFO if name == "stdout" else logging.WARNING
+        logging.log(level, "helm%s: %s", _for(release), text, extra={"helm_release": release, "helm_stream": name})
+
+
+async def _stop(process):
+    """
+    SIGTERM, then SIGKILL if Helm doesn't exit within TERMINATE_GRACE; to its whole process group
+    where there is killpg. On Windows both are TerminateProcess on Helm itself.
+    """
+    if process.returncode is not None:
+        return
+    try:
+        _signal(process, kill=False)
+        await asyncio.wait_for(process.wait(), TERMINATE_GRACE)
+    except asyncio.TimeoutError:
+        _signal(process, kill=True)
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def _signal(process, kill: bool):
+    if hasattr(os, "killpg"):
+        os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    elif kill:
+        process.kill()
+    else:
+        process.terminate()
+
+
+def _kube_args(args: list):
+    """The --kubeconfig/--kube-context flags of a Helm command, for the cleanup commands."""
+    kube_args = []
+    for flag, value in zip(args, args[1:]):
+        if flag in ('--kubeconfig', '--kube-context'):
+            kube_args += [flag, value]
+    return kube_args
+
+
+def _join(lines: list):
+    """The text of the lines, without the --debug ones, which were logged at DEBUG already."""
+    return "".join(text for _, text in lines if "[debug]" not in text)
+
+
+def _for(release: str):
+    return f" [{release}]" if release else ""
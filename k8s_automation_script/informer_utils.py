@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+
+import urllib3
+from kubernetes import client, watch
+
+from metrics_utils import RETRIES
+
+WATCH_TIMEOUT = 300 # Seconds before the API server ends a watch; it is resumed from the last resourceVersion
+RETRY_DELAY = 2 # Seconds to wait before reconnecting after an error
+
+
+class ResourceCache:
+    """
+    Informer-style in-memory cache of one resource type.
+
+    Starts from a single list call, then applies watch events from the list's resourceVersion,
+    so the API server only sees one long-lived watch. When the resourceVersion is too old
+    (410 Gone) the cache is rebuilt from a fresh list. on_change is called after every update;
+    on_event, when given, is called with (kind, event type, object) for every watch event and with
+    event type "SYNC" for every object of a list.
+    """
+
+    def __init__(self, kind: str, list_func, on_change=None, on_event=None, **list_kwargs):
+        self.kind = kind
+        self.list_func = list_func
+        self.list_kwargs = list_kwargs
+        self.on_change = on_change
+        self.on_event = on_event
+        self.synced = threading.Event()
+        self._objects = {} # (namespace, name) -> object
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watch = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"{self.kind}-informer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watch:
+            self._watch.stop()
+
+    def items(self):
+        """Snapshot of the cached objects."""
+        with self._lock:
+            return list(self._objects.values())
+
+    def _run(self):
+        resource_version = None
+        while not self._stop.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._relist()
+                resource_version = self._watch_from(resource_version)
+            except client.ApiException as e:
+                if e.status == 410:
+                    logging.debug("%s watch expired, relisting.", self.kind)
+                    resource_version = None
+                    continue
+                logging.warning("Error watching %s: %s %s", self.kind, e.status, e.reason)
+                RETRIES.labels("informer").inc()
+                self._stop.wait(RETRY_DELAY)
+            except (urllib3.exceptions.HTTPError, OSError) as e:
+                logging.warning("Lost connection while watching %s: %s", self.kind, e)
+                RETRIES.labels("informer").inc()
+                self._stop.wait(RETRY_DELAY)
+
+    def _relist(self):
+        result = self.list_func(**self.list_kwargs)
+        if isinstance(result, dict): # Custom objects come back as plain dicts
+            items, resource_version = result.get("items", []), result["metadata"]["resourceVersion"]
+        else:
+            items, resource_version = result.items, result.metadata.resource_version
+        with self._lock:
+            self._objects = {object_key(obj): obj for obj in items}
+        if self.on_event:
+            for obj in items:
+                self.on_event(self.kind, "SYNC", obj)
+        self.synced.set()
+        self._changed()
+        return resource_version
+
+    def _watch_from(self, resource_version: str):
+        """Applies watch events until the stream ends. Returns the resourceVersion to resume from."""
+        self._watch = watch.Watch()
+        stream = self._watch.stream(
+            self.list_func,
+            resource_version=resource_version,
+            allow_watch_bookmarks=True,
+            timeout_seconds=WATCH_TIMEOUT,
+            _request_timeout=(10, WATCH_TIMEOUT + 30),
+            **self.list_kwargs
+        )
+        for event in stream:
+            event_type, obj = event["type"], event["object"]
+            if event_type == "ERROR":
+                code = obj.get("code") if isinstance(obj, dict) else None
+                raise client.ApiException(status=code or 500, reason=str(obj))
+            resource_version = object_resource_version(obj) or resource_version
+            if event_type == "BOOKMARK":
+                continue
+            with self._lock:
+                if event_type == "DELETED":
+                    self._objects.pop(object_key(obj), None)
+                else:
+                    self._objects[object_key(obj)] = obj
+            if self.on_event:
+                self.on_event(self.kind, event_type, obj)
+            self._changed()
+            if self._stop.is_set():
+                break
+        return resource_version
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self.kind)
+
+
+def object_key(obj):
+    if isinstance(obj, dict):
+        return obj["metadata"].get("namespace"), obj["metadata"]["name"]
+    return obj.metadata.namespace, obj.metadata.name
+
+
+def object_resource_version(obj):
+    if isinstance(obj, dict):
+        return obj.get("metadata", {}).get("resourceVersion")
+    return obj.metadata.resource_version if obj.metadata else None
+
+
+def wait_for_sync(caches: list, timeout: float):
+    """Waits until every cache has completed its first list. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    for cache in caches:
+        if not cache.synced.wait(max(0, deadline - time.monotonic())):
+            return False
+    return True
@@ -1,5 +1,29 @@
+import asyncio
 import subprocess
 import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes import client
+
+from async_client_utils import AsyncClientContext, get_async_runner, run_blocking, use_client_context
+from client_utils import ClientContext, get_client_context
+from defaults import DEFAULT_HELM_TIMEOUT
+from helm_utils import run_helm
+from metrics_utils import count_operation
+from profile_utils import span
+from wait_utils import wait_for_deployment, DEFAULT_WAIT_TIMEOUT
+
+KEDA_NAMESPACE = 'keda'
+# Deployments created by the kedacore/keda chart that must be ready before KEDA can scale anything
+KEDA_DEPLOYMENTS = ['keda-operator', 'keda-operator-metrics-apiserver']
+KEDA_CRDS = [
+    'scaledobjects.keda.sh', 'scaledjobs.keda.sh',
+    'triggerauthentications.keda.sh', 'clustertriggerauthentications.keda.sh',
+]
+# Registered by the metrics API server; the HPAs KEDA creates read their metrics through it
+KEDA_METRICS_API_SERVICE = 'v1beta1.external.metrics.k8s.io'
+PREFLIGHT_TIMEOUT = 10 # Seconds each pre-flight check may take
 
 def install_helm():
     """Installs Helm CLI and initializes it for the cluster."""
@@ -27,43 +51,132 @@ def install_helm():
             print("Error: 'curl' command not found. Please install curl or install Helm manually.")
             return False
 
-def install_keda():
-    """Installs KEDA on the Kubernetes cluster using Helm."""
+@count_operation("keda_install")
+def install_keda(
+    client_context: ClientContext = None,
+    timeout: float = DEFAULT_WAIT_TIMEOUT,
+    chart_bundle: str = None, # Local chart archive (from 'helm pull kedacore/keda --version X'); no repository access
+    keda_version: str = None, # Chart version to install from the kedacore repository
+    values_file: str = None, # Helm values for the KEDA chart, e.g. image overrides for a mirrored registry
+    helm_timeout: float = DEFAULT_HELM_TIMEOUT # Seconds 'helm upgrade --install' may run
+):
+    """
+    Installs KEDA on the Kubernetes cluster using Helm.
+    Returns right away when a pre-flight finds KEDA already installed and healthy. Otherwise runs
+    'helm upgrade --install', so a partial or failed earlier install is repaired rather than
+    rejected because the release exists.
+    """
     print("Attempting to install KEDA...")
+    client_context = client_context or get_client_context()
+    with span("keda.preflight"):
+        problems = keda_preflight(client_context)
+    if not problems:
+        print("KEDA is already installed and healthy, nothing to do.")
+        return True
+    print("KEDA is missing or unhealthy:")
+    for check, problem in problems.items():
+        print(f"  - {check}: {problem}")
+
+    chart = chart_bundle or 'kedacore/keda'
+    # Helm runs on the client's event loop thread, which stops it and rolls the release back on Ctrl-C
+    runner = get_async_runner(client_context)
     try:
-        # Add KEDA Helm repository
-        subprocess.run(['helm', 'repo', 'add', 'kedacore', 'https://kedacore.github.io/charts'], check=True)
-        subprocess.run(['helm', 'repo', 'update'], check=True)
-
-        # Install KEDA
-        subprocess.run([
-            'helm', 'install', 'keda', 'kedacore/keda', '--namespace', 'keda',
-            '--create-namespace'
-        ], check=True)
-
-        print("KEDA installation initiated. Verifying KEDA operator...")
-        # Wait and verify KEDA operator deployment
-        retries = 10
-        while retries > 0:
-            try:
-                result = subprocess.run(
-                    ['kubectl', 'get', 'deployment', '-n', 'keda', 'keda-operator', '-o', 'jsonpath="{.status.readyReplicas}"'],
-                    capture_output=True, text=True, check=True
-                )
-                ready_replicas = int(result.stdout.strip().strip('"'))
-                if ready_replicas >= 1:
-                    print("KEDA operator is running successfully.")
-                    return True
-                else:
-                    print(f"KEDA operator not ready yet. Retrying in 5 seconds... ({retries} attempts left)")
-                    time.sleep(5)
-                    retries -= 1
-            except (subprocess.CalledProcessError, ValueError):
-                print(f"Waiting for KEDA operator deployment... ({retries} attempts left)")
-                time.sleep(5)
-                retries -= 1
-        print("KEDA operator did not become ready in time. Please check its status manually.")
-        return False
+        if chart_bundle:
+            print(f"Installing KEDA from the chart bundle '{chart_bundle}', without contacting the chart repository...")
+        else:
+            # Add KEDA Helm repository
+            with span("helm.repo_add"):
+                runner.run_coroutine(run_helm(['repo', 'add', 'kedacore', 'https://kedacore.github.io/charts']))
+            with span("helm.repo_update"):
+                runner.run_coroutine(run_helm(['repo', 'update', 'kedacore']))
+
+        # Install KEDA; Helm's output is logged as it runs, and an interrupted install is rolled back
+        with span("helm.install", release="keda"):
+            runner.run_coroutine(run_helm([
+                'upgrade', '--install', 'keda', chart, '--namespace', KEDA_NAMESPACE,
+                '--create-namespace', *client_context.helm_kube_args(),
+                *(['--version', keda_version] if keda_version and not chart_bundle else []),
+                *(['-f', values_file] if values_file else [])
+            ], release='keda', namespace=KEDA_NAMESPACE, timeout=helm_timeout, cleanup=True))
     except subprocess.CalledProcessError as e:
         print(f"Error installing KEDA: {e}")
-        return False
\ No newline at end of file
+        if e.stderr:
+            print(e.stderr.strip())
+        return False
+    except subprocess.TimeoutExpired as e:
+        print(f"Error installing KEDA: Helm did not finish within {e.timeout:g}s, so the release was rolled back.")
+        return False
+
+    print("KEDA installation initiated. Verifying KEDA operator...")
+    with span("rollout.wait", release="keda"):
+        ready = run_blocking(wait_for_keda_deployments, timeout, client_context=client_context)
+
+    if all(ready):
+        print("KEDA operator is running successfully.")
+        return True
+    print("KEDA operator did not become ready in time. Please check its status manually.")
+    return False
+
+async def wait_for_keda_deployments(timeout: float = DEFAULT_WAIT_TIMEOUT, client_context: AsyncClientContext = None):
+    """Watches the operator and the metrics API server together, against one deadline; one result per KEDA_DEPLOYMENTS entry."""
+    deadline = time.monotonic() + timeout
+    async with use_client_context(client_context) as client_context:
+        return await asyncio.gather(*(
+            wait_for_deployment(client_context.apps_v1, name, KEDA_NAMESPACE, deadline) for name in KEDA_DEPLOYMENTS
+        ))
+
+def keda_preflight(client_context: ClientContext = None, timeout: float = PREFLIGHT_TIMEOUT):
+    """
+    Checks, all at once, that the KEDA CRDs are established, that the operator and metrics API server
+    have rolled out and that the external metrics API is available.
+    Returns {check: problem} for the checks that failed, so an empty dict means KEDA is healthy.
+    """
+    client_context = client_context or get_client_context()
+    checks = [(f"CRD {name}", _check_crd, name) for name in KEDA_CRDS]
+    checks += [(f"Deployment {name}", _check_deployment, name) for name in KEDA_DEPLOYMENTS]
+    checks.append((f"APIService {KEDA_METRICS_API_SERVICE}", _check_api_service, KEDA_METRICS_API_SERVICE))
+
+    problems = {}
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = [
+            (check, executor.submit(contextvars.copy_context().run, function, client_context, name, timeout))
+            for check, function, name in checks
+        ]
+        for check, future in futures:
+            try:
+                problem = future.result()
+            except client.ApiException as e:
+                problem = "not found" if e.status == 404 else f"{e.status} {e.reason}"
+            except Exception as e:
+                problem = str(e).splitlines()[0] if str(e) else e.__class__.__name__
+            if problem:
+                problems[check] = problem
+    return problems
+
+def _check_crd(client_context: ClientContext, name: str, timeout: float):
+    crd = client_context.apiextensions_v1.read_custom_resource_definition(name=name, _request_timeout=timeout)
+    if not _condition_true(crd.status.conditions if crd.status else None, "Established"):
+        return "not established"
+    return None
+
+def _check_deployment(client_context: ClientContext, name: str, timeout: float):
+    deployment = client_context.apps_v1.read_namespaced_deployment(
+        name=name, namespace=KEDA_NAMESPACE, _request_timeout=timeout
+    )
+    desired = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+    status = deployment.status
+    available = status.available_replicas or 0
+    if (status.observed_generation or 0) < (deployment.metadata.generation or 0) or (status.updated_replicas or 0) < desired:
+        return "rollout in progress"
+    if available < desired:
+        return f"{available}/{desired} available"
+    return None
+
+def _check_api_service(client_context: ClientContext, name: str, timeout: float):
+    api_service = client.ApiregistrationV1Api(client_context.api_client).read_api_service(name=name, _request_timeout=timeout)
+    if not _condition_true(api_service.status.conditions if api_service.status else None, "Available"):
+        return "not available"
+    return None
+
+def _condition_true(conditions, condition_type: str):
+    return any(c.type == condition_type and c.status == "True" for c in conditions or [])
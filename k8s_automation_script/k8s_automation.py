@@ -1,21 +1,177 @@
 import click
 import json
-import yaml
+import time
+import logging
+import functools
 
-from cluster_utils import connect_to_cluster, get_cluster_summary
-from install_utils import install_helm, install_keda
-# from deployment_utils import create_keda_deployment, get_deployment_health_status
+from defaults import (
+    DEFAULT_POOL_SIZE, DEFAULT_REQUEST_TIMEOUT, DEFAULT_QPS, DEFAULT_BURST, DEFAULT_CHART_PATH, FIELD_MANAGER, DEFAULT_HELM_TIMEOUT,
+    DEFAULT_FLUSH_ROWS, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_BYTES, HPA_SYNC_PERIOD, HPA_TOLERANCE,
+    DEFAULT_RECOMMENDATION_MARGIN
+)
+from k8s_automation_client import default_socket_path, default_token_path
 
-@click.group()
-def cli():
+# Commands import the modules they use when they run. Those modules load the Kubernetes client,
+# PyYAML, NumPy and tabulate, which takes longer than everything else '--help' does put together.
+# startup_benchmark.py checks that it stays that way.
+
+class InstrumentedGroup(click.Group):
+    """Counts and times every command it runs for the metrics exporter."""
+
+    def invoke(self, ctx):
+        started = time.monotonic()
+        result = "failure"
+        try:
+            return_value = super().invoke(ctx)
+            result = "success"
+            return return_value
+        except SystemExit as e:
+            result = "failure" if e.code else "success"
+            raise
+        except click.exceptions.Exit as e:
+            result = "failure" if e.exit_code else "success"
+            raise
+        finally:
+            if ctx.invoked_subcommand and ctx.meta.get("k8s_automation.metrics"):
+                from metrics_utils import observe_command
+                observe_command(ctx.invoked_subcommand, result, time.monotonic() - started)
+
+def pass_client_context(f):
+    """
+    Like click.pass_obj, but builds the ClientContext from the group options when the command runs,
+    so '--help' and commands that don't talk to the cluster never import the Kubernetes client.
+    """
+    def new_func(*args, **kwargs):
+        root = click.get_current_context().find_root()
+        if root.obj is None:
+            from client_utils import ClientContext, set_client_context
+            # One kubeconfig load and one pooled API client for the whole command
+            root.obj = ClientContext(**root.meta["k8s_automation.client_options"])
+            set_client_context(root.obj)
+            root.call_on_close(root.obj.close)
+        return f(root.obj, *args, **kwargs)
+    return functools.update_wrapper(new_func, f)
+
+def cluster_options(f):
+    """--contexts/--all-contexts, for commands that can run on many clusters at once."""
+    f = click.option('--all-contexts', is_flag=True, help='Run on every context in the kubeconfig.')(f)
+    f = click.option(
+        '--contexts', callback=lambda ctx, param, value: [name.strip() for name in value.split(',') if name.strip()] if value else [],
+        help='Comma-separated kubeconfig contexts to run on at the same time (e.g. prod-eu,prod-us).'
+    )(f)
+    return f
+
+def run_on_contexts(client_context, contexts, all_contexts, function, headers, title):
+    """
+    Runs function(cluster_client_context) on every selected cluster concurrently, each with its own
+    API client, then prints each cluster's output and one table of all results with their latency.
+    Exits with status 1 when any cluster failed.
+    """
+    from multicluster_utils import resolve_contexts, run_on_clusters, print_cluster_output, print_cluster_report
+    try:
+        names = resolve_contexts(contexts, all_contexts, client_context.config_file)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if not names:
+        raise click.UsageError("The kubeconfig has no contexts.")
+
+    click.echo(f"--- Running on {len(names)} cluster(s): {', '.join(names)} ---")
+    client_options = {
+        "config_file": client_context.config_file,
+        "pool_size": client_context.pool_size,
+        "request_timeout": client_context.request_timeout,
+        "qps": client_context.qps, # Each cluster gets its own limiter: the limit is per API server
+        "burst": client_context.burst,
+    }
+    started = time.monotonic()
+    results = run_on_clusters(names, function, client_options)
+    print_cluster_output(results)
+    print_cluster_report(results, headers, time.monotonic() - started, title)
+    if not all(result["ok"] for result in results):
+        raise SystemExit(1)
+
+@click.group(cls=InstrumentedGroup)
+@click.option('--kubeconfig', type=click.Path(dir_okay=False), help='Path to the kubeconfig file (defaults to KUBECONFIG or ~/.kube/config).')
+@click.option('--pool-size', type=click.IntRange(min=1), default=DEFAULT_POOL_SIZE, show_default=True, help='Connections kept open to the API server.')
+@click.option('--request-timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT[1], show_default=True, help='Read timeout in seconds for API requests.')
+@click.option('--qps', type=float, default=DEFAULT_QPS, show_default=True, help='API requests per second per cluster; 429s lower it automatically (0 = unlimited).')
+@click.option('--burst', type=click.IntRange(min=1), default=DEFAULT_BURST, show_default=True, help='API requests allowed at once above --qps.')
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text', show_default=True, help='Log lines as text, or one JSON object per line for log collectors.')
+@click.option('--profile', is_flag=True, help='Time each phase of the command and print a table of the spans at exit.')
+@click.option('--trace-file', type=click.Path(dir_okay=False, writable=True), help='Write the phase timings as a Chrome trace (chrome://tracing, Perfetto).')
+@click.option('--otel-file', type=click.Path(dir_okay=False, writable=True), help='Append the phase timings as OTLP/JSON, for the OpenTelemetry Collector file receiver.')
+@click.option('--metrics-file', type=click.Path(dir_okay=False, writable=True), help='Write Prometheus metrics to this file at exit (node-exporter textfile collector; use a .prom name).')
+@click.option('--metrics-port', type=click.IntRange(min=1, max=65535), help='Serve Prometheus metrics on this port at /metrics while the command runs.')
+@click.pass_context
+def cli(ctx, kubeconfig, pool_size, request_timeout, qps, burst, log_format, profile, trace_file, otel_file, metrics_file, metrics_port):
     """A CLI tool to automate operations on a Kubernetes cluster with KEDA."""
-    pass
+    # Configured here rather than on import, so the modules can be used as a library without it
+    from log_utils import configure_logging
+    configure_logging(logging.INFO, log_format)
+    if ctx.obj is not None:
+        # Run by the daemon ('serve'), which passes in its warm client and serves /metrics
+        ctx.meta["k8s_automation.metrics"] = True
+        return
+
+    if metrics_port or metrics_file:
+        from metrics_utils import serve_metrics, write_metrics_file
+        ctx.meta["k8s_automation.metrics"] = True
+    if metrics_port:
+        serve_metrics(metrics_port)
+    if metrics_file:
+        # Closing happens after the command has been counted, so the file includes it
+        ctx.call_on_close(lambda: write_metrics_file(metrics_file))
+    if profile or trace_file or otel_file:
+        from profile_utils import get_profiler, span
+        profiler = get_profiler()
+        profiler.enabled = True
+        # Registered before the command span, so it runs after that span has ended
+        ctx.call_on_close(lambda: _report_profile(profiler, profile, trace_file, otel_file))
+        ctx.with_resource(span(f"command {ctx.invoked_subcommand}"))
+
+    # The ClientContext itself is built by pass_client_context, once a command needs it
+    ctx.meta["k8s_automation.client_options"] = {
+        "config_file": kubeconfig,
+        "pool_size": pool_size,
+        "request_timeout": (DEFAULT_REQUEST_TIMEOUT[0], request_timeout),
+        "qps": qps,
+        "burst": burst,
+    }
 
 @cli.command()
-def setup_cluster():
-    """Connects to the cluster, installs Helm, KEDA, and provides a summary."""
+@click.option('--chart-bundle', type=click.Path(exists=True, dir_okay=False), help="Install KEDA from this chart archive (from 'helm pull kedacore/keda --version X') instead of the kedacore repository.")
+@click.option('--keda-version', help='KEDA chart version to install from the kedacore repository.')
+@click.option('--keda-values', type=click.Path(exists=True, dir_okay=False), help='Helm values file for the KEDA chart (e.g. image overrides for a mirrored registry).')
+@cluster_options
+@pass_client_context
+def setup_cluster(client_context, chart_bundle, keda_version, keda_values, contexts, all_contexts):
+    """
+    Connects to the cluster, installs Helm, KEDA, and provides a summary.
+    KEDA is left alone when a pre-flight finds it installed and healthy.
+    With --contexts/--all-contexts, sets up every listed cluster at the same time.
+    """
+    from cluster_utils import connect_to_cluster, get_cluster_summary
+    from install_utils import install_helm, install_keda
+    if contexts or all_contexts:
+        click.echo("--- Setting up Kubernetes Clusters ---")
+        # Helm is installed on this machine, so once for all clusters
+        if not install_helm():
+            click.echo("Helm installation failed. Aborting KEDA installation.")
+            raise SystemExit(1)
+
+        def setup(cluster_context):
+            if not connect_to_cluster(cluster_context):
+                raise RuntimeError("Failed to connect to the cluster.")
+            if not install_keda(cluster_context, chart_bundle=chart_bundle, keda_version=keda_version, values_file=keda_values):
+                raise RuntimeError("KEDA installation failed.")
+            summary = dict(get_cluster_summary(cluster_context))
+            return [["ready", summary.get("Kubernetes Server Version", "-"), summary.get("Number of Nodes", "-")]]
+
+        run_on_contexts(client_context, contexts, all_contexts, setup, ["KEDA", "Server Version", "Nodes"], "Cluster Setup Summary")
+        return
+
     click.echo("--- Setting up Kubernetes Cluster ---")
-    api_client = connect_to_cluster()
+    api_client = connect_to_cluster(client_context)
     if api_client:
         click.echo("Cluster connection successful.")
         if install_helm():
@@ -24,13 +180,13 @@ def setup_cluster():
             click.echo("Helm installation failed. Aborting KEDA installation.")
             return
 
-        if install_keda():
+        if install_keda(client_context, chart_bundle=chart_bundle, keda_version=keda_version, values_file=keda_values):
             click.echo("KEDA installation successful.")
         else:
             click.echo("KEDA installation failed.")
             return
 
-        get_cluster_summary()
+        get_cluster_summary(client_context)
     else:
         click.echo("Failed to connect to the cluster. Please check your kubectl configuration.")
 
@@ -49,15 +205,22 @@ def setup_cluster():
 @click.option('--scaling-metric-type', required=True, help='Type of KEDA metric (e.g., cpu, memory, kafka).')
 @click.option('--scaling-metric-value', required=True, help='Target value for the scaling metric.')
 @click.option('--event-source-config', help='JSON string for KEDA event source metadata (e.g., \'{"topic": "my-topic", "broker": "kafka-broker:9092"}\').')
+@click.option('--field-manager', default=FIELD_MANAGER, show_default=True, help='Field manager name recorded by server-side apply.')
+@click.option('--force/--no-force', default=True, show_default=True, help='Take over fields owned by another field manager instead of failing with a conflict.')
+@pass_client_context
 def create_deployment_old(
-    name, namespace, image, tag, cpu_req, cpu_limit, mem_req, mem_limit,
-    port, min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config
+    client_context, name, namespace, image, tag, cpu_req, cpu_limit, mem_req, mem_limit,
+    port, min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config,
+    field_manager, force
 ):
     """
-    Creates a KEDA-enabled Kubernetes deployment.
+    Creates or updates a KEDA-enabled Kubernetes deployment with server-side apply, without Helm.
+    Re-running with the same options is a no-op.
     Example:
     python k8s_automation.py create-deployment --name my-app --image my-repo/my-image --scaling-metric-type kafka --scaling-metric-value 10 --event-source-config '{"topic":"my-topic", "broker":"kafka-service:9092"}'
     """
+    import yaml
+    from deployment_utils import create_keda_deployment
     click.echo(f"--- Creating KEDA-enabled Deployment: {name} ---")
 
     parsed_event_source_config = {}
@@ -82,7 +245,10 @@ def create_deployment_old(
         max_replicas=max_replicas,
         scaling_metric_type=scaling_metric_type,
         scaling_metric_value=scaling_metric_value,
-        event_source_config=parsed_event_source_config
+        event_source_config=parsed_event_source_config,
+        field_manager=field_manager,
+        force=force,
+        client_context=client_context
     )
 
     if deployment_details:
@@ -92,21 +258,95 @@ def create_deployment_old(
         click.echo("Failed to create deployment.")
 
 @cli.command()
-@click.option('--name', required=True, help='Name of the deployment.')
+@click.option('--name', help='Name of the deployment.')
 @click.option('--namespace', default='default', help='Namespace of the deployment.')
-def get_status(name, namespace):
-    """Provides the health status for a given deployment."""
+@click.option('--all', 'all_deployments', is_flag=True, help='Report every deployment in the namespace.')
+@click.option('--selector', '-l', help='Report the deployments matching this label selector (e.g. app.kubernetes.io/managed-by=Helm).')
+@click.option('--all-namespaces', '-A', is_flag=True, help='With --all/--selector, look in every namespace.')
+@click.option('--pods', is_flag=True, help="With --name, also list the deployment's pods: readiness, restarts, last event and CPU/memory against requests and limits.")
+@cluster_options
+@pass_client_context
+def get_status(client_context, name, namespace, all_deployments, selector, all_namespaces, pods, contexts, all_contexts):
+    """
+    Provides the health status for a given deployment, or for many with --all/--selector.
+    With --contexts/--all-contexts, reads every listed cluster at the same time into one table.
+    """
+    from async_deployment_utils import report_health_status
+    from deployment_utils import read_deployment
+    from status_utils import (
+        FLEET_STATUS_HEADERS, POD_STATUS_HEADERS, get_fleet_health_status, print_fleet_health_status, fleet_health_rows,
+        get_pod_health_status, print_pod_health_status, pod_health_rows
+    )
+    if pods and (all_deployments or selector or not name):
+        raise click.UsageError("--pods lists the pods of one deployment; pass --name without --all/--selector.")
+    if (contexts or all_contexts) and pods:
+        def pod_status(cluster_context):
+            statuses = get_pod_health_status(deployment_name=name, namespace=namespace, client_context=cluster_context)
+            if statuses is None:
+                raise RuntimeError(f"Could not read the pods of deployment '{name}' in namespace '{namespace}'.")
+            return pod_health_rows(statuses)
+
+        run_on_contexts(client_context, contexts, all_contexts, pod_status, POD_STATUS_HEADERS, "Multi-Cluster Pod Health Status")
+        return
+    if contexts or all_contexts:
+        if not (name or all_deployments or selector):
+            raise click.UsageError("Pass --name, or --all/--selector to report many deployments.")
+        single = not (all_deployments or selector)
+
+        def status(cluster_context):
+            statuses = get_fleet_health_status(
+                namespace=None if all_namespaces and not single else namespace,
+                label_selector=selector,
+                field_selector=f"metadata.name={name}" if single else None,
+                client_context=cluster_context
+            )
+            if statuses is None:
+                raise RuntimeError("Could not list deployments.")
+            if single and not statuses:
+                raise RuntimeError(f"Deployment '{name}' not found in namespace '{namespace}'.")
+            return fleet_health_rows(statuses)
+
+        run_on_contexts(client_context, contexts, all_contexts, status, FLEET_STATUS_HEADERS, "Multi-Cluster Health Status")
+        return
+
+    if all_deployments or selector:
+        scope = "all namespaces" if all_namespaces else f"namespace '{namespace}'"
+        click.echo(f"--- Getting Health Status for Deployments in {scope} ---")
+        statuses = get_fleet_health_status(
+            namespace=None if all_namespaces else namespace,
+            label_selector=selector,
+            client_context=client_context
+        )
+        if statuses is None:
+            click.echo("Could not list deployments.")
+        elif not statuses:
+            click.echo("No matching deployments found.")
+        else:
+            print_fleet_health_status(statuses)
+        return
+
+    if not name:
+        raise click.UsageError("Pass --name, or --all/--selector to report many deployments.")
     click.echo(f"--- Getting Health Status for Deployment: {name} ---")
-    status = get_deployment_health_status(deployment_name=name, namespace=namespace)
-    if not status:
+    # Read the Deployment once: --pods lists its pods by its selector
+    deployment = read_deployment(name, namespace, client_context=client_context)
+    if deployment is None:
         click.echo(f"Could not retrieve status for deployment '{name}' in namespace '{namespace}'.")
+        return
+    report_health_status(deployment)
+    if pods:
+        pod_statuses = get_pod_health_status(
+            deployment_name=name, namespace=namespace, client_context=client_context, deployment=deployment
+        )
+        if pod_statuses is None:
+            click.echo(f"Could not list the pods of deployment '{name}'.")
+        else:
+            print_pod_health_status(pod_statuses)
 
-from deployment_utils import create_keda_deployment_with_helm, get_deployment_health_status # Update import
 @cli.command()
 @click.option('--name', required=True, help='Name of the Helm release (and base for deployment name).')
 @click.option('--namespace', default='default', help='Namespace for the deployment.') # <--- THIS LINE IS CRUCIAL
-@click.option('--chart-path', default=r'C:\Users\shaurya\k8s_automation_script\charts\my-app-chart', help='Path to the Helm chart for the deployment.')
-# @click.option('--chart-path', default=r'..\charts\my-app-chart', help='Path to the Helm chart for the deployment.')
+@click.option('--chart-path', default=DEFAULT_CHART_PATH, show_default=True, help='Path to the Helm chart for the deployment.')
 @click.option('--image', required=True, help='Docker image name (e.g., nginx).') # <--- THIS LINE IS CRUCIAL
 @click.option('--tag', default='latest', help='Docker image tag (e.g., latest).')
 @click.option('--cpu-req', default='100m', help='CPU request (e.g, 100m).')
@@ -119,16 +359,26 @@ from deployment_utils import create_keda_deployment_with_helm, get_deployment_he
 @click.option('--scaling-metric-type', required=True, help='Type of KEDA metric (e.g., cpu, memory, kafka).')
 @click.option('--scaling-metric-value', required=True, help='Target valuea for the scaling metric.')
 @click.option('--event-source-config', help='JSON string for KEDA event source metadata (e.g., \'{"topic": "my-topic", "broker": "kafka-broker:9092"}\').')
+@click.option('--wait-timeout', type=float, default=300, show_default=True, help='Seconds to wait for the deployment to become ready.')
+@click.option('--helm-timeout', type=float, default=DEFAULT_HELM_TIMEOUT, show_default=True, help="Seconds Helm may run; then it is stopped and the release rolled back (or uninstalled if new).")
+@click.option('--engine', type=click.Choice(['helm', 'native']), default='helm', show_default=True, help='Install with Helm, or render the chart in Python and server-side apply it.')
+@click.option('--idempotent', is_flag=True, help="Skip the install when the chart and values match the last deploy; otherwise use 'helm upgrade --install'.")
+@click.option('--dry-run', is_flag=True, help="Only render the manifests (cached 'helm template' or native render) and print them.")
 # ... other options ...
+@cluster_options
+@pass_client_context
 def create_deployment(
-    name, namespace, chart_path, image, tag, cpu_req, cpu_limit, mem_req, mem_limit,
-    port, min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config
+    client_context, name, namespace, chart_path, image, tag, cpu_req, cpu_limit, mem_req, mem_limit,
+    port, min_replicas, max_replicas, scaling_metric_type, scaling_metric_value, event_source_config, wait_timeout,
+    helm_timeout, engine, idempotent, dry_run, contexts, all_contexts
 ):
     """
     Creates a KEDA-enabled Kubernetes deployment using a Helm chart.
     Example:
     python k8s_automation.py create-deployment --name my-app --chart-path ./my-app-chart --image my-repo/my-image --scaling-metric-type kafka --scaling-metric-value 10 --event-source-config '{"topic":"my-topic", "broker":"kafka-service:9092"}'
     """
+    import yaml
+    from deployment_utils import create_keda_deployment_with_helm
     click.echo(f"--- Creating KEDA-enabled Deployment via Helm: {name} ---")
 
     parsed_event_source_config = {}
@@ -139,7 +389,7 @@ def create_deployment(
             click.echo(f"Error parsing event-source-config JSON: {e}")
             return
 
-    deployment_details = create_keda_deployment_with_helm( # Call the new function
+    release = dict(
         release_name=name,
         namespace=namespace,
         chart_path=chart_path,
@@ -154,14 +404,331 @@ def create_deployment(
         max_replicas=max_replicas,
         scaling_metric_type=scaling_metric_type,
         scaling_metric_value=scaling_metric_value,
-        event_source_config=parsed_event_source_config
+        event_source_config=parsed_event_source_config,
+        wait_timeout=wait_timeout,
+        helm_timeout=helm_timeout,
+        engine=engine,
+        idempotent=idempotent,
+        dry_run=dry_run
     )
+    if contexts or all_contexts:
+        if dry_run:
+            raise click.UsageError("--dry-run renders without a cluster; drop --contexts/--all-contexts.")
 
-    if deployment_details:
+        def deploy(cluster_context):
+            details = create_keda_deployment_with_helm(client_context=cluster_context, **release)
+            if not details:
+                raise RuntimeError("Deployment details could not be retrieved.")
+            return [[
+                "UNCHANGED" if details["unchanged"] else "OK", details["deployment_name_in_k8s"],
+                details["image"], details["scaling_config"]["scaled_object_ready"]
+            ]]
+
+        run_on_contexts(
+            client_context, contexts, all_contexts, deploy, ["Status", "Deployment", "Image", "SO Ready"], "Multi-Cluster Rollout Summary"
+        )
+        return
+
+    deployment_details = create_keda_deployment_with_helm(client_context=client_context, **release) # Call the new function
+
+    if deployment_details and dry_run:
+        click.echo("\nDry run, nothing was installed. Rendered manifests:")
+        click.echo(yaml.safe_dump_all(deployment_details.pop("manifests"), default_flow_style=False))
+        _echo_render_cache_stats()
+    elif deployment_details and deployment_details["unchanged"]:
+        click.echo("\nDeployment is up to date with the requested chart and values, nothing to do.")
+    elif deployment_details:
         click.echo("\nDeployment created successfully with the following details:")
         click.echo(yaml.dump(deployment_details, default_flow_style=False))
     else:
         click.echo("Failed to create deployment.")
 
+@cli.command()
+@click.option('--namespace', '-n', 'namespaces', multiple=True, default=['default'], show_default=True, help='Namespace to watch (repeatable).')
+@click.option('--all-namespaces', '-A', is_flag=True, help='Watch every namespace.')
+@click.option('--selector', '-l', help='Only show deployments matching this label selector.')
+@click.option('--interval', type=float, default=1.0, show_default=True, help='Minimum seconds between redraws.')
+@pass_client_context
+def watch_status(client_context, namespaces, all_namespaces, selector, interval):
+    """Live view of deployment replicas, KEDA ScaledObjects and HPAs, updated from watches."""
+    from status_utils import watch_fleet_status
+    watch_fleet_status(
+        namespaces=[] if all_namespaces else list(namespaces),
+        label_selector=selector,
+        min_redraw_interval=interval,
+        client_context=client_context
+    )
+
+@cli.command()
+@click.option('--from', 'fleet_file', required=True, type=click.Path(exists=True, dir_okay=False), help='YAML file listing the releases to deploy.')
+@click.option('--concurrency', type=click.IntRange(min=1), default=4, show_default=True, help='Number of Helm installs to run at once.')
+@click.option('--idempotent', is_flag=True, help='Skip releases whose chart and values match the last deploy (overrides the fleet file).')
+@pass_client_context
+def create_deployments(client_context, fleet_file, concurrency, idempotent):
+    """
+    Creates many KEDA-enabled deployments from a fleet file, installing them in parallel.
+    Example:
+    python k8s_automation.py create-deployments --from fleet.yaml --concurrency 8
+    """
+    import yaml
+    from fleet_utils import load_fleet_file, deploy_fleet, print_fleet_report
+    try:
+        releases = load_fleet_file(fleet_file)
+    except (yaml.YAMLError, ValueError) as e:
+        click.echo(f"Error reading fleet file: {e}")
+        return
+    if not releases:
+        click.echo(f"No releases found in '{fleet_file}'.")
+        return
+    if idempotent:
+        for release in releases:
+            release["idempotent"] = True
+
+    click.echo(f"--- Creating {len(releases)} KEDA-enabled Deployment(s) via Helm (concurrency {concurrency}) ---")
+    started = time.monotonic()
+    results = deploy_fleet(releases, concurrency=concurrency, client_context=client_context)
+    print_fleet_report(results, time.monotonic() - started)
+
+    if not all(result["ok"] for result in results):
+        raise SystemExit(1)
+
+@cli.command()
+@click.option('--chart-path', default=DEFAULT_CHART_PATH, show_default=True, help='Path to the Helm chart.')
+@click.option('--name', default='my-app', show_default=True, help='Release name to render with.')
+@click.option('--namespace', default='default', show_default=True, help='Namespace to render with.')
+@click.option('--scaling-metric-type', default='cpu', show_default=True, help='Type of KEDA metric to render with.')
+@click.option('--scaling-metric-value', default='50', show_default=True, help='Scaling metric value to render with.')
+@click.option('--event-source-config', help='JSON string for KEDA event source metadata to render with.')
+def check_native_render(chart_path, name, namespace, scaling_metric_type, scaling_metric_value, event_source_config):
+    """
+    Checks that the native engine renders the same objects as 'helm template' (requires the helm CLI).
+    Exits with status 1 and lists the differences when they don't match.
+    """
+    from async_deployment_utils import build_helm_values
+    from render_utils import diff_native_render
+    helm_values = build_helm_values(
+        'nginx', 'latest', '100m', '200m', '128Mi', '256Mi', 80, 1, 10,
+        scaling_metric_type, scaling_metric_value, json.loads(event_source_config) if event_source_config else {}
+    )
+    differences = diff_native_render(name, namespace, chart_path, helm_values)
+    if differences:
+        click.echo(f"Native render differs from 'helm template' in {len(differences)} place(s):")
+        for difference in differences:
+            click.echo(f"  - {difference}")
+        raise SystemExit(1)
+    click.echo("Native render matches 'helm template'.")
+
+@cli.command()
+@click.option('--name', default='my-app', show_default=True, help='Release name to render with.')
+@click.option('--namespace', default='default', show_default=True, help='Namespace to render with.')
+@click.option('--chart-path', default=DEFAULT_CHART_PATH, show_default=True, help='Path to the Helm chart.')
+@click.option('--image', default='nginx', show_default=True, help='Docker image name.')
+@click.option('--tag', default='latest', show_default=True, help='Docker image tag.')
+@click.option('--port', type=int, default=80, show_default=True, help='Container port to expose.')
+@click.option('--min-replicas', type=int, default=1, show_default=True, help='Minimum replicas for autoscaling.')
+@click.option('--max-replicas', type=int, default=10, show_default=True, help='Maximum replicas for autoscaling.')
+@click.option('--scaling-metric-type', default='cpu', show_default=True, help='Type of KEDA metric.')
+@click.option('--scaling-metric-value', default='50', show_default=True, help='Target value for the scaling metric.')
+@click.option('--event-source-config', help='JSON string for KEDA event source metadata.')
+@click.option('--engine', type=click.Choice(['helm', 'native']), default='helm', show_default=True, help="Render with (cached) 'helm template' or natively in Python.")
+def render(
+    name, namespace, chart_path, image, tag, port, min_replicas, max_replicas, scaling_metric_type,
+    scaling_metric_value, event_source_config, engine
+):
+    """
+    Prints the manifests a release would install, without contacting the cluster.
+    Helm renders are cached on disk, so repeated renders of the same chart and values are instant.
+    """
+    import yaml
+    from async_deployment_utils import build_helm_values
+    from render_utils import render_release
+    helm_values = build_helm_values(
+        image, tag, '100m', '200m', '128Mi', '256Mi', port, min_replicas, max_replicas,
+        scaling_metric_type, scaling_metric_value, json.loads(event_source_config) if event_source_config else {}
+    )
+    click.echo(yaml.safe_dump_all(render_release(name, namespace, chart_path, helm_values, engine), default_flow_style=False))
+    _echo_render_cache_stats()
+
+def _echo_render_cache_stats():
+    from cache_utils import get_render_cache
+    stats = get_render_cache().stats()
+    if stats["hits"] or stats["misses"]:
+        click.echo(f"Render cache: {stats['hits']} hit(s), {stats['misses']} miss(es)", err=True)
+
+@cli.command()
+@click.option('--metrics', 'metrics_file', required=True, type=click.Path(exists=True, dir_okay=False), help='CSV or Parquet file with the metric time series (total across all replicas).')
+@click.option('--time-column', default='timestamp', show_default=True, help='Column with epoch seconds or ISO 8601 timestamps.')
+@click.option('--value-column', default='value', show_default=True, help='Column with the metric values.')
+@click.option('--scaledobject', type=click.Path(exists=True, dir_okay=False), help="ScaledObject manifest to take the scaling settings from (e.g. the output of 'render').")
+@click.option('--min-replicas', type=int, help='Minimum replicas (overrides the ScaledObject).')
+@click.option('--max-replicas', type=int, help='Maximum replicas (overrides the ScaledObject).')
+@click.option('--scaling-metric-type', default='cpu', show_default=True, help='Type of KEDA metric, when no ScaledObject is given.')
+@click.option('--scaling-metric-value', help='Per-replica target (overrides the ScaledObject).')
+@click.option('--sync-period', type=float, default=HPA_SYNC_PERIOD, show_default=True, help='Seconds between scaling decisions.')
+@click.option('--tolerance', type=float, default=HPA_TOLERANCE, show_default=True, help='Ratio band around the target that does not scale.')
+@click.option('--pod-startup', type=float, default=0, show_default=True, help='Seconds before a new replica serves traffic.')
+@click.option('--cost-per-replica-hour', type=float, default=0.0, show_default=True, help='Price of one replica for an hour, for the cost estimate.')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the replica timeline to this CSV file.')
+def simulate_scaling(
+    metrics_file, time_column, value_column, scaledobject, min_replicas, max_replicas, scaling_metric_type,
+    scaling_metric_value, sync_period, tolerance, pod_startup, cost_per_replica_hour, output
+):
+    """
+    Replays a metric time series through KEDA/HPA scaling math, offline.
+    Example:
+    python k8s_automation.py simulate-scaling --metrics cpu.csv --scaledobject deployed-scaledobject.yaml --min-replicas 2
+    """
+    import yaml
+    from async_deployment_utils import build_helm_values
+    from render_utils import render_chart
+    from simulation_utils import (
+        load_metric_samples, load_scaling_spec, scaling_spec_from_scaled_object, parse_target, write_timeline,
+        simulate_replicas, summarize_simulation, print_simulation_report
+    )
+    try:
+        if scaledobject:
+            spec = load_scaling_spec(scaledobject)
+        else:
+            # Same ScaledObject create-deployment would install with default options
+            manifests = render_chart(
+                'my-app', 'default', DEFAULT_CHART_PATH,
+                build_helm_values('nginx', 'latest', '100m', '200m', '128Mi', '256Mi', 80, 1, 10,
+                                  scaling_metric_type, scaling_metric_value or '50', {})
+            )
+            spec = scaling_spec_from_scaled_object(next(m for m in manifests if m["kind"] == "ScaledObject"))
+        if min_replicas is not None:
+            spec["min_replicas"] = min_replicas
+        if max_replicas is not None:
+            spec["max_replicas"] = max_replicas
+        if scaling_metric_value is not None:
+            spec["target"] = parse_target(scaling_metric_value)
+        if spec["target"] is None:
+            raise ValueError(f"No target found in the '{spec['metric_type']}' trigger; pass --scaling-metric-value.")
+        if spec["triggers"] > 1:
+            click.echo(f"The ScaledObject has {spec['triggers']} triggers; only the first is simulated.")
+
+        timestamps, values = load_metric_samples(metrics_file, time_column, value_column)
+        result = simulate_replicas(
+            timestamps, values, spec, sync_period=sync_period, tolerance=tolerance, pod_startup=pod_startup
+        )
+    except (OSError, ImportError, ValueError, yaml.YAMLError) as e:
+        click.echo(f"Error: {e}")
+        raise SystemExit(1)
+
+    print_simulation_report(summarize_simulation(result, spec, sync_period, cost_per_replica_hour), spec)
+    if output:
+        write_timeline(output, result)
+        click.echo(f"Replica timeline written to '{output}'.")
+
+@cli.command()
+@click.option('--name', help='Helm release to sample (its pods are selected by app.kubernetes.io/instance).')
+@click.option('--namespace', default='default', show_default=True, help='Namespace of the release.')
+@click.option('--selector', '-l', help='Sample the pods matching this label selector instead of a release.')
+@click.option('--metrics', 'metrics_file', type=click.Path(exists=True, dir_okay=False), help='Read per-pod usage samples from this CSV or Parquet file instead of sampling metrics.k8s.io.')
+@click.option('--cpu-column', default='cpu', show_default=True, help='Column with CPU usage (cores or quantities such as 250m).')
+@click.option('--memory-column', default='memory', show_default=True, help='Column with memory usage (bytes or quantities such as 300Mi).')
+@click.option('--duration', type=float, default=600, show_default=True, help='Seconds to sample for (Ctrl-C stops early).')
+@click.option('--interval', type=float, default=15, show_default=True, help='Seconds between samples.')
+@click.option('--scaling-metric-type', type=click.Choice(['cpu', 'memory']), default='cpu', show_default=True, help='KEDA trigger to propose a target for.')
+@click.option('--margin', type=float, default=DEFAULT_RECOMMENDATION_MARGIN, show_default=True, help='Headroom added to the observed usage (0.15 = 15%).')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help="Write a values overlay with the recommendation, for 'helm upgrade -f'.")
+@pass_client_context
+def recommend(
+    client_context, name, namespace, selector, metrics_file, cpu_column, memory_column, duration, interval,
+    scaling_metric_type, margin, output
+):
+    """
+    Proposes CPU/memory requests and limits and a KEDA target from observed usage.
+    Example:
+    python k8s_automation.py recommend --name my-app --namespace apps --duration 3600 --output recommended-values.yaml
+    """
+    from recommend_utils import (
+        CPU_FIRST_BUCKET, MEMORY_FIRST_BUCKET, UsageHistogram, release_selector, sample_pod_usage, load_usage_file,
+        current_resources, recommend_resources, values_overlay, write_values_overlay, print_recommendation
+    )
+    cpu = UsageHistogram(CPU_FIRST_BUCKET)
+    memory = UsageHistogram(MEMORY_FIRST_BUCKET)
+    current = {}
+    if metrics_file:
+        try:
+            rows = load_usage_file(metrics_file, cpu, memory, cpu_column=cpu_column, memory_column=memory_column)
+        except (OSError, ImportError, ValueError) as e:
+            click.echo(f"Error: {e}")
+            raise SystemExit(1)
+        click.echo(f"Read {rows} sample(s) from '{metrics_file}'.")
+    else:
+        if not (name or selector):
+            raise click.UsageError("Pass --name or --selector to sample pods, or --metrics to read a file.")
+        label_selector = selector or release_selector(name)
+        click.echo(f"--- Sampling pod usage ({label_selector}) in namespace '{namespace}' for up to {duration:g}s (Ctrl-C to stop) ---")
+        current = current_resources(namespace, label_selector, client_context=client_context)
+        samples = sample_pod_usage(namespace, label_selector, duration, interval, cpu, memory, client_context=client_context)
+        if samples is None:
+            click.echo("metrics.k8s.io is not available; install metrics-server or pass --metrics.")
+            raise SystemExit(1)
+
+    if not (cpu.total or memory.total):
+        click.echo("No usage samples, nothing to recommend.")
+        raise SystemExit(1)
+    recommendation = recommend_resources(cpu, memory, scaling_metric_type=scaling_metric_type, margin=margin)
+    print_recommendation(cpu, memory, recommendation, current, scaling_metric_type)
+    if output:
+        write_values_overlay(output, values_overlay(recommendation, scaling_metric_type))
+        click.echo(f"Values overlay written to '{output}'.")
+
+@cli.command()
+@click.option('--namespace', '-n', 'namespaces', multiple=True, default=['default'], show_default=True, help='Namespace to record (repeatable).')
+@click.option('--all-namespaces', '-A', is_flag=True, help='Record every namespace.')
+@click.option('--selector', '-l', help='Only record deployments matching this label selector.')
+@click.option('--output', default='recordings', show_default=True, type=click.Path(file_okay=False), help='Directory for the recorded chunks.')
+@click.option('--flush-rows', type=click.IntRange(min=1), default=DEFAULT_FLUSH_ROWS, show_default=True, help='Events per written chunk.')
+@click.option('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL, show_default=True, help='Maximum seconds between chunk writes.')
+@click.option('--max-mb', type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024, show_default=True, help='Delete the oldest chunks beyond this total size.')
+@click.option('--duration', type=float, help='Stop after this many seconds (default: until Ctrl-C).')
+@pass_client_context
+def record(client_context, namespaces, all_namespaces, selector, output, flush_rows, flush_interval, max_mb, duration):
+    """
+    Records replica, desired-replica and metric history of deployments, their KEDA HPAs and ScaledObjects.
+    Chunks are compressed NumPy files; load them with recording_utils.load_recording, e.g.
+    pandas.DataFrame(load_recording('recordings')).
+    """
+    from recording_utils import ScalingRecorder, record_scaling_events
+    recorder = ScalingRecorder(output, flush_rows=flush_rows, flush_interval=flush_interval, max_bytes=int(max_mb * 1024 * 1024))
+    click.echo(f"--- Recording scaling events to '{output}' (Ctrl-C to stop) ---")
+    record_scaling_events(
+        recorder,
+        namespaces=[] if all_namespaces else list(namespaces),
+        label_selector=selector,
+        duration=duration,
+        client_context=client_context
+    )
+    click.echo(f"Recorded {recorder.events} event(s) in {recorder.chunks} chunk(s).")
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), default=default_socket_path, show_default='$XDG_RUNTIME_DIR/k8s-automation-$USER.sock', help='Unix socket to listen on.')
+@click.option('--port', type=click.IntRange(min=1, max=65535), help='Listen on 127.0.0.1:PORT instead of the socket (clients then need the token file).')
+@click.option('--token-file', type=click.Path(dir_okay=False), default=default_token_path, show_default='$XDG_RUNTIME_DIR/k8s-automation-$USER.token', help='Where to write the token TCP clients must send.')
+@pass_client_context
+def serve(client_context, socket_path, port, token_file):
+    """
+    Runs setup-cluster, create-deployment and get-status for k8s_automation_client.py, keeping the
+    Kubernetes client, kubeconfig and connection pool warm between commands. Also serves /metrics.
+    Example:
+    python k8s_automation.py serve &
+    python k8s_automation_client.py get-status --name my-app
+    """
+    from daemon_utils import serve as serve_commands
+    serve_commands(cli, client_context, socket_path=socket_path, port=port, token_path=token_file)
+
+def _report_profile(profiler, print_table, trace_file, otel_file):
+    if print_table:
+        profiler.print_table()
+    if trace_file:
+        profiler.write_chrome_trace(trace_file)
+        click.echo(f"Trace written to '{trace_file}'.", err=True)
+    if otel_file:
+        profiler.write_otlp_json(otel_file)
+        click.echo(f"OTLP spans appended to '{otel_file}'.", err=True)
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
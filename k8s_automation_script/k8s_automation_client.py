@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import socket
+import getpass
+import tempfile
+import http.client
+
+# Thin entry point that forwards commands to a running 'k8s_automation.py serve' daemon. It only imports
+# the standard library, so a forwarded command costs an interpreter start and one local HTTP request
+# instead of importing the Kubernetes client and loading the kubeconfig. Commands the daemon doesn't
+# serve, and every command while no daemon is listening, run in this process instead:
+#
+#     python k8s_automation_client.py get-status --name my-app --namespace apps
+
+# Commands 'serve' runs for clients
+DAEMON_COMMANDS = {"setup-cluster", "create-deployment", "get-status"}
+
+# Options whose values are paths; made absolute, since the daemon runs in its own working directory
+PATH_OPTIONS = {"--chart-path", "--chart-bundle", "--keda-values"}
+
+SOCKET_ENV = "K8S_AUTOMATION_SOCKET"
+PORT_ENV = "K8S_AUTOMATION_DAEMON_PORT"
+TOKEN_FILE_ENV = "K8S_AUTOMATION_TOKEN_FILE"
+DEFAULT_PORT = 8765 # Used where Unix sockets aren't available (Windows)
+CONNECT_TIMEOUT = 2 # Seconds; the daemon is local, so one that doesn't accept by then is hung and the command runs here
+READ_TIMEOUT = 3600 # Seconds a forwarded command may run; above setup-cluster's and create-deployment's own timeouts
+
+
+def default_socket_path() -> str:
+    """Per-user socket path; K8S_AUTOMATION_SOCKET overrides it."""
+    return os.environ.get(SOCKET_ENV) or _runtime_path("sock")
+
+
+def default_token_path() -> str:
+    """
+    Per-user file holding the token a daemon listening on TCP requires (mode 0600, rewritten on every
+    start); K8S_AUTOMATION_TOKEN_FILE overrides it. Any local user can connect to a port, so only
+    clients that can read the file may run commands.
+    """
+    return os.environ.get(TOKEN_FILE_ENV) or _runtime_path("token")
+
+
+def _runtime_path(suffix: str) -> str:
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"k8s-automation-{getpass.getuser()}.{suffix}")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout=CONNECT_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def daemon_connection(socket_path: str = None, port: int = None):
+    """
+    Connection to the daemon: TCP on localhost when a port is given (or K8S_AUTOMATION_DAEMON_PORT is set),
+    else the Unix socket. Its timeout is CONNECT_TIMEOUT; forward() raises it to READ_TIMEOUT once connected.
+    """
+    port = port or os.environ.get(PORT_ENV)
+    if port or not hasattr(socket, "AF_UNIX"):
+        return http.client.HTTPConnection("127.0.0.1", int(port or DEFAULT_PORT), timeout=CONNECT_TIMEOUT)
+    return UnixHTTPConnection(socket_path or default_socket_path())
+
+
+def forward(
+    args: list, connection: http.client.HTTPConnection = None, token_path: str = None, read_timeout: float = READ_TIMEOUT
+):
+    """
+    Runs args on the daemon and returns its {"exit_code", "stdout", "stderr"} response,
+    or None when no daemon accepts the connection (none is listening, or it doesn't accept within
+    the connection's timeout), so the command can run in this process instead. Over TCP the
+    daemon's token is sent along; without a readable token file there is no daemon of this user
+    to talk to. Once the command has been sent it isn't run again here: a daemon that doesn't
+    answer within read_timeout seconds is an error.
+    """
+    connection = connection or daemon_connection()
+    headers = {"Content-Type": "application/json"}
+    if not isinstance(connection, UnixHTTPConnection):
+        try:
+            with open(token_path or default_token_path()) as token_file:
+                headers["Authorization"] = f"Bearer {token_file.read().strip()}"
+        except FileNotFoundError:
+            return None
+    body = json.dumps({"args": _absolute_paths(args)})
+    try:
+        connection.connect()
+    except OSError: # No socket file, connection refused, or timed out
+        connection.close()
+        return None
+    connection.sock.settimeout(read_timeout)
+    try:
+        connection.request("POST", "/run", body=body, headers=headers)
+        response = connection.getresponse()
+        result = json.loads(response.read())
+    except TimeoutError:
+        raise RuntimeError(f"Daemon did not answer within {read_timeout:g}s") from None
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Daemon returned {response.status}: {result.get('error', result)}")
+    return result
+
+
+def _absolute_paths(args: list) -> list:
+    forwarded = []
+    expect_path = False
+    for arg in args:
+        option, separator, value = arg.partition("=")
+        if expect_path:
+            arg = os.path.abspath(arg)
+        elif separator and option in PATH_OPTIONS:
+            arg = f"{option}={os.path.abspath(value)}"
+        expect_path = arg in PATH_OPTIONS
+        forwarded.append(arg)
+    return forwarded
+
+
+def main(args: list = None):
+    args = sys.argv[1:] if args is None else args
+    # Group options such as --kubeconfig would change the client, which the daemon has already built
+    if args and args[0] in DAEMON_COMMANDS:
+        result = forward(args)
+        if result is not None:
+            sys.stdout.write(result["stdout"])
+            sys.stderr.write(result["stderr"])
+            sys.exit(result["exit_code"])
+
+    from k8s_automation import cli
+    cli.main(args=args, prog_name="k8s_automation.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from output_utils import captured_streams
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else on a record came in through extra= and is a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+# Values that can be handed to the listener thread as they are
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+class Event:
+    """
+    The message of a log_event() record. It is only turned into text when a handler formats the
+    record, on the listener thread, so building an event costs no string formatting on the caller's.
+    Fields holding lists, dicts or other objects are snapshotted when the record is queued, see
+    _ContextQueueHandler.prepare, so the caller may go on changing them.
+    """
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self):
+        return " ".join([self.name, *(f"{key}={_text(value)}" for key, value in self.fields.items())])
+
+
+def log_event(name: str, level: int = logging.INFO, **fields):
+    """
+    Logs one event, e.g. log_event("deployment.applied", deployment="web", replicas=3).
+    With --log-format json it is one JSON object with the fields as keys; with text one line of key=value
+    pairs. Nothing is built when the level is disabled, so fields may be passed as they are.
+    """
+    logger = logging.getLogger()
+    if logger.isEnabledFor(level):
+        logger.log(level, Event(name, fields), extra={"event": name})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, the event name and fields or the message, and any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+        }
+        if isinstance(record.msg, Event):
+            entry["event"] = record.msg.name
+            entry.update(record.msg.fields)
+        else:
+            entry["message"] = record.getMessage()
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and key != "event" and value is not None
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread, so a worker never waits on the terminal. Records logged inside
+    output_utils.capture_output() are written to that block's buffer right away instead, as before.
+    """
+
+    def emit(self, record):
+        streams = captured_streams()
+        if streams is None:
+            return super().emit(record)
+        try:
+            streams[1].write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        # The queue never leaves the process, so the record is passed on unformatted and the listener
+        # thread builds the message. A copy is taken, so handlers can't see each other's changes, and
+        # what the message is built from is snapshotted, since the caller may change a list or dict it
+        # logged as soon as the call returns: event fields are reduced to the JSON both formats print,
+        # and a %-style message with such arguments is formatted now.
+        record = copy.copy(record)
+        if isinstance(record.msg, Event):
+            record.msg = Event(record.msg.name, {key: _snapshot(value) for key, value in record.msg.fields.items()})
+        elif record.args and not all(
+            isinstance(arg, _IMMUTABLE) for arg in (record.args.values() if isinstance(record.args, dict) else record.args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def configure_logging(level: int = logging.INFO, log_format: str = "text", stream=None):
+    """
+    Sets up the root logger: records go through a queue to a listener thread that writes them to
+    stream (stderr by default) as text lines or JSON lines. Calling it again switches the format.
+    """
+    global _listener
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        for handler in _listener.handlers + tuple(root.handlers):
+            handler.setFormatter(formatter)
+        return
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    handler = _ContextQueueHandler(records)
+    handler.setFormatter(formatter) # Used for captured output only
+    root.addHandler(handler)
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Writes out what is still queued before the interpreter exits
+    atexit.register(_listener.stop)
+
+
+def _snapshot(value):
+    if isinstance(value, _IMMUTABLE):
+        return value
+    return json.loads(json.dumps(value, default=str))
+
+
+def _text(value):
+    if isinstance(value, str):
+        return value if value and " " not in value else json.dumps(value)
+    return json.dumps(value, default=str, separators=(",", ":"))
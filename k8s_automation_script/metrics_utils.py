@@ -0,0 +1,220 @@
+import time
+import asyncio
+import functools
+import contextlib
+from urllib.parse import urlsplit, parse_qs
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+
+# A registry of our own, so a textfile holds only these metrics and not the client's process collectors
+REGISTRY = CollectorRegistry()
+
+# Seconds; API calls are short, while commands, Helm runs and rollouts can take minutes
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LONG_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+COMMANDS = Counter(
+    "k8s_automation_commands_total", "CLI commands run, by outcome.",
+    ["command", "result"], registry=REGISTRY
+)
+COMMAND_DURATION = Histogram(
+    "k8s_automation_command_duration_seconds", "Wall time of CLI commands.",
+    ["command"], buckets=LONG_BUCKETS, registry=REGISTRY
+)
+LAST_RUN = Gauge(
+    "k8s_automation_last_run_timestamp_seconds", "Unix time the command last finished, by outcome.",
+    ["command", "result"], registry=REGISTRY
+)
+OPERATIONS = Counter(
+    "k8s_automation_operations_total", "Deploys and installs, by outcome (succeeded, unchanged, failed, error).",
+    ["operation", "result"], registry=REGISTRY
+)
+API_REQUEST_DURATION = Histogram(
+    "k8s_automation_api_request_duration_seconds",
+    "API server request latency by verb, resource and HTTP status (0 when no response arrived). "
+    "For watches this is the time until the stream opened.",
+    ["verb", "resource", "code"], buckets=REQUEST_BUCKETS, registry=REGISTRY
+)
+HELM_DURATION = Histogram(
+    "k8s_automation_helm_duration_seconds", "Wall time of Helm subprocesses, by Helm command and outcome.",
+    ["command", "result"], buckets=LONG_BUCKETS, registry=REGISTRY
+)
+ROLLOUT_DURATION = Histogram(
+    "k8s_automation_rollout_duration_seconds", "Time spent waiting for a Deployment rollout (ready, failed or timeout).",
+    ["result"], buckets=LONG_BUCKETS, registry=REGISTRY
+)
+RETRIES = Counter(
+    "k8s_automation_retries_total", "Operations retried after an error or a dropped connection.",
+    ["operation"], registry=REGISTRY
+)
+THROTTLED = Counter(
+    "k8s_automation_api_throttled_total", "API requests the API server rejected with 429 Too Many Requests.",
+    ["verb", "resource"], registry=REGISTRY
+)
+RATE_LIMIT_WAIT = Histogram(
+    "k8s_automation_rate_limit_wait_seconds", "Time API requests waited for the client-side rate limiter.",
+    buckets=REQUEST_BUCKETS, registry=REGISTRY
+)
+DEPLOYMENT_REPLICAS = Gauge(
+    "k8s_automation_deployment_replicas", "Replica counts from the last status read (total, ready, updated, available).",
+    ["namespace", "deployment", "state"], registry=REGISTRY
+)
+
+# Path segments before the resource: /api/v1 and /apis/<group>/<version>
+_API_PREFIX_LENGTHS = {"api": 2, "apis": 3}
+
+
+def serve_metrics(port: int, address: str = "0.0.0.0"):
+    """Serves the registry on http://<address>:<port>/metrics from a background thread."""
+    start_http_server(port, addr=address, registry=REGISTRY)
+
+
+def write_metrics_file(path: str):
+    """
+    Writes the registry in the text exposition format, for node-exporter's textfile collector.
+    The file is written next to path and renamed over it, so the collector never reads half a file.
+    """
+    write_to_textfile(path, REGISTRY)
+
+
+def observe_command(command: str, result: str, duration: float):
+    COMMANDS.labels(command, result).inc()
+    COMMAND_DURATION.labels(command).observe(duration)
+    LAST_RUN.labels(command, result).set(time.time())
+
+
+def record_deployment_replicas(health_status: dict):
+    """Updates the replica gauges from a build_health_status dict."""
+    labels = (health_status["Namespace"], health_status["Deployment Name"])
+    for state, key in (("total", "Total Replicas"), ("ready", "Ready Replicas"),
+                       ("updated", "Updated Replicas"), ("available", "Available Replicas")):
+        DEPLOYMENT_REPLICAS.labels(*labels, state).set(health_status[key])
+
+
+@contextlib.contextmanager
+def time_helm(command: str):
+    """Times the enclosed Helm run; it counts as a failure if the block raises."""
+    started = time.monotonic()
+    result = "success"
+    try:
+        yield
+    except BaseException:
+        result = "failure"
+        raise
+    finally:
+        HELM_DURATION.labels(command, result).observe(time.monotonic() - started)
+
+
+def count_operation(operation: str):
+    """
+    Decorator counting calls of a deploy or install function by outcome: a falsy return value is
+    "failed", a details dict with "unchanged" set is "unchanged" and an exception is "error".
+    Works on coroutine functions too.
+    """
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    result = await function(*args, **kwargs)
+                except Exception:
+                    OPERATIONS.labels(operation, "error").inc()
+                    raise
+                OPERATIONS.labels(operation, _operation_result(result)).inc()
+                return result
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                OPERATIONS.labels(operation, "error").inc()
+                raise
+            OPERATIONS.labels(operation, _operation_result(result)).inc()
+            return result
+        return wrapper
+    return decorator
+
+
+def _operation_result(result):
+    if not result:
+        return "failed"
+    if isinstance(result, dict) and result.get("unchanged"):
+        return "unchanged"
+    return "succeeded"
+
+
+def instrument_rest_client(api_client):
+    """Times every request of a kubernetes ApiClient in API_REQUEST_DURATION."""
+    rest_request = api_client.rest_client.request
+
+    def request(method, url, *args, **kwargs):
+        started = time.monotonic()
+        code = 0
+        try:
+            response = rest_request(method, url, *args, **kwargs)
+            code = response.status
+            return response
+        except Exception as e:
+            code = getattr(e, "status", None) or 0
+            raise
+        finally:
+            _observe_request(method, url, kwargs.get("query_params"), code, time.monotonic() - started)
+
+    api_client.rest_client.request = request
+
+
+def instrument_async_rest_client(api_client):
+    """instrument_rest_client for a kubernetes_asyncio ApiClient."""
+    rest_request = api_client.rest_client.request
+
+    async def request(method, url, *args, **kwargs):
+        started = time.monotonic()
+        code = 0
+        try:
+            response = await rest_request(method, url, *args, **kwargs)
+            code = response.status
+            return response
+        except Exception as e:
+            code = getattr(e, "status", None) or 0
+            raise
+        finally:
+            _observe_request(method, url, kwargs.get("query_params"), code, time.monotonic() - started)
+
+    api_client.rest_client.request = request
+
+
+def _observe_request(method: str, url: str, query_params, code: int, duration: float):
+    verb, resource = api_verb_and_resource(method, url, query_params)
+    API_REQUEST_DURATION.labels(verb, resource, str(code)).observe(duration)
+
+
+def api_verb_and_resource(method: str, url: str, query_params=None):
+    """
+    Maps a request to the verb and resource the API server itself reports, e.g.
+    GET /apis/apps/v1/namespaces/a/deployments -> ("list", "deployments").
+    Object names are dropped so the label values stay few.
+    """
+    parts = urlsplit(url)
+    query = {key.lower(): values[-1] for key, values in parse_qs(parts.query).items()}
+    query.update({str(key).lower(): str(value) for key, value in dict(query_params or {}).items()})
+    segments = [segment for segment in parts.path.split("/") if segment]
+
+    prefix_length = _API_PREFIX_LENGTHS.get(segments[0]) if segments else None
+    if prefix_length is None:
+        return method.lower(), "other" # /version, /openapi/v2, ...
+    segments = segments[prefix_length:]
+    if len(segments) > 2 and segments[0] == "namespaces":
+        segments = segments[2:] # Namespaced resource; the namespace itself has just two segments
+    resource = "/".join(segments[0:1] + segments[2:3]) or "discovery" # e.g. deployments/status
+    named = len(segments) > 1
+
+    method = method.upper()
+    if method == "GET":
+        verb = "watch" if query.get("watch", "").lower() in ("true", "1") else ("get" if named else "list")
+    elif method == "DELETE":
+        verb = "delete" if named else "deletecollection"
+    else:
+        verb = {"POST": "create", "PUT": "update", "PATCH": "patch"}.get(method, method.lower())
+    return verb, resource
@@ -0,0 +1,120 @@
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes import config
+from tabulate import tabulate
+
+from client_utils import ClientContext
+from defaults import DEFAULT_CLUSTER_CONCURRENCY
+from output_utils import capture_output, install_output_capture
+from profile_utils import span
+
+
+def list_contexts(config_file: str = None):
+    """Names of the contexts in the kubeconfig, in file order."""
+    contexts, _ = config.list_kube_config_contexts(config_file=config_file)
+    return [context["name"] for context in contexts]
+
+
+def resolve_contexts(names: list, all_contexts: bool, config_file: str = None):
+    """
+    The contexts --contexts/--all-contexts select, checked against the kubeconfig.
+    Raises ValueError for a context the kubeconfig doesn't have, or when it can't be read.
+    """
+    try:
+        available = list_contexts(config_file)
+    except config.ConfigException as e:
+        raise ValueError(f"Could not read the kubeconfig: {e}") from e
+    if all_contexts:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown kubeconfig context(s): {', '.join(unknown)} (available: {', '.join(available)})")
+    return list(dict.fromkeys(names)) # Each cluster once, in the order given
+
+
+def run_on_clusters(
+    contexts: list,
+    function,
+    client_options: dict = None,
+    concurrency: int = DEFAULT_CLUSTER_CONCURRENCY
+):
+    """
+    Calls function(client_context) for every kubeconfig context at the same time. Each cluster gets
+    its own ClientContext (kubeconfig load, credentials and connection pool), built from
+    client_options (the ClientContext keyword arguments) and closed afterwards.
+
+    function returns a list of table rows for the cluster and raises to report a failure.
+    What it prints or logs is captured per cluster rather than interleaved on the terminal.
+    Returns one result dict per context, in the order given.
+    """
+    install_output_capture()
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(contexts)))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run_on_cluster, name, function, client_options or {})
+            for name in contexts
+        ]
+        return [future.result() for future in futures]
+
+
+def _run_on_cluster(name: str, function, client_options: dict):
+    """Runs function against one cluster and records its duration and output. Never raises."""
+    client_context = ClientContext(**client_options, context=name)
+    started = time.monotonic()
+    rows, error = [], None
+    with capture_output() as (stdout, stderr):
+        try:
+            with span("cluster", context=name):
+                rows = function(client_context) or []
+        except Exception as e:
+            logging.debug("Cluster '%s' failed", name, exc_info=True)
+            error = str(e).strip() or e.__class__.__name__
+        finally:
+            client_context.close()
+    return {
+        "cluster": name,
+        "ok": error is None,
+        "seconds": time.monotonic() - started,
+        "rows": rows,
+        "error": error,
+        "output": stdout.getvalue() + stderr.getvalue(),
+    }
+
+
+def print_cluster_output(results: list):
+    """Prints what each cluster's run printed and logged, one block per cluster."""
+    for result in results:
+        if result["output"].strip():
+            print(f"\n=== {result['cluster']} ===")
+            print(result["output"].rstrip())
+
+
+def print_cluster_report(results: list, headers: list, wall_seconds: float, title: str = "Multi-Cluster Summary"):
+    """
+    Prints one table of every cluster's rows, each prefixed with the cluster name and followed by
+    the cluster's latency. A failed cluster gets a single row with its error.
+    """
+    rows = []
+    for result in results:
+        latency = f"{result['seconds']:.2f}"
+        if not result["ok"]:
+            rows.append([result["cluster"], "FAILED", *[""] * (len(headers) - 1), latency, _first_line(result["error"])])
+        elif not result["rows"]:
+            rows.append([result["cluster"], "-", *[""] * (len(headers) - 1), latency, ""])
+        for row in result["rows"]:
+            rows.append([result["cluster"], *row, latency, ""])
+    succeeded = sum(1 for result in results if result["ok"])
+    serial_seconds = sum(result["seconds"] for result in results)
+
+    print(f"\n--- {title} ---")
+    print(tabulate(rows, headers=["Cluster", *headers, "Latency (s)", "Error"], tablefmt="grid"))
+    print(f"{succeeded}/{len(results)} cluster(s) succeeded in {wall_seconds:.1f}s "
+          f"(sum of cluster latencies: {serial_seconds:.1f}s)")
+    print("-" * (len(title) + 8) + "\n")
+
+
+def _first_line(text: str, width: int = 80):
+    line = text.splitlines()[0] if text else ""
+    return line if len(line) <= width else line[:width - 3] + "..."
@@ -0,0 +1,67 @@
+import io
+import sys
+import logging
+import contextlib
+import contextvars
+
+# (stdout, stderr) buffers that output in the current context goes to; None to write to the terminal
+_output = contextvars.ContextVar("captured_output", default=None)
+
+
+class _CapturingStream:
+    """
+    Stands in for sys.stdout/sys.stderr: writes go to the buffers of the capture_output() block
+    running in the current context, so concurrent tasks each get their own output, and anywhere
+    else to the real stream.
+    """
+
+    def __init__(self, stream, index: int):
+        self._stream = stream
+        self._index = index
+
+    def write(self, text):
+        buffers = _output.get()
+        return (buffers[self._index] if buffers else self._stream).write(text)
+
+    def flush(self):
+        if _output.get() is None:
+            self._stream.flush()
+
+    def isatty(self):
+        return False if _output.get() else self._stream.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def install_output_capture():
+    """
+    Routes print(), click.echo() and log records through the current context, which makes
+    capture_output() work. Safe to call more than once.
+    """
+    if isinstance(sys.stdout, _CapturingStream):
+        return
+    streams = {id(sys.stdout): _CapturingStream(sys.stdout, 0), id(sys.stderr): _CapturingStream(sys.stderr, 1)}
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and id(handler.stream) in streams:
+            handler.setStream(streams[id(handler.stream)])
+    sys.stdout, sys.stderr = streams[id(sys.stdout)], streams[id(sys.stderr)]
+
+
+def captured_streams():
+    """The (stdout, stderr) buffers of the capture_output() block running in the current context, or None."""
+    return _output.get()
+
+
+@contextlib.contextmanager
+def capture_output():
+    """
+    Collects what the enclosed block (and threads started with a copy of its context) prints and
+    logs, as (stdout, stderr) StringIO buffers. install_output_capture() must have been called.
+    """
+    buffers = (io.StringIO(), io.StringIO())
+    token = _output.set(buffers)
+    try:
+        yield buffers
+    finally:
+        _output.reset(token)
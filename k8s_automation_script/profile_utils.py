@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import time
+import secrets
+import threading
+import contextlib
+import contextvars
+
+from tabulate import tabulate
+
+# Helm --debug lines that start a phase of an install or upgrade, in the order Helm logs them
+HELM_PHASE_MARKERS = [
+    (re.compile(r"getting history for release"), "history"),
+    (re.compile(r"Original chart version|CHART PATH"), "load and render chart"),
+    (re.compile(r"preparing upgrade"), "prepare upgrade"),
+    (re.compile(r"creating \d+ resource\(s\)|checking \d+ resources for changes|creating upgraded release"), "apply resources"),
+    (re.compile(r"beginning wait for"), "wait"),
+    (re.compile(r"updating status for upgraded release"), "record release"),
+]
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Profiler:
+    """
+    Collects timed spans for one process. Spans nest through a context variable, so a span opened
+    inside another becomes its child, also inside coroutines. While disabled, span() does nothing.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+        # Offset that turns monotonic readings into wall-clock time for exported traces
+        self._wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self._start_ns = time.monotonic_ns()
+
+    def add(self, name: str, start_ns: int, end_ns: int, parent_id: str = None, span_id: str = None, **attributes):
+        """Records a span measured elsewhere, e.g. a phase reconstructed from Helm's output."""
+        record = {
+            "id": span_id or secrets.token_hex(8),
+            "parent": parent_id,
+            "name": name,
+            "start_ns": start_ns,
+            "end_ns": end_ns,
+            "thread": threading.current_thread().name,
+            "attributes": attributes,
+        }
+        with self._lock:
+            self.spans.append(record)
+        return record
+
+    def print_table(self):
+        """Prints every span as a tree, with siblings of the same name merged into one row."""
+        with self._lock:
+            spans = list(self.spans)
+        by_id = {record["id"]: record for record in spans}
+
+        rows = {}
+        for record in sorted(spans, key=lambda r: r["start_ns"]):
+            path = []
+            parent = record
+            while parent is not None:
+                path.append(parent["name"])
+                parent = by_id.get(parent["parent"])
+            path = tuple(reversed(path))
+            row = rows.setdefault(path, {"count": 0, "total": 0, "max": 0})
+            duration = (record["end_ns"] - record["start_ns"]) / 1e9
+            row["count"] += 1
+            row["total"] += duration
+            row["max"] = max(row["max"], duration)
+
+        wall = max((r["end_ns"] for r in spans), default=self._start_ns) - min((r["start_ns"] for r in spans), default=self._start_ns)
+        table = []
+        for path in _tree_order(rows):
+            row = rows[path]
+            table.append([
+                "· " * (len(path) - 1) + path[-1], # Leading spaces would be stripped by tabulate
+                row["count"],
+                f"{row['total']:.3f}",
+                f"{row['total'] / row['count']:.3f}",
+                f"{row['max']:.3f}",
+                f"{100 * row['total'] * 1e9 / wall:.1f}" if wall else "-",
+            ])
+        print("\n--- Profile ---")
+        print(tabulate(table, headers=["Span", "Count", "Total (s)", "Mean (s)", "Max (s)", "% of wall"], tablefmt="grid"))
+        print("---------------\n")
+
+    def write_chrome_trace(self, path: str):
+        """Writes the spans in Chrome trace event format (chrome://tracing, Perfetto)."""
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for record in spans:
+            events.append({
+                "name": record["name"],
+                "ph": "X",
+                "ts": (record["start_ns"] - self._start_ns) / 1000,
+                "dur": (record["end_ns"] - record["start_ns"]) / 1000,
+                "pid": os.getpid(),
+                "tid": threads.setdefault(record["thread"], len(threads) + 1),
+                "args": record["attributes"],
+            })
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for name, tid in threads.items()
+        )
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+    def write_otlp_json(self, path: str, service_name: str = "k8s-automation"):
+        """
+        Appends the spans as one OTLP/JSON ExportTraceServiceRequest line, the format the
+        OpenTelemetry Collector's otlpjsonfile receiver reads.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for record in spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": record["id"],
+                "name": record["name"],
+                "kind": 1, # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(record["start_ns"] + self._wall_offset_ns),
+                "endTimeUnixNano": str(record["end_ns"] + self._wall_offset_ns),
+                "attributes": [_otlp_attribute(key, value) for key, value in record["attributes"].items()]
+                              + [_otlp_attribute("thread.name", record["thread"])],
+                "status": {"code": 2 if "error" in record["attributes"] else 1},
+            }
+            if record["parent"]:
+                otlp_span["parentSpanId"] = record["parent"]
+            otlp_spans.append(otlp_span)
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "k8s_automation"}, "spans": otlp_spans}],
+        }]}
+        with open(path, "a") as otlp_file:
+            otlp_file.write(json.dumps(request) + "\n")
+
+
+def _tree_order(rows: dict):
+    """Paths ordered depth-first, children after their parent, in first-seen order."""
+    children = {}
+    for path in rows:
+        children.setdefault(path[:-1], []).append(path)
+    ordered = []
+
+    def visit(prefix):
+        for path in children.get(prefix, []):
+            ordered.append(path)
+            visit(path)
+    visit(())
+    return ordered
+
+
+def _otlp_attribute(key: str, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_profiler = Profiler()
+
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Times the enclosed block as a child of the current span. Yields the span's attribute dict, so
+    the block can add results such as an exit code. Exceptions are recorded and re-raised.
+    """
+    if not _profiler.enabled:
+        yield attributes
+        return
+    span_id = secrets.token_hex(8)
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start_ns = time.monotonic_ns()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = e.__class__.__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        _profiler.add(name, start_ns, time.monotonic_ns(), parent_id, span_id, **attributes)
+
+
+def current_span_id():
+    return _current_span.get()
+
+
+def record_helm_phases(start_ns: int, end_ns: int, lines: list):
+    """
+    Splits a Helm run into phases using the arrival time of its --debug lines (a list of
+    (monotonic ns, text)) and records them as children of the current span. The time before the
+    first marker is Helm's own startup: loading the kubeconfig, plugins and repositories.
+    """
+    if not _profiler.enabled:
+        return
+    boundaries = [(start_ns, "startup")]
+    for timestamp, text in lines:
+        for pattern, phase in HELM_PHASE_MARKERS:
+            if pattern.search(text):
+                if phase != boundaries[-1][1]:
+                    boundaries.append((timestamp, phase))
+                break
+    parent_id = _current_span.get()
+    for (phase_start, phase), (phase_end, _) in zip(boundaries, boundaries[1:] + [(end_ns, None)]):
+        _profiler.add(f"helm: {phase}", phase_start, phase_end, parent_id)
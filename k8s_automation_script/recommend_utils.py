@@ -0,0 +1,304 @@
+import os
+import csv
+import math
+import time
+import logging
+
+import numpy as np
+import yaml
+from kubernetes import client
+from kubernetes.utils import parse_quantity
+from tabulate import tabulate
+
+from client_utils import ClientContext, get_client_context
+from defaults import DEFAULT_RECOMMENDATION_MARGIN
+from status_utils import container_total, list_pod_metrics
+
+# Histogram buckets grow by 5%, like the VPA recommender's, so a percentile is off by at most 5%.
+# 300 buckets cover 1m to over 2000 cores and 1Mi to over 2Ti in a few kilobytes, however long we sample.
+BUCKET_RATIO = 1.05
+HISTOGRAM_BUCKETS = 300
+CPU_FIRST_BUCKET = 0.001 # Cores
+MEMORY_FIRST_BUCKET = 1024 * 1024 # Bytes
+
+CPU_REQUEST_PERCENTILE = 90
+CPU_LIMIT_PERCENTILE = 99
+CPU_LIMIT_MIN_RATIO = 1.5 # Limit at least this many times the request, so bursts aren't throttled
+MEMORY_REQUEST_PERCENTILE = 95 # Memory limits are set from the observed maximum, since going over one is an OOM kill
+TARGET_UTILIZATION_RANGE = (50, 85) # Percent; bounds for the KEDA target
+
+FILE_BATCH_ROWS = 10000 # Rows of a metrics file read into memory at a time
+
+
+class UsageHistogram:
+    """
+    Bounded-memory percentile sketch: sample counts in exponentially growing buckets. Memory and
+    percentile cost don't depend on the number of samples, so hours of sampling or a multi-gigabyte
+    export cost the same as a minute. Percentiles are the upper bound of their bucket.
+    """
+
+    def __init__(self, first_bucket: float, ratio: float = BUCKET_RATIO, buckets: int = HISTOGRAM_BUCKETS):
+        self.upper_bounds = first_bucket * ratio ** np.arange(1, buckets + 1)
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values) & (values >= 0)]
+        if not values.size:
+            return
+        # Values past the last bucket are counted in it; max still records them exactly
+        indexes = np.minimum(np.searchsorted(self.upper_bounds, values), len(self.counts) - 1)
+        np.add.at(self.counts, indexes, 1)
+        self.total += values.size
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, percent: float):
+        """The value percent% of the samples are at or below, or None without samples."""
+        if not self.total:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), percent / 100 * self.total))
+        return min(float(self.upper_bounds[min(index, len(self.counts) - 1)]), self.max)
+
+
+def release_selector(release_name: str):
+    """Label selector for the pods of a release installed from my-app-chart."""
+    return f"app.kubernetes.io/instance={release_name}"
+
+
+def sample_pod_usage(
+    namespace: str,
+    label_selector: str,
+    duration: float,
+    interval: float,
+    cpu: UsageHistogram,
+    memory: UsageHistogram,
+    client_context: ClientContext = None
+):
+    """
+    Adds the metrics.k8s.io usage of the matching pods to the histograms every interval seconds
+    for duration seconds; Ctrl-C stops early. metrics-server refreshes every 15-60 seconds, so
+    a pod's sample is only counted when its timestamp changed. Returns the number of samples taken,
+    or None when metrics-server isn't installed.
+    """
+    client_context = client_context or get_client_context()
+    last_timestamps = {} # One entry per pod seen
+    samples = 0
+    deadline = time.monotonic() + duration
+    try:
+        while True:
+            usage_by_pod = list_pod_metrics(client_context, namespace, label_selector)
+            if usage_by_pod is None:
+                return None
+            fresh = [
+                usage for pod, usage in usage_by_pod.items()
+                if last_timestamps.get(pod) != usage["timestamp"] or usage["timestamp"] is None
+            ]
+            last_timestamps.update((pod, usage["timestamp"]) for pod, usage in usage_by_pod.items())
+            cpu.add([usage["cpu"] for usage in fresh])
+            memory.add([usage["memory"] for usage in fresh])
+            samples += len(fresh)
+            logging.info("Sampled %d pod(s), %d sample(s) so far", len(fresh), samples)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return samples
+            time.sleep(min(interval, remaining))
+    except KeyboardInterrupt:
+        logging.info("Sampling stopped early.")
+        return samples
+
+
+def load_usage_file(
+    path: str, cpu: UsageHistogram, memory: UsageHistogram, cpu_column: str = "cpu", memory_column: str = "memory"
+):
+    """
+    Adds per-pod usage samples from a CSV or Parquet file to the histograms, in batches so the file
+    never has to fit in memory. Values are cores and bytes, or quantities such as '250m' and '300Mi'.
+    A file may have either column. Returns the number of rows read.
+    """
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow ('pip install pyarrow').") from None
+        parquet_file = parquet.ParquetFile(path)
+        columns = _check_columns(path, parquet_file.schema_arrow.names, cpu_column, memory_column)
+        rows = 0
+        for batch in parquet_file.iter_batches(batch_size=FILE_BATCH_ROWS, columns=columns):
+            rows += batch.num_rows
+            data = batch.to_pydict()
+            _add_quantities(cpu, data.get(cpu_column, []))
+            _add_quantities(memory, data.get(memory_column, []))
+        return rows
+
+    with open(path, newline="") as usage_file:
+        reader = csv.reader(usage_file)
+        header = next(reader, [])
+        _check_columns(path, header, cpu_column, memory_column)
+        cpu_index = header.index(cpu_column) if cpu_column in header else None
+        memory_index = header.index(memory_column) if memory_column in header else None
+        rows = 0
+        cpu_batch, memory_batch = [], []
+        for row in reader:
+            if cpu_index is not None:
+                cpu_batch.append(row[cpu_index])
+            if memory_index is not None:
+                memory_batch.append(row[memory_index])
+            rows += 1
+            if rows % FILE_BATCH_ROWS == 0:
+                _add_quantities(cpu, cpu_batch)
+                _add_quantities(memory, memory_batch)
+                cpu_batch, memory_batch = [], []
+        _add_quantities(cpu, cpu_batch)
+        _add_quantities(memory, memory_batch)
+        return rows
+
+
+def current_resources(namespace: str, label_selector: str, client_context: ClientContext = None):
+    """Requests and limits of the first matching pod ({"cpu_request": cores, ...}), or {} without pods."""
+    client_context = client_context or get_client_context()
+    try:
+        pods = client_context.core_v1.list_namespaced_pod(namespace=namespace, label_selector=label_selector, limit=1).items
+    except client.ApiException as e:
+        logging.warning("Error listing pods for their current resources: %s %s", e.status, e.reason)
+        return {}
+    if not pods:
+        return {}
+    containers = pods[0].spec.containers
+    return {
+        f"{resource}_{kind[:-1]}": container_total(containers, kind, resource)
+        for resource in ("cpu", "memory") for kind in ("requests", "limits")
+    }
+
+
+def recommend_resources(
+    cpu: UsageHistogram, memory: UsageHistogram, scaling_metric_type: str = "cpu", margin: float = DEFAULT_RECOMMENDATION_MARGIN
+):
+    """
+    Requests, limits and a KEDA target from the usage histograms, as chart quantities:
+
+    * CPU request: P90 plus margin; limit: P99 plus margin, and at least 1.5x the request.
+    * Memory request: P95 plus margin; limit: the observed maximum plus margin.
+    * Target: the median usage as a share of the recommended request, kept within 50-85%. HPA
+      then holds the replica count where pods sit at typical load and adds replicas as load
+      moves toward the busy-period usage the request was sized for. For 'cpu' it is a
+      utilization percentage; for 'memory' the equivalent average value per pod.
+
+    Returns None for what wasn't sampled.
+    """
+    recommendation = {"cpu_request": None, "cpu_limit": None, "memory_request": None, "memory_limit": None, "target": None}
+    if cpu.total:
+        cpu_request = max(cpu.percentile(CPU_REQUEST_PERCENTILE) * (1 + margin), CPU_FIRST_BUCKET)
+        cpu_limit = max(cpu.percentile(CPU_LIMIT_PERCENTILE) * (1 + margin), cpu_request * CPU_LIMIT_MIN_RATIO)
+        recommendation["cpu_request"] = format_cpu(cpu_request)
+        recommendation["cpu_limit"] = format_cpu(cpu_limit)
+        if scaling_metric_type == "cpu":
+            recommendation["target"] = str(_target_utilization(cpu.percentile(50), cpu_request))
+    if memory.total:
+        memory_request = max(memory.percentile(MEMORY_REQUEST_PERCENTILE) * (1 + margin), MEMORY_FIRST_BUCKET)
+        memory_limit = max(memory.max * (1 + margin), memory_request)
+        recommendation["memory_request"] = format_memory(memory_request)
+        recommendation["memory_limit"] = format_memory(memory_limit)
+        if scaling_metric_type == "memory":
+            utilization = _target_utilization(memory.percentile(50), memory_request)
+            recommendation["target"] = format_memory(memory_request * utilization / 100)
+    return recommendation
+
+
+def values_overlay(recommendation: dict, scaling_metric_type: str = "cpu"):
+    """Helm values for my-app-chart with the recommendation, for 'helm upgrade -f'."""
+    overlay = {}
+    for kind in ("request", "limit"):
+        resources = {
+            resource: recommendation[f"{resource}_{kind}"]
+            for resource in ("cpu", "memory") if recommendation[f"{resource}_{kind}"]
+        }
+        if resources:
+            overlay.setdefault("resources", {})[f"{kind}s"] = resources
+    if recommendation["target"]:
+        overlay["kedaConfig"] = {"metricType": scaling_metric_type, "metricValue": recommendation["target"]}
+    return overlay
+
+
+def write_values_overlay(path: str, overlay: dict):
+    with open(path, "w") as overlay_file:
+        yaml.safe_dump(overlay, overlay_file, default_flow_style=False)
+
+
+def print_recommendation(cpu: UsageHistogram, memory: UsageHistogram, recommendation: dict, current: dict, scaling_metric_type: str):
+    """Prints the usage percentiles next to the current and recommended requests and limits."""
+    rows = []
+    for resource, histogram, format_quantity in (("CPU", cpu, format_cpu), ("Memory", memory, format_memory)):
+        if not histogram.total:
+            continue
+        key = resource.lower()
+        rows.append([
+            resource,
+            histogram.total,
+            *(format_quantity(histogram.percentile(percent)) for percent in (50, 90, 95, 99)),
+            format_quantity(histogram.max),
+            _format_optional(current.get(f"{key}_request"), format_quantity),
+            recommendation[f"{key}_request"],
+            _format_optional(current.get(f"{key}_limit"), format_quantity),
+            recommendation[f"{key}_limit"],
+        ])
+
+    print("\n--- Resource Recommendation ---")
+    print(tabulate(
+        rows,
+        headers=["Resource", "Samples", "P50", "P90", "P95", "P99", "Max", "Request", "Recommended", "Limit", "Recommended"],
+        tablefmt="grid"
+    ))
+    if recommendation["target"]:
+        unit = "% utilization" if scaling_metric_type == "cpu" else " average per pod"
+        print(f"KEDA {scaling_metric_type} target: {recommendation['target']}{unit}")
+    flags = [
+        f"{flag} {recommendation[key]}"
+        for flag, key in (("--cpu-req", "cpu_request"), ("--cpu-limit", "cpu_limit"),
+                          ("--mem-req", "memory_request"), ("--mem-limit", "memory_limit"),
+                          ("--scaling-metric-value", "target"))
+        if recommendation[key]
+    ]
+    print(f"create-deployment options: {' '.join(flags)}")
+    print("-------------------------------\n")
+
+
+def format_cpu(cores: float):
+    return f"{math.ceil(round(cores * 1000, 6))}m" # Rounded first, so 1.5 * 0.1 cores is 150m rather than 151m
+
+
+def format_memory(size: float):
+    return f"{math.ceil(round(size / 1024 / 1024, 6))}Mi"
+
+
+def _target_utilization(median: float, request: float):
+    low, high = TARGET_UTILIZATION_RANGE
+    return int(min(max(round(100 * median / request), low), high))
+
+
+def _add_quantities(histogram: UsageHistogram, values: list):
+    if values:
+        histogram.add([_quantity(value) for value in values])
+
+
+def _quantity(value):
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except ValueError:
+        return float(parse_quantity(value))
+
+
+def _check_columns(path: str, header: list, cpu_column: str, memory_column: str):
+    """The usage columns the file has; raises ValueError when it has neither."""
+    found = [column for column in (cpu_column, memory_column) if column in header]
+    if not found:
+        raise ValueError(f"Neither '{cpu_column}' nor '{memory_column}' found in '{path}' (columns: {', '.join(header)})")
+    return found
+
+
+def _format_optional(value, format_quantity):
+    return format_quantity(value) if value is not None else "-"
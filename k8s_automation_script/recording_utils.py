@@ -0,0 +1,257 @@
+import os
+import glob
+import time
+import array
+import logging
+import threading
+
+import numpy as np
+from kubernetes.utils import parse_quantity
+
+from client_utils import ClientContext, get_client_context
+from defaults import DEFAULT_FLUSH_ROWS, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_BYTES
+from informer_utils import wait_for_sync
+from status_utils import build_status_caches
+
+KINDS = ["Deployment", "HorizontalPodAutoscaler", "ScaledObject"]
+
+# Column name -> array typecode. Missing numbers are recorded as -1 (integers) or NaN (floats).
+COLUMNS = {
+    "time": "d", # Unix time the event was received
+    "kind": "B", # Index into KINDS
+    "object": "I", # Index into the chunk's "objects" table of "namespace/deployment" strings
+    "replicas": "i", # Deployment status.replicas / HPA status.currentReplicas
+    "ready_replicas": "i", # Deployment status.readyReplicas
+    "desired_replicas": "i", # Deployment spec.replicas / HPA status.desiredReplicas
+    "metric_current": "d", # HPA: first metric's current value
+    "metric_target": "d", # HPA: first metric's target value
+    "ready": "b", # ScaledObject Ready condition: 1, 0 or -1 when unknown
+    "active": "b", # ScaledObject Active condition
+}
+
+
+class ScalingRecorder:
+    """
+    Buffers scaling events in typed arrays, one per column, and writes them as compressed NumPy
+    chunks (.npz) every flush_rows events or flush_interval seconds. Appending is a few array
+    appends under a lock; compression and file writes happen on a background thread. Once the
+    chunks in the directory exceed max_bytes, the oldest are deleted.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "scaling",
+        flush_rows: int = DEFAULT_FLUSH_ROWS,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.directory = directory
+        self.prefix = prefix
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.events = 0
+        self.chunks = 0
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stop = threading.Event()
+        self._sequence = 0
+        self._reset_buffers()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="recorder-flush", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Writes what is still buffered and stops the flush thread."""
+        self._stop.set()
+        self._flush_requested.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._flush()
+
+    def record(self, kind: str, event_type: str, obj):
+        """ResourceCache on_event callback."""
+        if event_type == "DELETED":
+            return
+        row = _event_row(kind, obj)
+        if row is None:
+            return
+        object_name = row.pop("object")
+        with self._lock:
+            object_index = self._objects.setdefault(object_name, len(self._objects))
+            self._buffers["time"].append(time.time())
+            self._buffers["kind"].append(KINDS.index(kind))
+            self._buffers["object"].append(object_index)
+            for column, value in row.items():
+                self._buffers[column].append(value)
+            self.events += 1
+            if len(self._buffers["time"]) >= self.flush_rows:
+                self._flush_requested.set()
+
+    def _reset_buffers(self):
+        self._buffers = {column: array.array(typecode) for column, typecode in COLUMNS.items()}
+        self._objects = {}
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            if not self._buffers["time"]:
+                return
+            buffers, objects = self._buffers, self._objects
+            self._reset_buffers()
+            self._sequence += 1
+            sequence = self._sequence
+
+        columns = {column: np.frombuffer(buffer, dtype=buffer.typecode) for column, buffer in buffers.items()}
+        columns["objects"] = np.array(list(objects), dtype=str) # Insertion order matches the indexes
+        path = os.path.join(self.directory, f"{self.prefix}-{time.strftime('%Y%m%dT%H%M%S')}-{sequence:06d}.npz")
+        try:
+            np.savez_compressed(path, **columns)
+        except OSError as e:
+            logging.error("Could not write recording chunk '%s': %s", path, e)
+            return
+        self.chunks += 1
+        self._rotate()
+
+    def _rotate(self):
+        chunks = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}-*.npz")))
+        sizes = [os.path.getsize(chunk) for chunk in chunks]
+        total = sum(sizes)
+        for chunk, size in zip(chunks, sizes): # Oldest first, by name
+            if total <= self.max_bytes:
+                break
+            os.remove(chunk)
+            total -= size
+
+
+def _event_row(kind: str, obj):
+    if kind == "Deployment":
+        status = obj.status
+        return {
+            "object": f"{obj.metadata.namespace}/{obj.metadata.name}",
+            "replicas": _int(status.replicas if status else None),
+            "ready_replicas": _int(status.ready_replicas if status else None),
+            "desired_replicas": _int(obj.spec.replicas),
+            "metric_current": np.nan,
+            "metric_target": np.nan,
+            "ready": -1,
+            "active": -1,
+        }
+    if kind == "HorizontalPodAutoscaler":
+        target = obj.spec.scale_target_ref
+        current, goal = _hpa_metric(obj)
+        return {
+            "object": f"{obj.metadata.namespace}/{target.name}",
+            "replicas": _int(obj.status.current_replicas),
+            "ready_replicas": -1,
+            "desired_replicas": _int(obj.status.desired_replicas),
+            "metric_current": current,
+            "metric_target": goal,
+            "ready": -1,
+            "active": -1,
+        }
+    if kind == "ScaledObject":
+        target = obj.get("spec", {}).get("scaleTargetRef", {})
+        conditions = {c.get("type"): c.get("status") for c in obj.get("status", {}).get("conditions") or []}
+        return {
+            "object": f"{obj['metadata']['namespace']}/{target.get('name')}",
+            "replicas": -1,
+            "ready_replicas": -1,
+            "desired_replicas": -1,
+            "metric_current": np.nan,
+            "metric_target": np.nan,
+            "ready": {"True": 1, "False": 0}.get(conditions.get("Ready"), -1),
+            "active": {"True": 1, "False": 0}.get(conditions.get("Active"), -1),
+        }
+    return None
+
+
+def _hpa_metric(hpa):
+    """(current, target) of the HPA's first metric as numbers; NaN when not reported."""
+    if not hpa.spec.metrics:
+        return np.nan, np.nan
+    spec = hpa.spec.metrics[0]
+    source = {"Resource": "resource", "External": "external", "Pods": "pods", "Object": "object",
+              "ContainerResource": "container_resource"}.get(spec.type)
+    if source is None:
+        return np.nan, np.nan
+    current = next(
+        (getattr(metric, source) for metric in hpa.status.current_metrics or [] if metric.type == spec.type), None
+    )
+    return _metric_number(getattr(current, "current", None)), _metric_number(getattr(spec, source).target)
+
+
+def _metric_number(value):
+    if value is None:
+        return np.nan
+    if getattr(value, "average_utilization", None) is not None:
+        return float(value.average_utilization)
+    for quantity in (getattr(value, "average_value", None), getattr(value, "value", None)):
+        if quantity is not None:
+            return float(parse_quantity(quantity))
+    return np.nan
+
+
+def _int(value):
+    return -1 if value is None else int(value)
+
+
+def load_recording(directory: str, prefix: str = "scaling"):
+    """
+    Concatenates every chunk in directory into one dict of NumPy arrays, ordered by time.
+    'object' holds the "namespace/deployment" strings and 'kind' the kind names, so the result
+    can be passed straight to pandas.DataFrame.
+    """
+    parts = {column: [] for column in COLUMNS}
+    for chunk_path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.npz"))):
+        with np.load(chunk_path) as chunk:
+            objects = chunk["objects"]
+            for column in COLUMNS:
+                parts[column].append(objects[chunk["object"]] if column == "object" else chunk[column])
+    if not parts["time"]:
+        return {column: np.array([]) for column in COLUMNS}
+    columns = {column: np.concatenate(values) for column, values in parts.items()}
+    columns["kind"] = np.array(KINDS)[columns["kind"]]
+    order = np.argsort(columns["time"], kind="stable")
+    return {column: values[order] for column, values in columns.items()}
+
+
+def record_scaling_events(
+    recorder: ScalingRecorder,
+    namespaces: list = None,
+    label_selector: str = None,
+    duration: float = None,
+    client_context: ClientContext = None
+):
+    """
+    Streams Deployment, HPA and ScaledObject changes into recorder until interrupted or until
+    duration seconds have passed.
+    """
+    client_context = client_context or get_client_context()
+    caches = build_status_caches(client_context, namespaces, label_selector, on_event=recorder.record)
+    all_caches = [cache for kind_caches in caches.values() for cache in kind_caches]
+    recorder.start()
+    for cache in all_caches:
+        cache.start()
+
+    deadline = time.monotonic() + duration if duration else None
+    try:
+        if not wait_for_sync(all_caches, timeout=30):
+            logging.warning("Not every resource type could be listed yet; recording what is available.")
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(1.0 if deadline is None else max(0, min(1.0, deadline - time.monotonic())))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for cache in all_caches:
+            cache.stop()
+        recorder.close()
@@ -0,0 +1,377 @@
+import os
+import copy
+import logging
+import subprocess
+import tempfile
+
+import yaml
+
+from async_client_utils import AsyncClientContext, use_client_context
+from cache_utils import RenderCache, get_render_cache
+from defaults import FIELD_MANAGER
+from metrics_utils import time_helm
+
+# REST collection for each kind the chart can produce: (API prefix, plural, namespaced)
+RESOURCE_PATHS = {
+    ("v1", "ServiceAccount"): ("/api/v1", "serviceaccounts", True),
+    ("v1", "Service"): ("/api/v1", "services", True),
+    ("v1", "Namespace"): ("/api/v1", "namespaces", False),
+    ("apps/v1", "Deployment"): ("/apis/apps/v1", "deployments", True),
+    ("networking.k8s.io/v1", "Ingress"): ("/apis/networking.k8s.io/v1", "ingresses", True),
+    ("keda.sh/v1alpha1", "ScaledObject"): ("/apis/keda.sh/v1alpha1", "scaledobjects", True),
+}
+
+# Order Helm installs these kinds in, so dependencies exist before the objects that use them
+INSTALL_ORDER = ["Namespace", "ServiceAccount", "Service", "Deployment", "Ingress", "ScaledObject"]
+
+# Identifies render_chart's output in render cache keys; bump it when the templates below change
+NATIVE_RENDERER = "native 1"
+
+
+def load_chart(chart_path: str):
+    """Returns (Chart.yaml metadata, default values.yaml) of a chart directory."""
+    with open(os.path.join(chart_path, "Chart.yaml")) as chart_file:
+        chart = yaml.safe_load(chart_file)
+    values_path = os.path.join(chart_path, "values.yaml")
+    values = {}
+    if os.path.exists(values_path):
+        with open(values_path) as values_file:
+            values = yaml.safe_load(values_file) or {}
+    return chart, values
+
+
+def coalesce_values(defaults: dict, overrides: dict):
+    """Merges user values over chart defaults the way Helm does: maps merge, null removes a key."""
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = coalesce_values(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+# --- Equivalents of the named templates in my-app-chart/templates/_helpers.tpl ---
+
+def _trunc63(text: str):
+    # trunc 63 | trimSuffix "-": only one trailing dash goes
+    return text[:63].removesuffix("-")
+
+
+def chart_name(chart: dict, values: dict):
+    """my-app-chart.name"""
+    return _trunc63(values.get("nameOverride") or chart["name"])
+
+
+def chart_fullname(release_name: str, chart: dict, values: dict):
+    """my-app-chart.fullname"""
+    if values.get("fullnameOverride"):
+        return _trunc63(values["fullnameOverride"])
+    name = values.get("nameOverride") or chart["name"]
+    if name in release_name:
+        return _trunc63(release_name)
+    return _trunc63(f"{release_name}-{name}")
+
+
+def selector_labels(release_name: str, chart: dict, values: dict):
+    """my-app-chart.selectorLabels"""
+    return {
+        "app.kubernetes.io/name": chart_name(chart, values),
+        "app.kubernetes.io/instance": release_name,
+    }
+
+
+def chart_labels(release_name: str, chart: dict, values: dict):
+    """my-app-chart.labels"""
+    labels = {"helm.sh/chart": _trunc63(f"{chart['name']}-{chart['version']}".replace("+", "_"))}
+    labels.update(selector_labels(release_name, chart, values))
+    if chart.get("appVersion"):
+        labels["app.kubernetes.io/version"] = str(chart["appVersion"])
+    labels["app.kubernetes.io/managed-by"] = "Helm"
+    return labels
+
+
+def service_account_name(release_name: str, chart: dict, values: dict):
+    """my-app-chart.serviceAccountName"""
+    service_account = values.get("serviceAccount") or {}
+    if service_account.get("create"):
+        return service_account.get("name") or chart_fullname(release_name, chart, values)
+    return service_account.get("name") or "default"
+
+
+# --- Templates ---
+
+def render_chart(release_name: str, namespace: str, chart_path: str, helm_values: dict):
+    """
+    Builds the objects my-app-chart's templates produce for these values, without running Helm.
+    The result matches 'helm template' for the same release, namespace and values.
+    """
+    chart, default_values = load_chart(chart_path)
+    values = coalesce_values(default_values, helm_values)
+    fullname = chart_fullname(release_name, chart, values)
+    labels = chart_labels(release_name, chart, values)
+    selector = selector_labels(release_name, chart, values)
+
+    manifests = []
+
+    service_account = values.get("serviceAccount") or {}
+    if service_account.get("create"):
+        metadata = {"name": service_account_name(release_name, chart, values), "labels": dict(labels)}
+        if service_account.get("annotations"):
+            metadata["annotations"] = service_account["annotations"]
+        manifests.append({
+            "apiVersion": "v1",
+            "kind": "ServiceAccount",
+            "metadata": metadata,
+            "automountServiceAccountToken": service_account.get("automount"),
+        })
+
+    manifests.append({
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {"name": fullname, "labels": dict(labels)},
+        "spec": {
+            "type": values["service"]["type"],
+            "ports": [{"port": values["service"]["port"], "targetPort": "http", "protocol": "TCP", "name": "http"}],
+            "selector": dict(selector),
+        },
+    })
+
+    pod_metadata = {"labels": dict(selector)}
+    if values.get("podAnnotations"):
+        pod_metadata = {"annotations": values["podAnnotations"], "labels": dict(selector)}
+    image = values["image"]
+    manifests.append({
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": fullname, "labels": dict(labels)},
+        "spec": {
+            "replicas": values["replicaCount"],
+            "selector": {"matchLabels": dict(selector)},
+            "template": {
+                "metadata": pod_metadata,
+                "spec": {
+                    "containers": [{
+                        "name": chart["name"],
+                        "image": f"{image['repository']}:{image.get('tag') or chart.get('appVersion')}",
+                        "imagePullPolicy": image.get("pullPolicy"),
+                        "ports": [{"name": "http", "containerPort": values["service"]["port"], "protocol": "TCP"}],
+                        "resources": values.get("resources"),
+                    }],
+                },
+            },
+        },
+    })
+
+    ingress = values.get("ingress") or {}
+    if ingress.get("enabled"):
+        manifests.append(_render_ingress(fullname, labels, ingress, values["service"]["port"]))
+
+    keda_config = values.get("kedaConfig") or {}
+    if keda_config.get("enabled"):
+        manifests.append(_render_scaled_object(fullname, namespace, labels, keda_config))
+
+    return manifests
+
+
+def _render_scaled_object(fullname: str, namespace: str, labels: dict, keda_config: dict):
+    metric_type = keda_config.get("metricType")
+    trigger_metadata = dict(keda_config.get("eventSourceConfig") or {})
+    if metric_type == "cpu":
+        trigger_metadata["metricType"] = "Utilization"
+    if metric_type == "memory":
+        trigger_metadata["metricType"] = "AverageValue"
+    if metric_type in ("cpu", "memory") and keda_config.get("metricValue"):
+        trigger_metadata["value"] = str(keda_config["metricValue"])
+
+    return {
+        "apiVersion": "keda.sh/v1alpha1",
+        "kind": "ScaledObject",
+        "metadata": {"name": f"{fullname}-scaledobject", "namespace": namespace, "labels": dict(labels)},
+        "spec": {
+            "scaleTargetRef": {"apiVersion": "apps/v1", "kind": "Deployment", "name": fullname},
+            "minReplicaCount": keda_config.get("minReplicas"),
+            "maxReplicaCount": keda_config.get("maxReplicas"),
+            "triggers": [{"type": metric_type, "metadata": trigger_metadata or None}],
+        },
+    }
+
+
+def _render_ingress(fullname: str, labels: dict, ingress: dict, service_port: int):
+    metadata = {"name": fullname, "labels": dict(labels)}
+    if ingress.get("annotations"):
+        metadata["annotations"] = ingress["annotations"]
+    spec = {}
+    if ingress.get("className"):
+        spec["ingressClassName"] = ingress["className"]
+    if ingress.get("tls"):
+        spec["tls"] = [{"hosts": tls.get("hosts") or None, "secretName": tls.get("secretName")} for tls in ingress["tls"]]
+    rules = []
+    for host in ingress.get("hosts") or []:
+        paths = []
+        for path in host.get("paths") or []:
+            rendered = {"path": path.get("path")}
+            if path.get("pathType"):
+                rendered["pathType"] = path["pathType"]
+            rendered["backend"] = {"service": {"name": fullname, "port": {"number": service_port}}}
+            paths.append(rendered)
+        rules.append({"host": host.get("host"), "http": {"paths": paths or None}})
+    spec["rules"] = rules or None
+    return {"apiVersion": "networking.k8s.io/v1", "kind": "Ingress", "metadata": metadata, "spec": spec}
+
+
+# --- Applying and checking ---
+
+async def apply_manifests(
+    manifests: list,
+    namespace: str,
+    field_manager: str = FIELD_MANAGER,
+    force: bool = True,
+    client_context: AsyncClientContext = None
+):
+    """
+    Applies manifests with server-side apply. Objects are applied in Helm's install order;
+    re-applying unchanged objects is a no-op on the server. Returns the applied objects.
+    """
+    ordered = sorted(manifests, key=lambda m: INSTALL_ORDER.index(m["kind"]) if m["kind"] in INSTALL_ORDER else len(INSTALL_ORDER))
+    async with use_client_context(client_context) as client_context:
+        return [await server_side_apply(manifest, namespace, field_manager, force, client_context) for manifest in ordered]
+
+
+async def server_side_apply(
+    manifest: dict,
+    namespace: str,
+    field_manager: str = FIELD_MANAGER,
+    force: bool = True,
+    client_context: AsyncClientContext = None
+):
+    """Creates or updates one object with a server-side apply PATCH. Returns the object as stored."""
+    manifest = copy.deepcopy(manifest)
+    prefix, plural, namespaced = RESOURCE_PATHS[(manifest["apiVersion"], manifest["kind"])]
+    name = manifest["metadata"]["name"]
+    if namespaced:
+        manifest["metadata"]["namespace"] = manifest["metadata"].get("namespace") or namespace
+        path = f"{prefix}/namespaces/{manifest['metadata']['namespace']}/{plural}/{name}"
+    else:
+        path = f"{prefix}/{plural}/{name}"
+
+    query = {"fieldManager": field_manager}
+    if force:
+        query["force"] = "true"
+    async with use_client_context(client_context) as client_context:
+        return await client_context.api_request(
+            "PATCH", path, query=query, body=manifest, content_type="application/apply-patch+yaml"
+        )
+
+
+def helm_template(release_name: str, namespace: str, chart_path: str, helm_values: dict):
+    """Renders the chart with 'helm template' and returns the parsed objects."""
+    fd, values_path = tempfile.mkstemp(suffix='.yaml')
+    try:
+        with os.fdopen(fd, 'w') as values_file:
+            yaml.dump(helm_values, values_file, Dumper=yaml.SafeDumper)
+        with time_helm("template"):
+            result = subprocess.run(
+                ['helm', 'template', release_name, chart_path, '--namespace', namespace, '-f', values_path, '--skip-tests'],
+                capture_output=True, text=True, check=True
+            )
+    finally:
+        os.remove(values_path)
+    return [doc for doc in yaml.safe_load_all(result.stdout) if doc]
+
+
+_helm_version = None
+
+
+def helm_version():
+    """'helm version --short' output, looked up once per process."""
+    global _helm_version
+    if _helm_version is None:
+        result = subprocess.run(['helm', 'version', '--short'], capture_output=True, text=True, check=True)
+        _helm_version = result.stdout.strip()
+    return _helm_version
+
+
+def render_key(release_name: str, namespace: str, chart_path: str, helm_values: dict, engine: str = "helm"):
+    """
+    The render cache key of a release: a digest of the chart contents, values, release, namespace and
+    renderer (the Helm version, or NATIVE_RENDERER). Idempotent deploys record it on the Deployment.
+    """
+    renderer = f"helm {helm_version()}" if engine == "helm" else NATIVE_RENDERER
+    return RenderCache.key(renderer, release_name, namespace, chart_path, helm_values)
+
+
+def render_release(
+    release_name: str, namespace: str, chart_path: str, helm_values: dict, engine: str = "helm",
+    render_cache: RenderCache = None
+):
+    """
+    The objects a release would install, from 'helm template' or the native renderer, through the
+    render cache: a release whose render_key was seen before is read back from disk.
+    """
+    render_cache = render_cache or get_render_cache()
+    key = render_key(release_name, namespace, chart_path, helm_values, engine)
+    manifests = render_cache.get(key)
+    if manifests is None:
+        if engine == "native":
+            manifests = render_chart(release_name, namespace, chart_path, helm_values)
+        else:
+            manifests = helm_template(release_name, namespace, chart_path, helm_values)
+        render_cache.put(key, manifests)
+    return manifests
+
+
+def diff_native_render(release_name: str, namespace: str, chart_path: str, helm_values: dict):
+    """
+    Golden check of render_chart against 'helm template' for the same inputs.
+    Returns a list of human-readable differences; empty when both engines agree.
+    """
+    return diff_manifests(
+        render_release(release_name, namespace, chart_path, helm_values, "helm"),
+        render_chart(release_name, namespace, chart_path, helm_values)
+    )
+
+
+def diff_manifests(helm_manifests: list, native_manifests: list):
+    """Differences between the objects 'helm template' rendered and the native ones, matched by kind and name."""
+    native = {(m["kind"], m["metadata"]["name"]): m for m in native_manifests}
+    helm = {(m["kind"], m["metadata"]["name"]): m for m in helm_manifests}
+
+    differences = []
+    for key in sorted(set(native) | set(helm)):
+        if key not in native:
+            differences.append(f"{key[0]}/{key[1]}: rendered by Helm only")
+        elif key not in helm:
+            differences.append(f"{key[0]}/{key[1]}: rendered natively only")
+        else:
+            differences.extend(f"{key[0]}/{key[1]}: {line}" for line in _diff_objects(helm[key], native[key]))
+    return differences
+
+
+def _diff_objects(expected, actual, path: str = ""):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            yield from _diff_objects(expected.get(key), actual.get(key), f"{path}.{key}")
+    elif isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        for index, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+            yield from _diff_objects(expected_item, actual_item, f"{path}[{index}]")
+    elif expected != actual:
+        yield f"{path or '.'}: helm={expected!r} native={actual!r}"
+
+
+async def apply_native(
+    release_name: str,
+    namespace: str,
+    chart_path: str,
+    helm_values: dict,
+    client_context: AsyncClientContext = None
+):
+    """
+    Renders the chart natively (through the render cache) and applies it with server-side apply,
+    in place of 'helm install'.
+    """
+    manifests = render_release(release_name, namespace, chart_path, helm_values, "native")
+    logging.info("Applying %d object(s) for release '%s' in namespace '%s' (native engine)...", len(manifests), release_name, namespace)
+    return await apply_manifests(manifests, namespace, client_context=client_context)
@@ -0,0 +1,240 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+from defaults import DEFAULT_QPS, DEFAULT_BURST, DEFAULT_MAX_RETRIES
+from metrics_utils import RETRIES, THROTTLED, RATE_LIMIT_WAIT, api_verb_and_resource
+
+# Responses that mean the API server (or a proxy in front of it) didn't handle the request
+THROTTLE_STATUSES = {429}
+UNAVAILABLE_STATUSES = {500, 502, 503, 504}
+
+# Helm output that means the API server, not the chart, was the problem; the same command can be run again
+TRANSIENT_HELM_ERRORS = [
+    "429", "Too Many Requests", "the server is currently unable to handle the request",
+    "etcdserver: request timed out", "connection refused", "connection reset by peer",
+    "i/o timeout", "TLS handshake timeout", "unexpected EOF", "context deadline exceeded",
+]
+
+
+class RetryPolicy:
+    """
+    When and how often a request is tried again: on which HTTP statuses, whether after a dropped
+    connection (only safe when sending it twice does no harm), and the backoff between attempts.
+    """
+
+    def __init__(
+        self,
+        statuses: set,
+        connection_errors: bool,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = 0.2,
+        max_delay: float = 30.0
+    ):
+        self.statuses = statuses
+        self.connection_errors = connection_errors
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: float = None):
+        """
+        Seconds to wait before retry number attempt (0-based): the server's Retry-After when it sent one,
+        otherwise exponential backoff with full jitter, so clients that failed together don't retry together.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# By verb, as in api_verb_and_resource. Reads, deletes, updates (guarded by resourceVersion) and
+# patches (server-side apply) can be sent twice; a create may have happened even if its response was
+# lost, so it is only retried when the server said it didn't handle it. A watch is retried when the
+# server refuses to open it; a stream that drops later is resumed by its caller (wait_utils, informer_utils).
+RETRY_POLICIES = {
+    "get": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "list": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "patch": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "update": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "delete": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "deletecollection": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=True),
+    "create": RetryPolicy(THROTTLE_STATUSES | {503}, connection_errors=False),
+    "watch": RetryPolicy(THROTTLE_STATUSES | UNAVAILABLE_STATUSES, connection_errors=False),
+}
+DEFAULT_RETRY_POLICY = RetryPolicy(THROTTLE_STATUSES, connection_errors=False)
+HELM_RETRY_POLICY = RetryPolicy(set(), connection_errors=False, max_retries=3, base_delay=2.0)
+
+
+class RateLimiter:
+    """
+    Client-side token bucket like client-go's: up to burst requests at once, then qps per second.
+    Shared by every thread and event loop using one cluster, so together they stay under the limit.
+
+    The rate adapts: each 429 halves it (down to a tenth of qps) and successful requests win it
+    back gradually, so bulk operations settle at the throughput the API server's priority and
+    fairness allows instead of being rejected over and over. qps <= 0 turns the limiter off.
+    """
+
+    def __init__(self, qps: float = DEFAULT_QPS, burst: int = DEFAULT_BURST):
+        self.qps = qps
+        self.burst = max(1, burst)
+        self.rate = qps
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token; returns the seconds the caller must wait before sending its request."""
+        if self.qps <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is the queue of callers already waiting for tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            RATE_LIMIT_WAIT.observe(delay)
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay:
+            RATE_LIMIT_WAIT.observe(delay)
+            await asyncio.sleep(delay)
+
+    def throttled(self):
+        """The API server answered 429: slow down."""
+        with self._lock:
+            self.rate = max(self.qps / 10, self.rate / 2)
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.qps:
+                self.rate = min(self.qps, self.rate + self.qps / 100)
+
+
+def install_retries(api_client, rate_limiter: RateLimiter):
+    """
+    Sends every request of a kubernetes ApiClient through rate_limiter and retries failed ones as
+    RETRY_POLICIES says. Install it after instrument_rest_client, so each attempt is timed.
+    """
+    import urllib3
+    rest_request = api_client.rest_client.request
+
+    def request(method, url, *args, **kwargs):
+        verb, resource = api_verb_and_resource(method, url, kwargs.get("query_params"))
+        policy = RETRY_POLICIES.get(verb, DEFAULT_RETRY_POLICY)
+        attempt = 0
+        while True:
+            rate_limiter.acquire()
+            try:
+                response = rest_request(method, url, *args, **kwargs)
+                status, headers, error = response.status, response, None
+            except urllib3.exceptions.HTTPError as e:
+                # Raised before any response, so only the policy can say whether resending is safe
+                if not policy.connection_errors or attempt >= policy.max_retries:
+                    raise
+                status, headers, error = None, None, e
+            except Exception as e:
+                status = getattr(e, "status", None)
+                if status not in policy.statuses or attempt >= policy.max_retries:
+                    _observe_status(rate_limiter, status, verb, resource)
+                    raise
+                headers, error = e, e
+            _observe_status(rate_limiter, status, verb, resource)
+            if error is None and (status not in policy.statuses or attempt >= policy.max_retries):
+                return response
+            if error is None:
+                _release(response)
+            delay = policy.delay(attempt, retry_after_seconds(headers))
+            _log_retry(verb, resource, status, error, attempt, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    api_client.rest_client.request = request
+
+
+def install_async_retries(api_client, rate_limiter: RateLimiter):
+    """install_retries for a kubernetes_asyncio ApiClient."""
+    import aiohttp
+    rest_request = api_client.rest_client.request
+
+    async def request(method, url, *args, **kwargs):
+        verb, resource = api_verb_and_resource(method, url, kwargs.get("query_params"))
+        policy = RETRY_POLICIES.get(verb, DEFAULT_RETRY_POLICY)
+        attempt = 0
+        while True:
+            await rate_limiter.acquire_async()
+            try:
+                response = await rest_request(method, url, *args, **kwargs)
+                _observe_status(rate_limiter, response.status, verb, resource)
+                return response
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not policy.connection_errors or attempt >= policy.max_retries:
+                    raise
+                status, error = None, e
+            except Exception as e:
+                status, error = getattr(e, "status", None), e
+                _observe_status(rate_limiter, status, verb, resource)
+                if status not in policy.statuses or attempt >= policy.max_retries:
+                    raise
+            delay = policy.delay(attempt, retry_after_seconds(error))
+            _log_retry(verb, resource, status, error, attempt, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    api_client.rest_client.request = request
+
+
+def retry_after_seconds(response_or_exception):
+    """The Retry-After header of a response or ApiException, in seconds; None when it has none."""
+    headers = getattr(response_or_exception, "headers", None)
+    if headers is None and callable(getattr(response_or_exception, "getheaders", None)):
+        headers = response_or_exception.getheaders()
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient_helm_error(output: str):
+    """Whether Helm failed because the API server was busy or unreachable rather than because of the chart."""
+    return any(marker in (output or "") for marker in TRANSIENT_HELM_ERRORS)
+
+
+def _observe_status(rate_limiter: RateLimiter, status, verb: str, resource: str):
+    if status in THROTTLE_STATUSES:
+        THROTTLED.labels(verb, resource).inc()
+        rate_limiter.throttled()
+    elif status is not None and status < 400:
+        rate_limiter.succeeded()
+
+
+def _log_retry(verb: str, resource: str, status, error, attempt: int, delay: float):
+    RETRIES.labels("api").inc()
+    logging.debug(
+        "Retrying %s %s after %s in %.2fs (retry %d)",
+        verb, resource, f"HTTP {status}" if status else error.__class__.__name__, delay, attempt + 1
+    )
+
+
+def _release(response):
+    """Returns the connection of a response that won't be read to the pool."""
+    raw = getattr(response, "response", None) or getattr(response, "urllib3_response", None)
+    if raw is not None and callable(getattr(raw, "release_conn", None)):
+        raw.release_conn()
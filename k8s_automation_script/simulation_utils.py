@@ -0,0 +1,264 @@
+import os
+import csv
+import math
+
+import numpy as np
+import yaml
+from kubernetes.utils import parse_quantity
+from tabulate import tabulate
+
+from defaults import HPA_SYNC_PERIOD, HPA_TOLERANCE
+
+# Defaults of the HPA controller that KEDA hands the ScaledObject to (sync period and tolerance in defaults.py)
+DEFAULT_SCALE_UP_WINDOW = 0 # Stabilization window seconds
+DEFAULT_SCALE_DOWN_WINDOW = 300
+# Default scaling policies: up by max(4 pods, 100%) and down by 100% per 15 seconds
+DEFAULT_SCALE_UP_POLICIES = [{"type": "Pods", "value": 4, "periodSeconds": 15}, {"type": "Percent", "value": 100, "periodSeconds": 15}]
+DEFAULT_SCALE_DOWN_POLICIES = [{"type": "Percent", "value": 100, "periodSeconds": 15}]
+DEFAULT_COOLDOWN_PERIOD = 300 # KEDA: seconds without activity before scaling to zero
+
+# Trigger metadata keys that hold the per-replica target, by trigger type
+TARGET_KEYS = ["value", "targetValue", "threshold", "lagThreshold", "queueLength", "listLength", "desiredReplicas"]
+
+
+def load_metric_samples(path: str, time_column: str = "timestamp", value_column: str = "value"):
+    """
+    Reads a metric time series from a CSV or Parquet file. Timestamps may be epoch seconds or ISO 8601.
+    Returns (timestamps in seconds, values) as float arrays sorted by time.
+    """
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow ('pip install pyarrow').") from None
+        table = parquet.read_table(path, columns=[time_column, value_column])
+        times = table.column(time_column).to_numpy()
+        values = table.column(value_column).to_numpy()
+    else:
+        with open(path, newline="") as metrics_file:
+            header = next(csv.reader(metrics_file))
+        for column in (time_column, value_column):
+            if column not in header:
+                raise ValueError(f"Column '{column}' not found in '{path}' (columns: {', '.join(header)})")
+        usecols = (header.index(time_column), header.index(value_column))
+        try:
+            columns = np.loadtxt(path, delimiter=",", skiprows=1, dtype=np.float64, ndmin=2, usecols=usecols)
+        except ValueError: # Timestamps aren't numbers, parse them as ISO 8601 below
+            columns = np.loadtxt(path, delimiter=",", skiprows=1, dtype=str, ndmin=2, usecols=usecols)
+        times, values = columns[:, 0], columns[:, 1]
+
+    times = _to_epoch_seconds(times)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(times, kind="stable")
+    return times[order], values[order]
+
+
+def _to_epoch_seconds(times: np.ndarray):
+    if np.issubdtype(times.dtype, np.datetime64):
+        return times.astype("datetime64[ms]").astype(np.int64) / 1000.0
+    try:
+        return times.astype(np.float64)
+    except ValueError:
+        # ISO 8601 strings; numpy parses them as UTC when the zone designator is dropped
+        return np.char.rstrip(times.astype(str), "Z").astype("datetime64[ms]").astype(np.int64) / 1000.0
+
+
+def load_scaling_spec(path: str):
+    """
+    Reads the scaling settings from a ScaledObject manifest, e.g. the output of 'render' or
+    'kubectl get scaledobject -o yaml'. Multi-document files are searched for the ScaledObject.
+    """
+    with open(path, "rb") as spec_file: # Bytes, so YAML detects UTF-16 exports by their BOM
+        documents = [doc for doc in yaml.safe_load_all(spec_file) if doc]
+    for document in documents:
+        if document.get("kind") == "ScaledObject":
+            return scaling_spec_from_scaled_object(document)
+    raise ValueError(f"No ScaledObject found in '{path}'")
+
+
+def scaling_spec_from_scaled_object(scaled_object: dict):
+    spec = scaled_object.get("spec", {})
+    triggers = spec.get("triggers") or []
+    if not triggers:
+        raise ValueError("The ScaledObject has no triggers")
+    trigger = triggers[0] # The input is a single series, so it drives the first trigger
+    metadata = trigger.get("metadata") or {}
+    target = next((metadata[key] for key in TARGET_KEYS if metadata.get(key) not in (None, "")), None)
+
+    behavior = spec.get("advanced", {}).get("horizontalPodAutoscalerConfig", {}).get("behavior", {})
+    scale_up = behavior.get("scaleUp") or {}
+    scale_down = behavior.get("scaleDown") or {}
+    return {
+        "name": scaled_object.get("metadata", {}).get("name"),
+        "metric_type": trigger.get("type"),
+        "target": parse_target(target) if target is not None else None,
+        "min_replicas": int(spec.get("minReplicaCount", 0)),
+        "max_replicas": int(spec.get("maxReplicaCount", 100)),
+        "cooldown_period": int(spec.get("cooldownPeriod", DEFAULT_COOLDOWN_PERIOD)),
+        "scale_up_window": int(scale_up.get("stabilizationWindowSeconds", DEFAULT_SCALE_UP_WINDOW)),
+        "scale_down_window": int(scale_down.get("stabilizationWindowSeconds", DEFAULT_SCALE_DOWN_WINDOW)),
+        "scale_up_policies": scale_up.get("policies") or DEFAULT_SCALE_UP_POLICIES,
+        "scale_up_select": scale_up.get("selectPolicy", "Max"),
+        "scale_down_policies": scale_down.get("policies") or DEFAULT_SCALE_DOWN_POLICIES,
+        "scale_down_select": scale_down.get("selectPolicy", "Max"),
+        "triggers": len(triggers),
+    }
+
+
+def parse_target(value):
+    """Trigger targets are strings such as '50', '0.5' or '128Mi'."""
+    return float(parse_quantity(str(value)))
+
+
+def simulate_replicas(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    spec: dict,
+    sync_period: float = HPA_SYNC_PERIOD,
+    tolerance: float = HPA_TOLERANCE,
+    pod_startup: float = 0,
+    initial_replicas: int = None
+):
+    """
+    Replays the HPA scaling algorithm KEDA relies on over a metric time series.
+
+    values are the total metric across the workload (e.g. the sum of pod CPU utilization, or the
+    queue length), so each replica sees values / replicas against spec["target"]. The series is
+    sampled once per sync_period, and each decision applies the tolerance band, the stabilization
+    windows, the scaling policies, the min/max clamps and, with minReplicaCount 0, KEDA's
+    scale-to-zero after the cooldown period. New replicas count as ready pod_startup seconds later.
+
+    Everything that doesn't depend on the previous decision is computed on whole arrays; only the
+    replica recurrence runs per decision, which is one step per sync period rather than per sample.
+    Returns a dict of arrays, one entry per decision.
+    """
+    target = spec["target"]
+    if not target or target <= 0:
+        raise ValueError("The scaling target must be a positive number")
+    if len(timestamps) == 0:
+        raise ValueError("No metric samples to simulate")
+
+    ticks = np.arange(timestamps[0], timestamps[-1] + sync_period / 2, sync_period)
+    # The last sample at or before each decision, as the metrics pipeline would report it
+    load = values[np.searchsorted(timestamps, ticks, side="right") - 1]
+    load = np.maximum(load, 0)
+    proportional = np.ceil(load / target - 1e-9).astype(np.int64) # Replicas that would put the metric on target
+
+    min_replicas, max_replicas = spec["min_replicas"], spec["max_replicas"]
+    if min_replicas == 0:
+        # KEDA keeps one replica until the trigger has been inactive for the whole cooldown period
+        last_active = np.maximum.accumulate(np.where(load > 0, ticks, -np.inf))
+        idle = (ticks - last_active) >= spec["cooldown_period"]
+    else:
+        idle = np.zeros(len(ticks), dtype=bool)
+
+    up_window = max(1, int(math.ceil(spec["scale_up_window"] / sync_period)) + 1)
+    down_window = max(1, int(math.ceil(spec["scale_down_window"] / sync_period)) + 1)
+
+    replicas = np.empty(len(ticks), dtype=np.int64)
+    recommendations = [0] * len(ticks)
+    current = initial_replicas if initial_replicas is not None else max(min_replicas, min(max_replicas, proportional[0]))
+    for i in range(len(ticks)):
+        if idle[i]:
+            recommendation = 0
+        elif current == 0:
+            recommendation = max(1, proportional[i]) # Activation
+        elif abs(load[i] / (current * target) - 1) <= tolerance:
+            recommendation = current
+        else:
+            recommendation = int(proportional[i])
+        recommendation = min(max(recommendation, min_replicas if not idle[i] else 0), max_replicas)
+        recommendations[i] = recommendation
+
+        desired = current
+        up_recommendation = min(recommendations[max(0, i - up_window + 1):i + 1])
+        down_recommendation = max(recommendations[max(0, i - down_window + 1):i + 1])
+        if current < up_recommendation:
+            desired = min(up_recommendation, _policy_limit(spec["scale_up_policies"], spec["scale_up_select"], replicas, i, current, sync_period, up=True))
+        elif current > down_recommendation:
+            desired = max(down_recommendation, _policy_limit(spec["scale_down_policies"], spec["scale_down_select"], replicas, i, current, sync_period, up=False))
+        if idle[i]:
+            desired = 0 # KEDA scales to zero directly, outside the HPA
+        current = desired
+        replicas[i] = current
+
+    # Pods started within the last pod_startup seconds aren't serving yet
+    delay = int(math.ceil(pod_startup / sync_period))
+    if delay:
+        earlier = np.concatenate([np.full(delay, replicas[0]), replicas[:-delay]])
+        ready = np.minimum(replicas, earlier)
+    else:
+        ready = replicas.copy()
+
+    return {
+        "time": ticks,
+        "load": load,
+        "required": proportional,
+        "recommendation": np.asarray(recommendations, dtype=np.int64),
+        "replicas": replicas,
+        "ready": ready,
+    }
+
+
+def _policy_limit(policies: list, select: str, replicas: np.ndarray, index: int, current: int, sync_period: float, up: bool):
+    """
+    Bound the scaling policies put on the next replica count. The replica count at the start of each
+    policy's period is taken from the simulated history.
+    """
+    if select == "Disabled":
+        return current
+    limits = []
+    for policy in policies:
+        period_ticks = max(1, int(policy.get("periodSeconds", 15) // sync_period))
+        start = replicas[index - period_ticks] if index >= period_ticks else current
+        if policy["type"] == "Pods":
+            change = policy["value"]
+        else:
+            change = math.ceil(start * policy["value"] / 100) if up else math.floor(start * policy["value"] / 100)
+        limits.append(start + change if up else start - change)
+    choose_larger = (select == "Max") == up # "Max" picks the policy allowing the biggest change
+    limit = max(limits) if choose_larger else min(limits)
+    return max(limit, current) if up else max(min(limit, current), 0)
+
+
+def summarize_simulation(result: dict, spec: dict, sync_period: float = HPA_SYNC_PERIOD, cost_per_replica_hour: float = 0.0):
+    """Provisioning and cost figures for a simulate_replicas result."""
+    replicas, ready, required, load = result["replicas"], result["ready"], result["required"], result["load"]
+    hours = sync_period / 3600
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_replica = np.where(ready > 0, load / ready, np.where(load > 0, np.inf, 0))
+    above_target = per_replica > spec["target"] * (1 + HPA_TOLERANCE)
+    replica_hours = float(replicas.sum() * hours)
+
+    return {
+        "Decisions": len(replicas),
+        "Duration (h)": round(len(replicas) * hours, 2),
+        "Scale events": int(np.count_nonzero(np.diff(replicas))),
+        "Min/Mean/Max replicas": f"{replicas.min()}/{replicas.mean():.2f}/{replicas.max()}",
+        "Replica-hours": round(replica_hours, 2),
+        "Over-provisioned replica-hours": round(float(np.maximum(ready - required, 0).sum() * hours), 2),
+        "Under-provisioned replica-hours": round(float(np.maximum(required - ready, 0).sum() * hours), 2),
+        "Time above target (%)": round(100 * float(above_target.mean()), 2),
+        "Peak load per ready replica": "inf" if np.isinf(per_replica.max()) else round(float(per_replica.max()), 2),
+        "Time at max replicas (%)": round(100 * float((replicas == spec["max_replicas"]).mean()), 2),
+        "Estimated cost": round(replica_hours * cost_per_replica_hour, 2),
+    }
+
+
+def print_simulation_report(summary: dict, spec: dict):
+    print("\n--- Scaling Simulation ---")
+    print(f"Target: {spec['target']:g} per replica ({spec['metric_type']}), "
+          f"replicas {spec['min_replicas']}-{spec['max_replicas']}, "
+          f"stabilization up {spec['scale_up_window']}s / down {spec['scale_down_window']}s")
+    print(tabulate(summary.items(), headers=["Metric", "Value"], tablefmt="grid"))
+    print("--------------------------\n")
+
+
+def write_timeline(path: str, result: dict):
+    """Writes the per-decision replica timeline as CSV."""
+    columns = ["time", "load", "required", "recommendation", "replicas", "ready"]
+    np.savetxt(
+        path, np.column_stack([result[column] for column in columns]), delimiter=",",
+        header=",".join(columns), comments="", fmt=["%.3f", "%.6g", "%d", "%d", "%d", "%d"]
+    )
@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+import time
+import statistics
+import subprocess
+
+import click
+from tabulate import tabulate
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'k8s_automation.py')
+
+DEFAULT_BUDGET_MS = 400 # Median wall time allowed for the measured command
+# Packages '--help' must not import; each of them costs tens to hundreds of milliseconds
+DEFAULT_FORBIDDEN = ['kubernetes', 'kubernetes_asyncio', 'aiohttp', 'yaml', 'numpy', 'tabulate', 'prometheus_client']
+
+# "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(args: list):
+    """Runs the CLI once under -X importtime; returns (wall seconds, {top-level module: cumulative seconds})."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', CLI_PATH, *args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise click.ClickException(f"'k8s_automation.py {' '.join(args)}' exited with {result.returncode}:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            # Nested imports are indented; a package's first import counts it and everything it pulls in
+            _, cumulative, _, name = match.groups()
+            package = name.split('.')[0]
+            modules[package] = max(modules.get(package, 0), int(cumulative) / 1e6)
+    return wall, modules
+
+
+@click.command(context_settings={'ignore_unknown_options': True})
+@click.option('--runs', type=click.IntRange(min=1), default=5, show_default=True, help='Number of cold starts to measure.')
+@click.option('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, show_default=True, help='Fail when the median wall time exceeds this.')
+@click.option('--forbid', multiple=True, default=DEFAULT_FORBIDDEN, show_default=True, help='Package that must not be imported (repeatable).')
+@click.option('--top', type=int, default=10, show_default=True, help='Number of slowest imports to list.')
+@click.argument('cli_args', nargs=-1, type=click.UNPROCESSED)
+def main(runs, budget_ms, forbid, top, cli_args):
+    """
+    Measures the cold start of 'k8s_automation.py CLI_ARGS' (default: --help) and exits with status 1
+    when it is over budget or imports a forbidden package. For CI:
+    python startup_benchmark.py --budget-ms 300 -- get-status --help
+    """
+    cli_args = list(cli_args) or ['--help']
+    walls, imports = [], {}
+    for _ in range(runs):
+        wall, modules = measure(cli_args)
+        walls.append(wall)
+        imports = modules # The last run: the page cache is warm, as it would be in CI
+
+    median_ms = statistics.median(walls) * 1000
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top]
+    click.echo(f"k8s_automation.py {' '.join(cli_args)}: median {median_ms:.0f} ms, min {min(walls) * 1000:.0f} ms over {runs} run(s)")
+    click.echo(tabulate([[name, f"{seconds * 1000:.1f}"] for name, seconds in slowest], headers=["Import", "Cumulative (ms)"]))
+
+    failures = []
+    if median_ms > budget_ms:
+        failures.append(f"median start-up {median_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+    imported = sorted(set(forbid) & set(imports))
+    if imported:
+        failures.append(f"imports {', '.join(imported)}, which should only load once a command runs")
+    for failure in failures:
+        click.echo(f"FAIL: {failure}", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo("OK")
+
+
+if __name__ == '__main__':
+    main()
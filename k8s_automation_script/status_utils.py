@@ -0,0 +1,497 @@
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from kubernetes import client
+from kubernetes.utils import parse_quantity
+from tabulate import tabulate
+
+from client_utils import ClientContext, get_client_context
+from async_deployment_utils import build_health_status
+from informer_utils import ResourceCache, wait_for_sync
+
+DEFAULT_PAGE_SIZE = 500 # Objects per list call; bounds memory on the API server and in the response
+
+SCALED_OBJECT_API = {"group": "keda.sh", "version": "v1alpha1", "plural": "scaledobjects"}
+POD_METRICS_API = {"group": "metrics.k8s.io", "version": "v1beta1", "plural": "pods"}
+
+
+def get_fleet_health_status(
+    namespace: str = None,
+    label_selector: str = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    client_context: ClientContext = None,
+    field_selector: str = None
+):
+    """
+    Health status of every Deployment matching label_selector (and field_selector, e.g.
+    'metadata.name=my-app'), in one namespace or in all of them (namespace=None), joined with
+    the KEDA ScaledObject that targets it.
+
+    Uses one paginated list call for the Deployments and one for the ScaledObjects instead of
+    a GET per deployment. Returns a list of health status dicts, each with a 'ScaledObject' entry
+    (None when the deployment isn't scaled by KEDA), or None if the deployments can't be listed.
+    """
+    client_context = client_context or get_client_context()
+    apps_v1 = client_context.apps_v1
+    custom_api = client_context.custom_objects
+
+    selector = {"label_selector": label_selector} if label_selector else {}
+    if field_selector:
+        selector["field_selector"] = field_selector
+    try:
+        if namespace:
+            deployments = list_all(apps_v1.list_namespaced_deployment, page_size, namespace=namespace, **selector)
+        else:
+            deployments = list_all(apps_v1.list_deployment_for_all_namespaces, page_size, **selector)
+    except client.ApiException as e:
+        logging.error("Error listing deployments: %s", e)
+        return None
+
+    # ScaledObjects are matched on their scale target, so they are listed without the label selector
+    try:
+        if namespace:
+            scaled_objects = list_all(
+                custom_api.list_namespaced_custom_object, page_size, namespace=namespace, **SCALED_OBJECT_API
+            )
+        else:
+            scaled_objects = list_all(custom_api.list_cluster_custom_object, page_size, **SCALED_OBJECT_API)
+    except client.ApiException as e:
+        if e.status != 404: # 404: KEDA CRDs not installed, so nothing is scaled by KEDA
+            logging.error("Error listing ScaledObjects: %s", e)
+        scaled_objects = []
+
+    scaled_object_by_target = {}
+    for scaled_object in scaled_objects:
+        target = scaled_object.get("spec", {}).get("scaleTargetRef", {})
+        if target.get("kind", "Deployment") == "Deployment":
+            key = (scaled_object["metadata"]["namespace"], target.get("name"))
+            scaled_object_by_target[key] = scaled_object
+
+    statuses = []
+    for deployment in deployments:
+        health_status = build_health_status(deployment)
+        scaled_object = scaled_object_by_target.get((deployment.metadata.namespace, deployment.metadata.name))
+        health_status["ScaledObject"] = _scaled_object_summary(scaled_object) if scaled_object else None
+        statuses.append(health_status)
+
+    statuses.sort(key=lambda status: (status["Namespace"], status["Deployment Name"]))
+    return statuses
+
+
+def list_all(list_func, page_size: int = DEFAULT_PAGE_SIZE, **kwargs):
+    """Calls a list endpoint page by page using limit/_continue and returns all items."""
+    items = []
+    continue_token = None
+    while True:
+        if continue_token:
+            kwargs["_continue"] = continue_token
+        page = list_func(limit=page_size, **kwargs)
+        if isinstance(page, dict): # Custom objects come back as plain dicts
+            items.extend(page.get("items", []))
+            continue_token = page.get("metadata", {}).get("continue")
+        else:
+            items.extend(page.items)
+            continue_token = page.metadata._continue
+        if not continue_token:
+            return items
+
+
+FLEET_STATUS_HEADERS = [
+    "Namespace", "Deployment", "Ready", "Updated", "Available", "Available Cond.",
+    "ScaledObject", "Min-Max", "SO Ready", "SO Active"
+]
+
+
+def fleet_health_rows(statuses: list):
+    """One table row (FLEET_STATUS_HEADERS) per get_fleet_health_status entry."""
+    rows = []
+    for status in statuses:
+        scaled_object = status["ScaledObject"]
+        rows.append([
+            status["Namespace"],
+            status["Deployment Name"],
+            f"{status['Ready Replicas']}/{status['Total Replicas']}",
+            status["Updated Replicas"],
+            status["Available Replicas"],
+            _condition_status(status["Conditions"], "Available"),
+            scaled_object["Name"] if scaled_object else "-",
+            f"{scaled_object['Min Replicas']}-{scaled_object['Max Replicas']}" if scaled_object else "-",
+            scaled_object["Ready"] if scaled_object else "-",
+            scaled_object["Active"] if scaled_object else "-",
+        ])
+    return rows
+
+
+def print_fleet_health_status(statuses: list):
+    """Prints one table row per deployment."""
+    print("\n--- Deployment Health Status ---")
+    print(tabulate(fleet_health_rows(statuses), headers=FLEET_STATUS_HEADERS, tablefmt="grid"))
+    unhealthy = sum(1 for status in statuses if status["Ready Replicas"] < status["Total Replicas"])
+    print(f"{len(statuses)} deployment(s), {unhealthy} with unready replicas")
+    print("--------------------------------\n")
+
+
+POD_STATUS_HEADERS = [
+    "Pod", "Node", "Phase", "Ready", "Restarts", "CPU used/req/limit", "Memory used/req/limit", "Last Event"
+]
+
+
+def get_pod_health_status(
+    deployment_name: str,
+    namespace: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    client_context: ClientContext = None,
+    deployment: client.V1Deployment = None
+):
+    """
+    Per-pod health of a Deployment: readiness, restarts, the latest event and CPU/memory usage
+    against the requests and limits in the pod spec.
+
+    Takes the Deployment's selector from deployment when the caller has already read it, or reads
+    it, then makes three list calls at the same time: the pods matching the selector, the
+    namespace's Pod events and the pod metrics from metrics.k8s.io. They are joined in memory, so
+    the number of calls doesn't grow with the number of pods.
+    Returns a list of dicts, one per pod, or None if the deployment or its pods can't be read.
+    Usage is None for every pod when metrics-server isn't installed.
+    """
+    client_context = client_context or get_client_context()
+    core_v1 = client_context.core_v1
+    if deployment is None:
+        try:
+            deployment = client_context.apps_v1.read_namespaced_deployment(name=deployment_name, namespace=namespace)
+        except client.ApiException as e:
+            logging.error("Error reading deployment '%s' in namespace '%s': %s %s", deployment_name, namespace, e.status, e.reason)
+            return None
+    selector = label_selector_string(deployment.spec.selector)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        pods_future = executor.submit(
+            contextvars.copy_context().run, list_all, core_v1.list_namespaced_pod, page_size,
+            namespace=namespace, label_selector=selector
+        )
+        # A field selector can't list several involvedObject names, so take every Pod event in the namespace
+        events_future = executor.submit(
+            contextvars.copy_context().run, list_all, core_v1.list_namespaced_event, page_size,
+            namespace=namespace, field_selector="involvedObject.kind=Pod"
+        )
+        metrics_future = executor.submit(
+            contextvars.copy_context().run, list_pod_metrics, client_context, namespace, selector
+        )
+        try:
+            pods = pods_future.result()
+        except client.ApiException as e:
+            logging.error("Error listing pods of deployment '%s': %s %s", deployment_name, e.status, e.reason)
+            return None
+        try:
+            events = events_future.result()
+        except client.ApiException as e:
+            logging.warning("Error listing events in namespace '%s': %s %s", namespace, e.status, e.reason)
+            events = []
+        usage_by_pod = metrics_future.result()
+
+    last_event_by_pod = {}
+    for event in events:
+        name = event.involved_object.name
+        if name not in last_event_by_pod or _event_time(event) >= _event_time(last_event_by_pod[name]):
+            last_event_by_pod[name] = event
+
+    statuses = []
+    for pod in pods:
+        name = pod.metadata.name
+        container_statuses = pod.status.container_statuses or []
+        waiting = [s.state.waiting.reason for s in container_statuses if s.state and s.state.waiting and s.state.waiting.reason]
+        last_event = last_event_by_pod.get(name)
+        usage = usage_by_pod.get(name, {}) if usage_by_pod is not None else {}
+        statuses.append({
+            "Pod": name,
+            "Node": pod.spec.node_name,
+            "Phase": waiting[0] if waiting else pod.status.phase, # e.g. CrashLoopBackOff rather than Running
+            "Ready Containers": sum(1 for s in container_statuses if s.ready),
+            "Containers": len(pod.spec.containers),
+            "Restarts": sum(s.restart_count or 0 for s in container_statuses),
+            "CPU Usage": usage.get("cpu"),
+            "CPU Request": container_total(pod.spec.containers, "requests", "cpu"),
+            "CPU Limit": container_total(pod.spec.containers, "limits", "cpu"),
+            "Memory Usage": usage.get("memory"),
+            "Memory Request": container_total(pod.spec.containers, "requests", "memory"),
+            "Memory Limit": container_total(pod.spec.containers, "limits", "memory"),
+            "Last Event": f"{last_event.type} {last_event.reason}: {last_event.message}" if last_event else None,
+        })
+    statuses.sort(key=lambda status: status["Pod"])
+    return statuses
+
+
+def pod_health_rows(statuses: list):
+    """One table row (POD_STATUS_HEADERS) per get_pod_health_status entry."""
+    return [
+        [
+            status["Pod"],
+            status["Node"] or "-",
+            status["Phase"],
+            f"{status['Ready Containers']}/{status['Containers']}",
+            status["Restarts"],
+            _usage_cell(status["CPU Usage"], status["CPU Request"], status["CPU Limit"], _format_cpu),
+            _usage_cell(status["Memory Usage"], status["Memory Request"], status["Memory Limit"], _format_memory),
+            _truncate(status["Last Event"] or "-", 60),
+        ]
+        for status in statuses
+    ]
+
+
+def print_pod_health_status(statuses: list):
+    """Prints one table row per pod."""
+    print("\n--- Pod Health Status ---")
+    print(tabulate(pod_health_rows(statuses), headers=POD_STATUS_HEADERS, tablefmt="grid"))
+    unready = sum(1 for status in statuses if status["Ready Containers"] < status["Containers"])
+    restarts = sum(status["Restarts"] for status in statuses)
+    print(f"{len(statuses)} pod(s), {unready} not ready, {restarts} restart(s)")
+    if statuses and all(status["CPU Usage"] is None and status["Memory Usage"] is None for status in statuses):
+        print("No usage reported; is metrics-server installed?")
+    print("-------------------------\n")
+
+
+def label_selector_string(selector: client.V1LabelSelector):
+    """Turns a Deployment's spec.selector into a label selector string for list calls."""
+    terms = [f"{key}={value}" for key, value in sorted((selector.match_labels or {}).items())]
+    for expression in selector.match_expressions or []:
+        values = ",".join(expression.values or [])
+        terms.append({
+            "In": f"{expression.key} in ({values})",
+            "NotIn": f"{expression.key} notin ({values})",
+            "Exists": expression.key,
+            "DoesNotExist": f"!{expression.key}",
+        }[expression.operator])
+    return ",".join(terms)
+
+
+def list_pod_metrics(client_context: ClientContext, namespace: str, selector: str):
+    """
+    {pod name: {"cpu": cores, "memory": bytes, "timestamp": sample time}}, usage summed over the
+    pod's containers, or None without metrics-server.
+    """
+    try:
+        pod_metrics = client_context.custom_objects.list_namespaced_custom_object(
+            namespace=namespace, label_selector=selector, **POD_METRICS_API
+        )
+    except client.ApiException as e:
+        if e.status not in (404, 503): # 404/503: metrics-server not installed or not ready
+            logging.warning("Error listing pod metrics: %s %s", e.status, e.reason)
+        return None
+    usage_by_pod = {}
+    for item in pod_metrics.get("items", []):
+        usage = usage_by_pod.setdefault(
+            item["metadata"]["name"], {"cpu": 0.0, "memory": 0.0, "timestamp": item.get("timestamp")}
+        )
+        for container in item.get("containers", []):
+            for resource in ("cpu", "memory"):
+                if resource in container.get("usage", {}):
+                    usage[resource] += float(parse_quantity(container["usage"][resource]))
+    return usage_by_pod
+
+
+def container_total(containers: list, kind: str, resource: str):
+    """Sum of a request or limit over the pod's containers; None when no container sets it."""
+    quantities = [
+        float(parse_quantity(getattr(container.resources, kind)[resource]))
+        for container in containers
+        if container.resources and getattr(container.resources, kind) and resource in getattr(container.resources, kind)
+    ]
+    return sum(quantities) if quantities else None
+
+
+def _event_time(event):
+    timestamp = event.last_timestamp or event.event_time or event.metadata.creation_timestamp
+    return timestamp.timestamp() if timestamp else 0
+
+
+def _usage_cell(used, request, limit, format_quantity):
+    cell = " / ".join(format_quantity(value) if value is not None else "-" for value in (used, request, limit))
+    if used is not None and request:
+        cell += f" ({used / request:.0%})"
+    return cell
+
+
+def _format_cpu(cores: float):
+    return f"{cores * 1000:.0f}m"
+
+
+def _format_memory(size: float):
+    return f"{size / 1024 / 1024:.0f}Mi"
+
+
+def _truncate(text: str, width: int):
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def watch_fleet_status(
+    namespaces: list = None,
+    label_selector: str = None,
+    min_redraw_interval: float = 1.0,
+    client_context: ClientContext = None
+):
+    """
+    Live view of Deployments, their KEDA ScaledObjects and the HPAs KEDA created for them.
+
+    Each resource type is kept in a local cache fed by one watch per namespace (or one cluster-wide
+    watch when namespaces is empty), and the table is redrawn when a cache changes, at most once
+    per min_redraw_interval seconds. Runs until interrupted.
+    """
+    client_context = client_context or get_client_context()
+    changed = threading.Event()
+    caches = build_status_caches(client_context, namespaces, label_selector, on_change=lambda kind: changed.set())
+    all_caches = [cache for kind_caches in caches.values() for cache in kind_caches]
+    for cache in all_caches:
+        cache.start()
+
+    try:
+        if not wait_for_sync(all_caches, timeout=30):
+            logging.warning("Not every resource type could be listed yet; showing what is available.")
+        while True:
+            if not changed.wait(timeout=1.0): # Short timeout keeps Ctrl-C responsive
+                continue
+            changed.clear()
+            items = {kind: [obj for cache in kind_caches for obj in cache.items()] for kind, kind_caches in caches.items()}
+            click.clear()
+            _print_live_status(items, len(all_caches))
+            time.sleep(min_redraw_interval) # Coalesce bursts of events into one redraw
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for cache in all_caches:
+            cache.stop()
+
+
+def build_status_caches(
+    client_context: ClientContext, namespaces: list = None, label_selector: str = None, on_change=None, on_event=None
+):
+    """
+    Unstarted ResourceCaches for Deployments, HPAs and ScaledObjects, one per namespace (or one
+    cluster-wide when namespaces is empty), keyed by kind. Grows the connection pool so that each
+    watch keeps its own connection.
+    """
+    apps_v1 = client_context.apps_v1
+    autoscaling_v2 = client_context.autoscaling_v2
+    custom_api = client_context.custom_objects
+    selector = {"label_selector": label_selector} if label_selector else {}
+    callbacks = {"on_change": on_change, "on_event": on_event}
+
+    caches = {"Deployment": [], "HorizontalPodAutoscaler": [], "ScaledObject": []}
+    for namespace in namespaces or [None]:
+        if namespace:
+            caches["Deployment"].append(ResourceCache(
+                "Deployment", apps_v1.list_namespaced_deployment, **callbacks, namespace=namespace, **selector))
+            caches["HorizontalPodAutoscaler"].append(ResourceCache(
+                "HorizontalPodAutoscaler", autoscaling_v2.list_namespaced_horizontal_pod_autoscaler, **callbacks,
+                namespace=namespace))
+            caches["ScaledObject"].append(ResourceCache(
+                "ScaledObject", custom_api.list_namespaced_custom_object, **callbacks,
+                namespace=namespace, **SCALED_OBJECT_API))
+        else:
+            caches["Deployment"].append(ResourceCache(
+                "Deployment", apps_v1.list_deployment_for_all_namespaces, **callbacks, **selector))
+            caches["HorizontalPodAutoscaler"].append(ResourceCache(
+                "HorizontalPodAutoscaler", autoscaling_v2.list_horizontal_pod_autoscaler_for_all_namespaces,
+                **callbacks))
+            caches["ScaledObject"].append(ResourceCache(
+                "ScaledObject", custom_api.list_cluster_custom_object, **callbacks, **SCALED_OBJECT_API))
+
+    # Every watch holds a connection open for its whole lifetime
+    client_context.ensure_pool_size(sum(len(kind_caches) for kind_caches in caches.values()) + 2)
+    return caches
+
+
+def _print_live_status(items: dict, watch_count: int):
+    hpa_by_target = {}
+    for hpa in items["HorizontalPodAutoscaler"]:
+        target = hpa.spec.scale_target_ref
+        if target.kind == "Deployment":
+            hpa_by_target[(hpa.metadata.namespace, target.name)] = hpa
+    scaled_object_by_target = {}
+    for scaled_object in items["ScaledObject"]:
+        target = scaled_object.get("spec", {}).get("scaleTargetRef", {})
+        if target.get("kind", "Deployment") == "Deployment":
+            scaled_object_by_target[(scaled_object["metadata"]["namespace"], target.get("name"))] = scaled_object
+
+    rows = []
+    deployments = sorted(items["Deployment"], key=lambda d: (d.metadata.namespace, d.metadata.name))
+    for deployment in deployments:
+        key = (deployment.metadata.namespace, deployment.metadata.name)
+        status = build_health_status(deployment)
+        hpa = hpa_by_target.get(key)
+        scaled_object = scaled_object_by_target.get(key)
+        scaled_object = _scaled_object_summary(scaled_object) if scaled_object else None
+        rows.append([
+            status["Namespace"],
+            status["Deployment Name"],
+            deployment.spec.replicas,
+            f"{status['Ready Replicas']}/{status['Total Replicas']}",
+            status["Available Replicas"],
+            f"{hpa.status.current_replicas}->{hpa.status.desired_replicas}" if hpa else "-",
+            _hpa_metric_summary(hpa) if hpa else "-",
+            f"{scaled_object['Min Replicas']}-{scaled_object['Max Replicas']}" if scaled_object else "-",
+            f"{scaled_object['Ready']}/{scaled_object['Active']}" if scaled_object else "-",
+        ])
+
+    print(f"--- Live Deployment Status ({time.strftime('%H:%M:%S')}, {watch_count} watches, Ctrl-C to stop) ---")
+    print(tabulate(
+        rows,
+        headers=["Namespace", "Deployment", "Desired", "Ready", "Available", "HPA Current->Desired",
+                 "Metric (current/target)", "Min-Max", "SO Ready/Active"],
+        tablefmt="grid"
+    ))
+
+
+def _hpa_metric_summary(hpa: client.V2HorizontalPodAutoscaler):
+    """First metric of the HPA as 'name current/target', e.g. 'cpu 42%/50%'."""
+    if not hpa.spec.metrics:
+        return "-"
+    spec = hpa.spec.metrics[0]
+    current = (hpa.status.current_metrics or [None])[0]
+    source = {"Resource": "resource", "External": "external", "Pods": "pods", "Object": "object",
+              "ContainerResource": "container_resource"}.get(spec.type)
+    if source is None:
+        return spec.type
+    spec_source = getattr(spec, source)
+    name = spec_source.name if source in ("resource", "container_resource") else spec_source.metric.name
+    current_value = _metric_value(getattr(getattr(current, source, None), "current", None))
+    return f"{name} {current_value}/{_metric_value(spec_source.target)}"
+
+
+def _metric_value(value):
+    if value is None:
+        return "?"
+    if getattr(value, "average_utilization", None) is not None:
+        return f"{value.average_utilization}%"
+    if getattr(value, "average_value", None) is not None:
+        return value.average_value
+    if getattr(value, "value", None) is not None:
+        return value.value
+    return "?"
+
+
+def _scaled_object_summary(scaled_object: dict):
+    spec = scaled_object.get("spec", {})
+    conditions = [
+        {"Type": condition.get("type"), "Status": condition.get("status")}
+        for condition in scaled_object.get("status", {}).get("conditions") or []
+    ]
+    return {
+        "Name": scaled_object["metadata"]["name"],
+        "Min Replicas": spec.get("minReplicaCount", 0),
+        "Max Replicas": spec.get("maxReplicaCount", 100),
+        "Triggers": [trigger.get("type") for trigger in spec.get("triggers", [])],
+        "Ready": _condition_status(conditions, "Ready"),
+        "Active": _condition_status(conditions, "Active"),
+    }
+
+
+def _condition_status(conditions: list, condition_type: str):
+    for condition in conditions:
+        if condition["Type"] == condition_type:
+            return condition["Status"]
+    return "Unknown"
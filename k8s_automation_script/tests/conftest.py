@@ -0,0 +1,56 @@
+import os
+import sys
+import logging
+
+import pytest
+
+# The modules import each other flat, the way k8s_automation.py runs them, so the script directory goes on the path
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def log_to_stderr():
+    # Set up before any command runs, so the log handler writes to the real stderr (captured by pytest)
+    # rather than to the stream of the first CliRunner, which is closed after its command
+    from log_utils import configure_logging
+    configure_logging(logging.WARNING, stream=sys.__stderr__)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def render_cache_dir(tmp_path_factory):
+    # The render cache is process-wide, so it gets one directory for the session instead of ~/.cache
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("K8S_AUTOMATION_CACHE_DIR", str(tmp_path_factory.mktemp("render-cache")))
+        yield
+
+
+@pytest.fixture
+def fake_cluster(tmp_path):
+    """A fresh fake_cluster.FakeApiServer; fake_cluster.kubeconfig points at it."""
+    from fake_cluster import FakeApiServer
+    with FakeApiServer(seed=0) as server:
+        server.kubeconfig = server.write_kubeconfig(str(tmp_path / "kubeconfig.yaml"))
+        yield server
+
+
+@pytest.fixture
+def stub_tools(fake_cluster, tmp_path, monkeypatch):
+    """Puts the fake cluster's stub helm and kubectl first on PATH."""
+    from fake_cluster import install_stub_tools
+    tools_dir = tmp_path / "bin"
+    tools_dir.mkdir()
+    install_stub_tools(str(tools_dir), fake_cluster.url)
+    monkeypatch.setenv("PATH", str(tools_dir) + os.pathsep + os.environ.get("PATH", ""))
+    return tools_dir
+
+
+@pytest.fixture
+def run_cli(fake_cluster):
+    """Runs k8s_automation.py in this process against the fake cluster; returns the click Result."""
+    from click.testing import CliRunner
+    from k8s_automation import cli
+
+    def run(*args):
+        return CliRunner().invoke(cli, ["--kubeconfig", fake_cluster.kubeconfig, *args], catch_exceptions=False)
+    return run
@@ -0,0 +1,58 @@
+import pytest
+
+from defaults import DEFAULT_CHART_PATH
+from fake_cluster import seed_objects, fake_deployment
+
+# pytest-benchmark timings of the CLI commands against fake_cluster's API server (and its stub helm).
+# Results are tracked by saving them and comparing later runs with the saved ones, see the README:
+#
+#     python -m pytest tests/test_benchmarks.py --benchmark-autosave
+#     python -m pytest tests/test_benchmarks.py --benchmark-compare --benchmark-compare-fail=median:25%
+pytest.importorskip("pytest_benchmark")
+
+RELEASE_ARGS = [
+    "--name", "web", "--namespace", "apps", "--chart-path", DEFAULT_CHART_PATH, "--image", "nginx",
+    "--scaling-metric-type", "cpu", "--scaling-metric-value", "50",
+]
+
+
+def _run(benchmark, run_cli, *args, rounds: int = 10):
+    result = benchmark.pedantic(run_cli, args=args, rounds=rounds, warmup_rounds=1)
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_create_deployment_with_helm(benchmark, fake_cluster, stub_tools, run_cli):
+    _run(benchmark, run_cli, "create-deployment", *RELEASE_ARGS, rounds=5)
+
+
+def test_create_deployment_native_unchanged(benchmark, fake_cluster, run_cli):
+    result = _run(benchmark, run_cli, "create-deployment", *RELEASE_ARGS, "--engine", "native", "--idempotent")
+    assert "up to date" in result.output
+
+
+def test_get_status(benchmark, fake_cluster, run_cli):
+    fake_cluster.add(fake_deployment("web", "apps", replicas=3))
+    _run(benchmark, run_cli, "get-status", "--name", "web", "--namespace", "apps")
+
+
+def test_get_status_all_1200(benchmark, fake_cluster, run_cli):
+    seed_objects(fake_cluster, 1200, "bench")
+    _run(benchmark, run_cli, "get-status", "--all", "--namespace", "bench", rounds=3)
+
+
+def test_blocking_health_status_50_calls(benchmark, fake_cluster):
+    # The path the CLI and the daemon take: many calls on one ClientContext. Its rate limiter is off,
+    # since the rounds together make more requests than the default burst and would time the limiter.
+    from client_utils import ClientContext
+    from deployment_utils import get_deployment_health_status
+    fake_cluster.add(fake_deployment("web", "apps"))
+    client_context = ClientContext(config_file=fake_cluster.kubeconfig, qps=0)
+    try:
+        statuses = benchmark.pedantic(
+            lambda: [get_deployment_health_status("web", "apps", client_context=client_context) for _ in range(50)],
+            rounds=5, warmup_rounds=1
+        )
+    finally:
+        client_context.close()
+    assert all(status["Ready Replicas"] == 1 for status in statuses)
@@ -0,0 +1,73 @@
+import os
+import shutil
+
+import pytest
+
+from cache_utils import RenderCache
+from defaults import DEFAULT_CHART_PATH
+from render_utils import render_release
+
+VALUES = {"image": {"repository": "nginx", "tag": "latest"}}
+
+
+@pytest.fixture
+def chart(tmp_path):
+    """A copy of the default chart that a test may edit."""
+    return shutil.copytree(DEFAULT_CHART_PATH, tmp_path / "chart")
+
+
+def test_second_render_is_a_hit(chart, tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    first = render_release("web", "apps", chart, VALUES, "native", render_cache)
+    second = render_release("web", "apps", chart, VALUES, "native", render_cache)
+
+    assert second == first
+    assert render_cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_other_values_or_release_miss(chart, tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    render_release("web", "apps", chart, VALUES, "native", render_cache)
+    render_release("web", "apps", chart, {**VALUES, "replicaCount": 3}, "native", render_cache)
+    render_release("api", "apps", chart, VALUES, "native", render_cache)
+
+    assert render_cache.stats() == {"hits": 0, "misses": 3}
+
+
+def test_changed_chart_file_invalidates(chart, tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    render_release("web", "apps", chart, VALUES, "native", render_cache)
+    values_path = os.path.join(chart, "values.yaml")
+    with open(values_path) as values_file:
+        edited = values_file.read().replace("replicaCount: 1", "replicaCount: 2")
+    with open(values_path, "w") as values_file:
+        values_file.write(edited)
+    stat = os.stat(values_path)
+    os.utime(values_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)) # A new mtime on coarse clocks too
+
+    manifests = render_release("web", "apps", chart, VALUES, "native", render_cache)
+
+    assert render_cache.stats() == {"hits": 0, "misses": 2}
+    assert next(m for m in manifests if m["kind"] == "Deployment")["spec"]["replicas"] == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    for index, key in enumerate(["old", "used", "new"]):
+        render_cache.put(key, [{"kind": "ConfigMap", "data": {"x": "y" * 100}}])
+        os.utime(render_cache._path(key), (index, index)) # Written in this order
+    render_cache.get("used") # Touching it makes "old" the least recently used
+
+    entry_size = os.path.getsize(render_cache._path("new"))
+    render_cache.max_bytes = 2 * entry_size
+    render_cache.put("newest", [{"kind": "ConfigMap", "data": {"x": "y" * 100}}])
+
+    assert sorted(name for name in os.listdir(render_cache.directory)) == ["newest.yaml", "used.yaml"]
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path):
+    render_cache = RenderCache(str(tmp_path / "cache"))
+    with pytest.raises(Exception):
+        render_cache.put("bad", [{"kind": object()}]) # Not representable in YAML
+
+    assert os.listdir(render_cache.directory) == []
@@ -0,0 +1,182 @@
+import math
+from unittest import mock
+
+from kubernetes import config
+
+from defaults import DEFAULT_CHART_PATH
+from fake_cluster import seed_objects, fake_deployment
+from status_utils import DEFAULT_PAGE_SIZE
+
+# End-to-end runs of the CLI commands against fake_cluster's API server (and its stub helm), with
+# budgets on the API requests each may make. Their timings are in test_benchmarks.py.
+
+RELEASE_ARGS = [
+    "--name", "web", "--namespace", "apps", "--chart-path", DEFAULT_CHART_PATH, "--image", "nginx",
+    "--scaling-metric-type", "cpu", "--scaling-metric-value", "50",
+]
+
+
+def _requests(fake_cluster):
+    return dict(fake_cluster.requests)
+
+
+def test_create_deployment_with_helm(fake_cluster, stub_tools, run_cli):
+    result = run_cli("create-deployment", *RELEASE_ARGS)
+
+    assert result.exit_code == 0, result.output
+    assert "Deployment created successfully" in result.output
+    assert fake_cluster.get("Deployment", "web-my-app-chart", "apps")["spec"]["replicas"] == 1
+    scaled_object = fake_cluster.get("ScaledObject", "web-my-app-chart-scaledobject", "apps")
+    assert scaled_object["spec"]["triggers"][0]["metadata"] == {"metricType": "Utilization", "value": "50"}
+    assert sum(fake_cluster.requests.values()) <= 8, _requests(fake_cluster)
+
+
+def test_create_deployment_native_skips_unchanged_release(fake_cluster, run_cli):
+    first = run_cli("create-deployment", *RELEASE_ARGS, "--engine", "native", "--idempotent")
+    assert first.exit_code == 0, first.output
+    assert fake_cluster.get("ScaledObject", "web-my-app-chart-scaledobject", "apps") is not None
+
+    fake_cluster.requests.clear()
+    second = run_cli("create-deployment", *RELEASE_ARGS, "--engine", "native", "--idempotent")
+
+    assert second.exit_code == 0, second.output
+    assert "up to date" in second.output
+    assert _requests(fake_cluster) == {("get", "deployments"): 1} # The digest check only
+
+
+def test_create_deployment_redeploys_release_when_values_change(fake_cluster, stub_tools, run_cli):
+    assert run_cli("create-deployment", *RELEASE_ARGS, "--idempotent").exit_code == 0
+    assert "up to date" in run_cli("create-deployment", *RELEASE_ARGS, "--idempotent").output
+    fake_cluster.helm_commands.clear()
+
+    changed_args = [*RELEASE_ARGS[:-1], "70"]
+    result = run_cli("create-deployment", *changed_args, "--idempotent")
+
+    assert result.exit_code == 0, result.output
+    assert "up to date" not in result.output
+    assert [args[:3] for args in fake_cluster.helm_commands] == [["upgrade", "--install", "web"]]
+    scaled_object = fake_cluster.get("ScaledObject", "web-my-app-chart-scaledobject", "apps")
+    assert scaled_object["spec"]["triggers"][0]["metadata"]["value"] == "70"
+    assert "up to date" in run_cli("create-deployment", *changed_args, "--idempotent").output # The new digest was recorded
+
+
+def test_create_deployment_defaults_to_the_bundled_chart(fake_cluster, stub_tools, run_cli):
+    chart_args = RELEASE_ARGS.index("--chart-path")
+    result = run_cli("create-deployment", *RELEASE_ARGS[:chart_args], *RELEASE_ARGS[chart_args + 2:])
+
+    assert result.exit_code == 0, result.output
+    assert DEFAULT_CHART_PATH in fake_cluster.helm_commands[-1]
+
+
+def test_get_status_loads_kubeconfig_once_and_reads_deployment_once(fake_cluster, run_cli):
+    fake_cluster.add(fake_deployment("web", "apps", replicas=3))
+
+    # The Deployment is read through the async client, so neither client may load the kubeconfig twice
+    import async_client_utils
+    with mock.patch.object(config, "load_kube_config", wraps=config.load_kube_config) as load_kube_config, \
+            mock.patch.object(
+                async_client_utils.config, "load_kube_config", wraps=async_client_utils.config.load_kube_config
+            ) as load_kube_config_async:
+        result = run_cli("get-status", "--name", "web", "--namespace", "apps")
+
+    assert result.exit_code == 0, result.output
+    assert "Could not retrieve status" not in result.output
+    assert load_kube_config.call_count + load_kube_config_async.call_count == 1
+    assert _requests(fake_cluster) == {("get", "deployments"): 1}
+
+
+def test_get_status_all_pages_through_a_large_fleet(fake_cluster, run_cli):
+    size = 1200
+    seed_objects(fake_cluster, size, "bench")
+    fake_cluster.requests.clear()
+
+    result = run_cli("get-status", "--all", "--namespace", "bench")
+
+    assert result.exit_code == 0, result.output
+    assert "app-0 " in result.output and f"app-{size - 1} " in result.output
+    pages = math.ceil(size / DEFAULT_PAGE_SIZE)
+    assert fake_cluster.requests[("list", "deployments")] == pages
+    assert sum(fake_cluster.requests.values()) <= pages * 2, _requests(fake_cluster)
+
+
+def test_blocking_health_status_reuses_one_client(fake_cluster):
+    # The path the CLI and the daemon take: many calls on one ClientContext, which run on its async runner
+    import async_client_utils
+    from client_utils import ClientContext
+    from deployment_utils import get_deployment_health_status
+    fake_cluster.add(fake_deployment("web", "apps"))
+    client_context = ClientContext(config_file=fake_cluster.kubeconfig)
+    try:
+        with mock.patch.object(
+            async_client_utils.config, "load_kube_config", wraps=async_client_utils.config.load_kube_config
+        ) as load_kube_config:
+            statuses = [get_deployment_health_status("web", "apps", client_context=client_context) for _ in range(50)]
+    finally:
+        client_context.close()
+
+    assert all(status["Ready Replicas"] == 1 for status in statuses)
+    assert load_kube_config.call_count == 1
+    assert fake_cluster.requests[("get", "deployments")] == 50
+
+
+def test_blocking_call_inside_a_running_event_loop(fake_cluster):
+    # The blocking wrappers run on the context's own loop thread, so they work from async code too
+    import asyncio
+    from client_utils import ClientContext
+    from deployment_utils import get_deployment_health_status
+    fake_cluster.add(fake_deployment("web", "apps"))
+    client_context = ClientContext(config_file=fake_cluster.kubeconfig)
+
+    async def main():
+        return get_deployment_health_status("web", "apps", client_context=client_context)
+
+    try:
+        status = asyncio.run(main())
+    finally:
+        client_context.close()
+
+    assert status["Ready Replicas"] == 1
+
+
+def test_get_status_pods_reads_deployment_once(fake_cluster, run_cli):
+    fake_cluster.add(fake_deployment("web", "apps", replicas=2))
+    for index in range(2):
+        fake_cluster.add({
+            "apiVersion": "v1", "kind": "Pod",
+            "metadata": {"name": f"web-{index}", "namespace": "apps", "labels": {"app": "web"}},
+            "spec": {"containers": [{"name": "web", "image": "nginx"}]},
+            "status": {"phase": "Running", "containerStatuses": [{
+                "name": "web", "image": "nginx", "imageID": "", "ready": True, "restartCount": index
+            }]},
+        })
+    for kind, name, reason in (("Pod", "web-1", "BackOff"), ("Deployment", "web", "ScalingReplicaSet")):
+        fake_cluster.add({
+            "apiVersion": "v1", "kind": "Event",
+            "metadata": {"name": f"{name}.{reason.lower()}", "namespace": "apps"},
+            "involvedObject": {"kind": kind, "name": name, "namespace": "apps"},
+            "reason": reason, "message": reason, "type": "Warning", "lastTimestamp": "2024-01-01T00:00:00Z",
+        })
+    fake_cluster.requests.clear()
+
+    result = run_cli("get-status", "--name", "web", "--namespace", "apps", "--pods")
+
+    assert result.exit_code == 0, result.output
+    assert "web-0" in result.output and "web-1" in result.output and "BackOff" in result.output
+    # The pods, and their usage from metrics.k8s.io, which is also counted as ("list", "pods")
+    assert _requests(fake_cluster) == {("get", "deployments"): 1, ("list", "pods"): 2, ("list", "events"): 1}
+
+
+def test_setup_cluster_installs_keda_from_a_chart_bundle(fake_cluster, stub_tools, run_cli, tmp_path):
+    fake_cluster._delete(("/apis/apps/v1", "deployments", "keda", "keda-operator")) # KEDA needs repairing
+    bundle = tmp_path / "keda-2.16.0.tgz"
+    bundle.write_bytes(b"")
+
+    result = run_cli("setup-cluster", "--chart-bundle", str(bundle), "--keda-version", "2.15.0")
+
+    assert result.exit_code == 0, result.output
+    assert "KEDA installation successful" in result.output
+    assert not any(args[0] == "repo" for args in fake_cluster.helm_commands) # No chart repository access
+    install = next(args for args in fake_cluster.helm_commands if args[0] == "upgrade")
+    assert install[:4] == ["upgrade", "--install", "keda", str(bundle)]
+    assert "--version" not in install # The bundle is the version
+    assert fake_cluster.get("Deployment", "keda-operator", "keda") is not None
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import socket
+import statistics
+import subprocess
+import time
+import http.client
+
+import pytest
+
+from fake_cluster import fake_deployment
+from k8s_automation_client import UnixHTTPConnection, forward
+
+# Runs 'k8s_automation.py serve' against the fake API server and forwards commands to it the way
+# k8s_automation_client.py does. Forwarded commands must reuse the daemon's client: one API request
+# each, over the connections it already holds, at a few milliseconds per command.
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = 20
+GET_STATUS = ["get-status", "--name", "web", "--namespace", "apps"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_daemon(fake_cluster, *serve_args, connect):
+    process = subprocess.Popen(
+        [sys.executable, "k8s_automation.py", "--kubeconfig", fake_cluster.kubeconfig, "serve", *serve_args],
+        cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stderr.read().decode()
+        connection = connect()
+        try:
+            connection.request("GET", "/healthz")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.05)
+        finally:
+            connection.close()
+    process.kill()
+    pytest.fail("The daemon did not start listening")
+
+
+def _stop_daemon(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    process.stderr.close()
+
+
+def _forward_commands(fake_cluster, connect, token_path=None):
+    fake_cluster.add(fake_deployment("web", "apps", replicas=2))
+    fake_cluster.requests.clear()
+    connections = fake_cluster.connections
+    latencies = []
+    for _ in range(COMMANDS):
+        started = time.monotonic()
+        result = forward(GET_STATUS, connection=connect(), token_path=token_path)
+        latencies.append(time.monotonic() - started)
+        assert result["exit_code"] == 0, result["stderr"]
+        assert "Could not retrieve status" not in result["stdout"]
+
+    assert dict(fake_cluster.requests) == {("get", "deployments"): COMMANDS}
+    assert fake_cluster.connections - connections <= 1 # The pool's connection is kept open across commands
+    assert statistics.median(latencies) < 0.05, latencies
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Needs Unix sockets")
+def test_daemon_on_unix_socket_reuses_its_client(fake_cluster, tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    connect = lambda: UnixHTTPConnection(socket_path, timeout=10)
+    process = _start_daemon(fake_cluster, "--socket", socket_path, connect=connect)
+    try:
+        assert os.stat(socket_path).st_mode & 0o077 == 0
+        _forward_commands(fake_cluster, connect)
+    finally:
+        _stop_daemon(process)
+    assert not os.path.exists(socket_path)
+
+
+def test_daemon_on_tcp_requires_its_token(fake_cluster, tmp_path):
+    port = _free_port()
+    token_path = str(tmp_path / "daemon.token")
+    connect = lambda: http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    process = _start_daemon(fake_cluster, "--port", str(port), "--token-file", token_path, connect=connect)
+    try:
+        if os.name == "posix":
+            assert os.stat(token_path).st_mode & 0o777 == 0o600
+        _forward_commands(fake_cluster, connect, token_path=token_path)
+
+        for headers in ({}, {"Authorization": "Bearer wrong"}):
+            connection = connect()
+            connection.request("POST", "/run", body=json.dumps({"args": GET_STATUS}), headers=headers)
+            response = connection.getresponse()
+            assert response.status == 401
+            connection.close()
+        assert forward(GET_STATUS, connection=connect(), token_path=str(tmp_path / "missing.token")) is None
+    finally:
+        _stop_daemon(process)
+    assert not os.path.exists(token_path)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Needs Unix sockets")
+def test_forward_leaves_the_command_to_the_caller_without_a_daemon(tmp_path):
+    stale_path = str(tmp_path / "stale.sock")
+    with socket.socket(socket.AF_UNIX) as stale: # Bound but not listening, like a socket a killed daemon left behind
+        stale.bind(stale_path)
+        assert forward(GET_STATUS, connection=UnixHTTPConnection(stale_path)) is None
+    assert forward(GET_STATUS, connection=UnixHTTPConnection(str(tmp_path / "missing.sock"))) is None
+
+
+def test_forward_gives_up_on_a_daemon_that_does_not_answer(tmp_path):
+    token_path = tmp_path / "daemon.token"
+    token_path.write_text("token")
+    with socket.socket() as hung: # Accepts connections but never answers
+        hung.bind(("127.0.0.1", 0))
+        hung.listen()
+        connection = http.client.HTTPConnection("127.0.0.1", hung.getsockname()[1], timeout=1)
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="did not answer"):
+            forward(GET_STATUS, connection=connection, token_path=str(token_path), read_timeout=0.2)
+    assert time.monotonic() - started < 1
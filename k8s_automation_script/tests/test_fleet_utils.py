@@ -0,0 +1,87 @@
+import signal
+import threading
+import time
+
+import pytest
+
+from defaults import DEFAULT_CHART_PATH, DEFAULT_HELM_TIMEOUT
+from fleet_utils import load_fleet_file
+from wait_utils import DEFAULT_WAIT_TIMEOUT
+
+RELEASE = dict(
+    namespace="apps", chart_path=DEFAULT_CHART_PATH, image="nginx", tag="latest", cpu_request="100m", cpu_limit="200m",
+    mem_request="128Mi", mem_limit="256Mi", container_port=80, min_replicas=1, max_replicas=10,
+    scaling_metric_type="cpu", scaling_metric_value="50", event_source_config={},
+)
+
+FLEET = """
+defaults:
+  namespace: apps
+  scaling_metric_type: cpu # Underscores work too
+releases:
+  - name: orders
+    image: my-repo/orders
+    scaling-metric-value: 50
+  - name: orders
+    namespace: staging
+    image: my-repo/orders
+    scaling-metric-value: "70"
+    max-replicas: 3
+"""
+
+
+def _write_fleet(tmp_path, text):
+    path = tmp_path / "fleet.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_fleet_file_applies_defaults(tmp_path):
+    production, staging = load_fleet_file(_write_fleet(tmp_path, FLEET))
+
+    assert production == dict(
+        RELEASE, release_name="orders", image="my-repo/orders", scaling_metric_value="50", # A string, like the CLI option
+        wait_timeout=DEFAULT_WAIT_TIMEOUT, helm_timeout=DEFAULT_HELM_TIMEOUT, engine="helm", idempotent=False
+    )
+    assert (staging["namespace"], staging["max_replicas"], staging["scaling_metric_value"]) == ("staging", 3, "70")
+
+
+@pytest.mark.parametrize("release, error", [
+    ("  - name: web\n    image: nginx\n", "Release #3 .* is missing: scaling-metric-value"),
+    ("  - name: web\n    image: nginx\n    scaling-metric-value: 50\n    replicas: 2\n", "Release 'web' .* unknown keys: replicas"),
+    ("  - name: orders\n    image: nginx\n    scaling-metric-value: 50\n", "Release 'orders' is listed twice for namespace 'apps'"),
+])
+def test_fleet_file_errors(tmp_path, release, error):
+    with pytest.raises(ValueError, match=error):
+        load_fleet_file(_write_fleet(tmp_path, FLEET + release))
+
+
+@pytest.mark.skipif(not hasattr(signal, "pthread_kill"), reason="Sends SIGINT to the main thread")
+def test_interrupted_rollout_stops_helm_and_cleans_up(fake_cluster, stub_tools):
+    from client_utils import ClientContext
+    from fleet_utils import deploy_fleet
+    fake_cluster.helm_delay = 60 # Every install hangs until it is stopped
+    releases = [dict(RELEASE, release_name=f"app-{index}") for index in range(4)]
+    main_thread = threading.get_ident()
+
+    def interrupt_when_installing():
+        deadline = time.monotonic() + 30
+        while sum(1 for args in fake_cluster.helm_commands if args[0] == "install") < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        signal.pthread_kill(main_thread, signal.SIGINT) # Ctrl-C
+
+    client_context = ClientContext(config_file=fake_cluster.kubeconfig)
+    threading.Thread(target=interrupt_when_installing, daemon=True).start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            deploy_fleet(releases, concurrency=2, client_context=client_context)
+    finally:
+        client_context.close()
+
+    installed = sorted(args[1] for args in fake_cluster.helm_commands if args[0] == "install")
+    uninstalled = sorted(args[1] for args in fake_cluster.helm_commands if args[0] == "uninstall")
+    assert installed == ["app-0", "app-1"] # The queued releases never started
+    assert uninstalled == installed # The pending ones were cleaned up rather than left pending-install
+    assert fake_cluster.helm_releases == {}
+    assert time.monotonic() - started < 30 # Helm was stopped, not waited out
@@ -0,0 +1,26 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+import helm_utils
+
+SLEEPER = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+async def _start_and_stop():
+    process = await asyncio.create_subprocess_exec(*SLEEPER, **helm_utils.SUBPROCESS_GROUP)
+    await helm_utils._stop(process)
+    return process.returncode
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="POSIX process groups")
+def test_stop_signals_the_process_group():
+    assert asyncio.run(_start_and_stop()) == -15 # SIGTERM
+
+
+def test_stop_without_killpg_terminates_the_process(monkeypatch):
+    monkeypatch.delattr(os, "killpg", raising=False)
+    monkeypatch.setattr(helm_utils, "TERMINATE_GRACE", 0.5)
+    assert asyncio.run(_start_and_stop()) is not None
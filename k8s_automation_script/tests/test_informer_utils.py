@@ -0,0 +1,54 @@
+import time
+import threading
+
+import informer_utils
+from informer_utils import ResourceCache
+
+
+def _scaled_object(name: str):
+    return {"metadata": {"name": name, "namespace": "apps", "resourceVersion": "1"}}
+
+
+class _ExpiringWatch:
+    """watch.Watch stand-in: the first stream fails with 410 Gone, later ones stay open until stopped."""
+
+    resource_versions = []
+
+    def __init__(self):
+        self._stopped = threading.Event()
+
+    def stream(self, list_func, resource_version=None, **kwargs):
+        _ExpiringWatch.resource_versions.append(resource_version)
+        if len(_ExpiringWatch.resource_versions) == 1:
+            yield {"type": "ERROR", "object": {"kind": "Status", "code": 410, "reason": "Expired"}}
+        self._stopped.wait(10)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def test_relists_when_the_watch_expires(monkeypatch):
+    monkeypatch.setattr(informer_utils.watch, "Watch", _ExpiringWatch)
+    monkeypatch.setattr(_ExpiringWatch, "resource_versions", [])
+    lists = [
+        {"metadata": {"resourceVersion": "10"}, "items": [_scaled_object("old"), _scaled_object("kept")]},
+        {"metadata": {"resourceVersion": "20"}, "items": [_scaled_object("kept"), _scaled_object("new")]},
+    ]
+    events = []
+
+    def list_scaled_objects(namespace):
+        assert namespace == "apps"
+        return lists.pop(0)
+
+    def on_event(kind, event_type, obj):
+        events.append((event_type, obj["metadata"]["name"]))
+
+    cache = ResourceCache("ScaledObject", list_scaled_objects, on_event=on_event, namespace="apps").start()
+    deadline = time.monotonic() + 10
+    while len(_ExpiringWatch.resource_versions) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    cache.stop()
+
+    assert _ExpiringWatch.resource_versions == ["10", "20"] # The second watch resumes from the fresh list
+    assert sorted(obj["metadata"]["name"] for obj in cache.items()) == ["kept", "new"] # "old" is gone
+    assert events == [("SYNC", "old"), ("SYNC", "kept"), ("SYNC", "kept"), ("SYNC", "new")]
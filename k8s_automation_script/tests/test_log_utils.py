@@ -0,0 +1,58 @@
+import io
+import json
+import queue
+import logging
+from logging.handlers import QueueListener
+
+import pytest
+
+from log_utils import JsonFormatter, _ContextQueueHandler, log_event
+
+
+@pytest.fixture
+def json_pipeline():
+    """A queue handler on the root logger and a listener writing JSON lines; started by the test."""
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    handler = _ContextQueueHandler(records)
+    listener = QueueListener(records, output)
+    logging.getLogger().addHandler(handler)
+    try:
+        yield stream, listener
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_events_are_json_objects_with_their_fields(json_pipeline):
+    stream, listener = json_pipeline
+    listener.start()
+    log_event("release.deployed", logging.WARNING, release="web", replicas=3, scaled_object_ready=None)
+    logging.warning("Applying %d object(s) for release '%s'", 4, "web")
+    listener.stop()
+
+    event, message = _lines(stream)
+    assert event["level"] == "warning" and event["time"].endswith("+00:00")
+    assert {key: event[key] for key in ("event", "release", "replicas", "scaled_object_ready")} == {
+        "event": "release.deployed", "release": "web", "replicas": 3, "scaled_object_ready": None
+    }
+    assert message["message"] == "Applying 4 object(s) for release 'web'"
+
+
+def test_records_are_snapshotted_when_queued(json_pipeline):
+    stream, listener = json_pipeline
+    endpoints = ["Internal Container Port: 80"]
+    log_event("release.deployed", logging.WARNING, endpoints=endpoints)
+    logging.warning("Endpoints: %s", endpoints)
+    endpoints.append("changed after the call") # Before the listener thread formats either record
+    listener.start()
+    listener.stop()
+
+    event, message = _lines(stream)
+    assert event["endpoints"] == ["Internal Container Port: 80"]
+    assert message["message"] == "Endpoints: ['Internal Container Port: 80']"
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from metrics_utils import REGISTRY, api_verb_and_resource, count_operation, observe_command, write_metrics_file
+
+
+def _operations(operation: str, result: str):
+    return REGISTRY.get_sample_value("k8s_automation_operations_total", {"operation": operation, "result": result}) or 0
+
+
+def _deploy(result):
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+async def _deploy_async(result):
+    return _deploy(result)
+
+
+@pytest.mark.parametrize("operation, function, call", [
+    ("test.sync", _deploy, lambda function, result: function(result)),
+    ("test.async", _deploy_async, lambda function, result: asyncio.run(function(result))),
+])
+def test_count_operation_counts_each_outcome(operation, function, call):
+    counted = count_operation(operation)(function)
+    for result in ({"name": "web"}, {"unchanged": True}, None, False):
+        assert call(counted, result) == result
+    with pytest.raises(RuntimeError):
+        call(counted, RuntimeError("boom"))
+
+    assert {result: _operations(operation, result) for result in ("succeeded", "unchanged", "failed", "error")} == {
+        "succeeded": 1, "unchanged": 1, "failed": 2, "error": 1
+    }
+    assert asyncio.iscoroutinefunction(counted) == asyncio.iscoroutinefunction(function)
+
+
+def test_metrics_file_is_text_exposition(tmp_path):
+    observe_command("test-command", "success", 0.2)
+    path = tmp_path / "k8s_automation.prom"
+    write_metrics_file(str(path))
+
+    lines = path.read_text().splitlines()
+    assert "# TYPE k8s_automation_commands_total counter" in lines
+    assert 'k8s_automation_commands_total{command="test-command",result="success"} 1.0' in lines
+    assert 'k8s_automation_command_duration_seconds_bucket{command="test-command",le="0.5"} 1.0' in lines
+    assert not any(line.startswith("process_") for line in lines) # Only the registry's own metrics
+    assert [entry.name for entry in tmp_path.iterdir()] == ["k8s_automation.prom"] # No temporary file left
+
+
+@pytest.mark.parametrize("method, url, query_params, expected", [
+    ("GET", "https://host/apis/apps/v1/namespaces/apps/deployments", None, ("list", "deployments")),
+    ("GET", "https://host/apis/apps/v1/namespaces/apps/deployments/web", None, ("get", "deployments")),
+    ("GET", "https://host/apis/apps/v1/namespaces/apps/deployments?watch=true", None, ("watch", "deployments")),
+    ("GET", "https://host/api/v1/namespaces/apps/pods", [("watch", True)], ("watch", "pods")),
+    ("PATCH", "https://host/apis/apps/v1/namespaces/apps/deployments/web/status", None, ("patch", "deployments/status")),
+    ("GET", "https://host/api/v1/namespaces/apps", None, ("get", "namespaces")),
+    ("POST", "https://host/apis/keda.sh/v1alpha1/namespaces/apps/scaledobjects", None, ("create", "scaledobjects")),
+    ("DELETE", "https://host/api/v1/namespaces/apps/pods", None, ("deletecollection", "pods")),
+    ("GET", "https://host/apis/apps/v1", None, ("list", "discovery")),
+    ("GET", "https://host/version", None, ("get", "other")),
+])
+def test_api_verb_and_resource(method, url, query_params, expected):
+    assert api_verb_and_resource(method, url, query_params) == expected
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+import yaml
+
+from multicluster_utils import print_cluster_report, resolve_contexts, run_on_clusters
+
+
+@pytest.fixture
+def kubeconfig(fake_cluster, tmp_path):
+    """fake_cluster's kubeconfig with three contexts, all pointing at it."""
+    with open(fake_cluster.kubeconfig) as kubeconfig_file:
+        kubeconfig = yaml.safe_load(kubeconfig_file)
+    kubeconfig["contexts"] = [
+        {"name": name, "context": {"cluster": "fake", "user": "fake"}} for name in ("prod-eu", "prod-us", "staging")
+    ]
+    kubeconfig["current-context"] = "prod-eu"
+    path = tmp_path / "contexts.yaml"
+    path.write_text(yaml.safe_dump(kubeconfig))
+    return str(path)
+
+
+def test_resolve_contexts(kubeconfig):
+    assert resolve_contexts([], True, kubeconfig) == ["prod-eu", "prod-us", "staging"]
+    assert resolve_contexts(["staging", "prod-eu", "staging"], False, kubeconfig) == ["staging", "prod-eu"]
+    with pytest.raises(ValueError, match=r"Unknown kubeconfig context\(s\): prod-asia \(available: prod-eu, prod-us, staging\)"):
+        resolve_contexts(["prod-eu", "prod-asia"], False, kubeconfig)
+
+
+def test_one_failing_cluster_is_reported_without_stopping_the_others(kubeconfig, capsys):
+    def namespaces(client_context):
+        print(f"Listing namespaces in {client_context.context}")
+        if client_context.context == "prod-us":
+            logging.error("Cluster unreachable")
+            raise RuntimeError("Failed to connect to the cluster.\nmore detail")
+        return [[len(client_context.core_v1.list_namespace().items)]]
+
+    results = run_on_clusters(["prod-eu", "prod-us", "staging"], namespaces, {"config_file": kubeconfig})
+
+    assert [(result["cluster"], result["ok"]) for result in results] == [("prod-eu", True), ("prod-us", False), ("staging", True)]
+    failed = results[1]
+    assert failed["rows"] == [] and failed["error"] == "Failed to connect to the cluster.\nmore detail"
+    assert "Listing namespaces in prod-us" in failed["output"] and "Cluster unreachable" in failed["output"]
+    assert results[0]["rows"] == results[2]["rows"] and results[0]["rows"][0][0] > 0
+    assert "prod-us" not in results[0]["output"] # Each cluster's output is captured on its own
+
+    print_cluster_report(results, ["Namespaces"], 1.0)
+    report = capsys.readouterr().out
+    assert "FAILED" in report and "Failed to connect to the cluster." in report and "more detail" not in report
+    assert "2/3 cluster(s) succeeded" in report
@@ -0,0 +1,79 @@
+import json
+import time
+
+import pytest
+
+import profile_utils
+from profile_utils import Profiler, record_helm_phases, span
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    """A fresh, enabled profiler in place of the process-wide one."""
+    profiler = Profiler()
+    profiler.enabled = True
+    monkeypatch.setattr(profile_utils, "_profiler", profiler)
+    return profiler
+
+
+def _record_release():
+    with span("release", release="web", replicas=3):
+        with span("helm", upgrade=True) as attributes:
+            start_ns = time.monotonic_ns()
+            record_helm_phases(start_ns, start_ns + 3_000_000, [
+                (start_ns + 1_000_000, "getting history for release web"),
+                (start_ns + 2_000_000, "creating 4 resource(s)"),
+            ])
+            attributes["exit_code"] = 0
+        with pytest.raises(ValueError):
+            with span("wait"):
+                raise ValueError("rollout failed")
+
+
+def test_chrome_trace(profiler, tmp_path):
+    _record_release()
+    path = tmp_path / "trace.json"
+    profiler.write_chrome_trace(str(path))
+
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert set(spans) == {"release", "helm", "helm: startup", "helm: history", "helm: apply resources", "wait"}
+    assert spans["release"]["args"] == {"release": "web", "replicas": 3}
+    assert spans["helm"]["args"] == {"upgrade": True, "exit_code": 0}
+    assert spans["wait"]["args"] == {"error": "ValueError"}
+    assert spans["helm: history"]["dur"] == 1000 # Microseconds
+    assert spans["release"]["ts"] <= spans["helm"]["ts"] and spans["helm"]["dur"] <= spans["release"]["dur"]
+    thread_names = [event for event in events if event["ph"] == "M"]
+    assert [event["args"]["name"] for event in thread_names] == ["MainThread"]
+    assert {event["tid"] for event in spans.values()} == {thread_names[0]["tid"]}
+
+
+def test_otlp_json_appends_one_request_per_export(profiler, tmp_path):
+    _record_release()
+    path = tmp_path / "trace.otlp.jsonl"
+    profiler.write_otlp_json(str(path))
+    profiler.write_otlp_json(str(path), service_name="other")
+
+    first, second = (json.loads(line) for line in path.read_text().splitlines())
+    resource_spans = first["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "k8s-automation"}}]
+    assert second["resourceSpans"][0]["resource"]["attributes"][0]["value"] == {"stringValue": "other"}
+
+    spans = {otlp_span["name"]: otlp_span for otlp_span in resource_spans["scopeSpans"][0]["spans"]}
+    assert {otlp_span["traceId"] for otlp_span in spans.values()} == {profiler.trace_id}
+    assert "parentSpanId" not in spans["release"]
+    assert spans["helm"]["parentSpanId"] == spans["release"]["spanId"]
+    assert spans["helm: history"]["parentSpanId"] == spans["helm"]["spanId"]
+    assert {"key": "replicas", "value": {"intValue": "3"}} in spans["release"]["attributes"]
+    assert {"key": "upgrade", "value": {"boolValue": True}} in spans["helm"]["attributes"]
+    assert (spans["release"]["status"], spans["wait"]["status"]) == ({"code": 1}, {"code": 2})
+    # Wall-clock nanoseconds, as strings
+    start = int(spans["release"]["startTimeUnixNano"])
+    assert abs(start - time.time_ns()) < 60e9 and int(spans["release"]["endTimeUnixNano"]) >= start
+
+
+def test_spans_are_not_recorded_while_disabled(profiler):
+    profiler.enabled = False
+    _record_release()
+
+    assert profiler.spans == []
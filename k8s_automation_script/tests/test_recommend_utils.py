@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from recommend_utils import (
+    BUCKET_RATIO, CPU_FIRST_BUCKET, MEMORY_FIRST_BUCKET, UsageHistogram, load_usage_file, recommend_resources,
+    values_overlay
+)
+
+MI = 1024 * 1024
+
+
+def _histogram(first_bucket, values):
+    histogram = UsageHistogram(first_bucket)
+    histogram.add(values)
+    return histogram
+
+
+@pytest.mark.parametrize("percent", [50, 90, 95, 99])
+def test_percentiles_are_within_one_bucket_above_the_exact_value(percent):
+    samples = np.random.default_rng(1).lognormal(mean=-2, sigma=1, size=10000) # Cores
+    histogram = _histogram(CPU_FIRST_BUCKET, samples)
+
+    exact = np.percentile(samples, percent)
+    assert exact <= histogram.percentile(percent) <= exact * BUCKET_RATIO
+    assert histogram.percentile(100) == samples.max()
+
+
+def test_unusable_samples_are_skipped():
+    histogram = _histogram(CPU_FIRST_BUCKET, [np.nan, -1, np.inf, 0.5])
+
+    assert histogram.total == 1
+    assert UsageHistogram(CPU_FIRST_BUCKET).percentile(50) is None
+
+
+def test_recommendation_and_values_overlay():
+    cpu = _histogram(CPU_FIRST_BUCKET, np.arange(1, 101) / 100) # 10m to 1 core
+    memory = _histogram(MEMORY_FIRST_BUCKET, [200 * MI] * 90 + [400 * MI] * 10)
+
+    recommendation = recommend_resources(cpu, memory, "cpu", margin=0)
+
+    assert recommendation == {
+        "cpu_request": "926m", # P90, rounded up to its bucket
+        "cpu_limit": "1389m", # 1.5x the request, which is above P99
+        "memory_request": "400Mi", # P95
+        "memory_limit": "400Mi", # The maximum
+        "target": "56", # The median as a share of the request
+    }
+    assert values_overlay(recommendation, "cpu") == {
+        "resources": {"requests": {"cpu": "926m", "memory": "400Mi"}, "limits": {"cpu": "1389m", "memory": "400Mi"}},
+        "kedaConfig": {"metricType": "cpu", "metricValue": "56"},
+    }
+
+
+def test_quantities_are_not_rounded_up_for_float_error():
+    cpu = _histogram(CPU_FIRST_BUCKET, [0.1] * 100)
+
+    recommendation = recommend_resources(cpu, UsageHistogram(MEMORY_FIRST_BUCKET), "cpu", margin=0)
+
+    assert (recommendation["cpu_request"], recommendation["cpu_limit"]) == ("100m", "150m") # Not 151m
+    assert recommendation["target"] == "85" # At the request all the time, so the top of the range
+
+
+def test_memory_target_and_margin():
+    memory = _histogram(MEMORY_FIRST_BUCKET, [100 * MI] * 100)
+
+    recommendation = recommend_resources(UsageHistogram(CPU_FIRST_BUCKET), memory, "memory", margin=0.5)
+
+    assert recommendation["cpu_request"] is None and recommendation["cpu_limit"] is None
+    assert (recommendation["memory_request"], recommendation["memory_limit"]) == ("150Mi", "150Mi")
+    assert recommendation["target"] == "101Mi" # The median is 67% of the request: 0.67 * 150Mi, rounded up
+    assert values_overlay(recommendation, "memory") == {
+        "resources": {"requests": {"memory": "150Mi"}, "limits": {"memory": "150Mi"}},
+        "kedaConfig": {"metricType": "memory", "metricValue": "101Mi"},
+    }
+
+
+def test_load_usage_file_reads_quantities(tmp_path):
+    path = tmp_path / "usage.csv"
+    path.write_text("pod,cpu,memory\nweb-1,250m,300Mi\nweb-2,0.5,\nweb-3,,1Gi\n")
+    cpu, memory = UsageHistogram(CPU_FIRST_BUCKET), UsageHistogram(MEMORY_FIRST_BUCKET)
+
+    assert load_usage_file(str(path), cpu, memory) == 3
+    assert (cpu.total, cpu.max) == (2, 0.5)
+    assert (memory.total, memory.max) == (2, 1024 * MI)
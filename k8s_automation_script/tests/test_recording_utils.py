@@ -0,0 +1,67 @@
+import os
+import glob
+import time
+
+from recording_utils import ScalingRecorder, load_recording
+
+
+def _scaled_object(name: str, active: bool = True):
+    return {
+        "metadata": {"name": name, "namespace": "apps"},
+        "spec": {"scaleTargetRef": {"name": name}},
+        "status": {"conditions": [{"type": "Ready", "status": "True"}, {"type": "Active", "status": str(active)}]},
+    }
+
+
+def _chunks(directory):
+    return sorted(glob.glob(os.path.join(directory, "scaling-*.npz")))
+
+
+def _wait_for_chunks(directory, count: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while len(_chunks(directory)) < count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return _chunks(directory)
+
+
+def test_flushes_a_chunk_every_flush_rows_events(tmp_path):
+    recorder = ScalingRecorder(str(tmp_path), flush_rows=3, flush_interval=60).start()
+    try:
+        for name in ("web", "api", "web"):
+            recorder.record("ScaledObject", "MODIFIED", _scaled_object(name))
+        assert len(_wait_for_chunks(tmp_path, 1)) == 1 # Long before the 60s interval
+        recorder.record("ScaledObject", "DELETED", _scaled_object("web")) # Not recorded
+    finally:
+        recorder.close()
+
+    recording = load_recording(str(tmp_path))
+    assert recording["object"].tolist() == ["apps/web", "apps/api", "apps/web"]
+    assert recording["kind"].tolist() == ["ScaledObject"] * 3
+    assert recording["active"].tolist() == [1, 1, 1]
+    assert recorder.chunks == 1
+
+
+def test_flushes_what_is_buffered_every_flush_interval(tmp_path):
+    recorder = ScalingRecorder(str(tmp_path), flush_rows=1000, flush_interval=0.1).start()
+    try:
+        recorder.record("ScaledObject", "ADDED", _scaled_object("web", active=False))
+        assert len(_wait_for_chunks(tmp_path, 1)) == 1
+    finally:
+        recorder.close()
+
+    assert load_recording(str(tmp_path))["active"].tolist() == [0]
+
+
+def test_oldest_chunks_are_deleted_past_max_bytes(tmp_path):
+    recorder = ScalingRecorder(str(tmp_path)) # Flushed by hand rather than by the thread
+    recorder.record("ScaledObject", "ADDED", _scaled_object("app-0"))
+    recorder._flush()
+    chunk_size = os.path.getsize(_chunks(tmp_path)[0])
+    recorder.max_bytes = int(2.5 * chunk_size) # Room for two chunks
+
+    for index in range(1, 4):
+        recorder.record("ScaledObject", "ADDED", _scaled_object(f"app-{index}"))
+        recorder._flush()
+
+    assert len(_chunks(tmp_path)) == 2
+    assert load_recording(str(tmp_path))["object"].tolist() == ["apps/app-2", "apps/app-3"]
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+import yaml
+
+from defaults import DEFAULT_CHART_PATH
+from render_utils import render_chart, diff_manifests
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "render")
+
+# fixture name -> (release, namespace). Each <name>.yaml is the output of
+#     helm template <release> charts/my-app-chart --namespace <namespace> -f <name>.values.yaml --skip-tests
+# with the Helm version noted in fixtures/render/README.md. Regenerate them whenever the chart templates change.
+GOLDEN_CASES = {
+    "cpu": ("web", "default"),
+    "memory": ("my-app-chart-api", "apps"), # Release name contains the chart name, so it is the full name
+    "kafka-ingress": ("orders", "streaming"), # Event source config, pod annotations, ingress with TLS
+    "overrides": ("checkout", "shop"), # fullnameOverride truncated onto '--', nameOverride, no service account
+}
+
+
+def _load_yaml(name: str, all_documents: bool = False):
+    with open(os.path.join(FIXTURES, name)) as fixture:
+        if all_documents:
+            return [document for document in yaml.safe_load_all(fixture) if document]
+        return yaml.safe_load(fixture)
+
+
+@pytest.mark.parametrize("case", sorted(GOLDEN_CASES))
+def test_render_chart_matches_helm_template(case):
+    release_name, namespace = GOLDEN_CASES[case]
+    helm_values = _load_yaml(f"{case}.values.yaml")
+
+    native = render_chart(release_name, namespace, DEFAULT_CHART_PATH, helm_values)
+
+    assert diff_manifests(_load_yaml(f"{case}.yaml", all_documents=True), native) == []
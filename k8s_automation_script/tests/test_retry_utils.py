@@ -0,0 +1,92 @@
+import time
+from types import SimpleNamespace
+from email.utils import formatdate
+
+import pytest
+from kubernetes.client import ApiException
+
+import retry_utils
+from retry_utils import RateLimiter, install_retries, retry_after_seconds
+
+URL = "https://host/apis/apps/v1/namespaces/apps/deployments"
+
+
+def test_burst_then_qps():
+    rate_limiter = RateLimiter(qps=10, burst=2)
+
+    delays = [rate_limiter.reserve() for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2:] == pytest.approx([0.1, 0.2], abs=0.01) # Queued behind each other
+
+
+def test_rate_halves_on_429_and_recovers_on_success():
+    rate_limiter = RateLimiter(qps=10, burst=1)
+
+    rates = []
+    for _ in range(5):
+        rate_limiter.throttled()
+        rates.append(rate_limiter.rate)
+    assert rates == [5, 2.5, 1.25, 1.0, 1.0] # Never below a tenth of qps
+
+    for _ in range(50):
+        rate_limiter.succeeded()
+    assert rate_limiter.rate == pytest.approx(6.0) # qps / 100 per success
+    for _ in range(100):
+        rate_limiter.succeeded()
+    assert rate_limiter.rate == 10
+
+
+def test_zero_qps_turns_the_limiter_off():
+    rate_limiter = RateLimiter(qps=0)
+
+    assert [rate_limiter.reserve() for _ in range(1000)] == [0.0] * 1000
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "3"}, 3.0),
+    ({"Retry-After": "0.5"}, 0.5),
+    ({"Retry-After": "-1"}, 0.0),
+    ({"Retry-After": "soon"}, None),
+    ({}, None),
+    (None, None),
+])
+def test_retry_after_seconds(headers, expected):
+    assert retry_after_seconds(SimpleNamespace(headers=headers)) == expected
+
+
+def test_retry_after_as_an_http_date():
+    later = SimpleNamespace(headers={"Retry-After": formatdate(time.time() + 30, usegmt=True)})
+    earlier = SimpleNamespace(headers={"Retry-After": formatdate(time.time() - 30, usegmt=True)})
+
+    assert retry_after_seconds(later) == pytest.approx(30, abs=2)
+    assert retry_after_seconds(earlier) == 0.0
+
+
+def test_retry_after_of_an_api_exception_and_a_urllib3_response():
+    exception = ApiException(status=429, reason="Too Many Requests")
+    exception.headers = {"Retry-After": "2"}
+    urllib3_response = SimpleNamespace(getheaders=lambda: {"Retry-After": "4"})
+
+    assert retry_after_seconds(exception) == 2.0
+    assert retry_after_seconds(urllib3_response) == 4.0
+
+
+def test_429_is_retried_after_retry_after_and_slows_the_limiter(monkeypatch):
+    responses = [
+        SimpleNamespace(status=429, headers={"Retry-After": "2"}),
+        SimpleNamespace(status=429, headers={"Retry-After": "1"}),
+        SimpleNamespace(status=200, headers={}),
+    ]
+    api_client = SimpleNamespace(rest_client=SimpleNamespace(request=lambda method, url, **kwargs: responses.pop(0)))
+    rate_limiter = RateLimiter(qps=10, burst=100)
+    install_retries(api_client, rate_limiter)
+    sleeps = []
+    monkeypatch.setattr(retry_utils.time, "sleep", sleeps.append)
+    monkeypatch.setattr(retry_utils.random, "uniform", lambda low, high: low) # No jitter
+
+    response = api_client.rest_client.request("GET", URL)
+
+    assert response.status == 200
+    assert sleeps == [2.0, 1.0] # The server's Retry-After, not the exponential backoff
+    assert rate_limiter.rate == pytest.approx(10 / 4 + 10 / 100) # Halved twice, then one success
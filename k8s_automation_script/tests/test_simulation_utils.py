@@ -0,0 +1,63 @@
+import numpy as np
+
+from simulation_utils import DEFAULT_SCALE_DOWN_POLICIES, DEFAULT_SCALE_UP_POLICIES, simulate_replicas
+
+SYNC_PERIOD = 15
+
+
+def _spec(**overrides):
+    """The HPA defaults, with a target of 10 per replica."""
+    spec = dict(
+        name="web", metric_type="cpu", target=10.0, min_replicas=1, max_replicas=200, cooldown_period=300,
+        scale_up_window=0, scale_down_window=300, scale_up_policies=DEFAULT_SCALE_UP_POLICIES, scale_up_select="Max",
+        scale_down_policies=DEFAULT_SCALE_DOWN_POLICIES, scale_down_select="Max", triggers=1,
+    )
+    spec.update(overrides)
+    return spec
+
+
+def _replicas(times, values, spec):
+    return simulate_replicas(times, values, spec, sync_period=SYNC_PERIOD)["replicas"].tolist()
+
+
+def test_scale_down_waits_for_the_stabilization_window():
+    times = np.arange(0, 1201, SYNC_PERIOD, dtype=float)
+    result = simulate_replicas(times, np.where(times < 300, 100, 10), _spec(), sync_period=SYNC_PERIOD)
+
+    replicas = dict(zip(result["time"].tolist(), result["replicas"].tolist()))
+    # The last recommendation of 10 was at 285s, so it is the highest in the 300s window until 600s
+    assert {replicas[time] for time in range(0, 600, SYNC_PERIOD)} == {10}
+    assert replicas[600] == 1
+
+
+def test_scale_up_stabilization_window_ignores_a_short_spike():
+    times = np.arange(0, 301, SYNC_PERIOD, dtype=float)
+    spike = np.where(times == 150, 100, 10)
+
+    assert set(_replicas(times, spike, _spec(scale_up_window=60))) == {1}
+    assert _replicas(times, spike, _spec())[10:] == [5] * 11 # Without a window the spike scales up; it is the 5-pod policy limit
+
+
+def test_scale_up_is_bounded_by_the_policies():
+    times = np.arange(0, 121, SYNC_PERIOD, dtype=float)
+    surge = np.where(times == 0, 10, 1000) # 100 replicas needed from 15s on
+
+    # Default policies, selectPolicy Max: the larger of +4 pods and +100% per 15 seconds
+    assert _replicas(times, surge, _spec()) == [1, 5, 10, 20, 40, 80, 100, 100, 100]
+    # selectPolicy Min: the smaller of the two
+    assert _replicas(times, surge, _spec(scale_up_select="Min")) == [1, 2, 4, 8, 12, 16, 20, 24, 28]
+    assert set(_replicas(times, surge, _spec(scale_up_select="Disabled"))) == {1}
+
+
+def test_scales_to_zero_after_the_cooldown_and_back_on_activity():
+    times = np.arange(0, 901, SYNC_PERIOD, dtype=float)
+    load = np.where((times < 150) | (times >= 600), 50, 0)
+
+    result = simulate_replicas(times, load, _spec(min_replicas=0, cooldown_period=60), sync_period=SYNC_PERIOD)
+
+    replicas = dict(zip(result["time"].tolist(), result["replicas"].tolist()))
+    # Last active at 135s: KEDA scales to zero at 195s, without waiting out the HPA's 300s scale-down window
+    assert {replicas[time] for time in range(0, 195, SYNC_PERIOD)} == {5}
+    assert {replicas[time] for time in range(195, 600, SYNC_PERIOD)} == {0}
+    assert replicas[600] == 4 # Activation, limited by the +4 pods policy
+    assert replicas[615] == 5
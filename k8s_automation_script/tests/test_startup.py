@@ -0,0 +1,31 @@
+import os
+import sys
+import statistics
+import subprocess
+
+import pytest
+
+from startup_benchmark import DEFAULT_BUDGET_MS, DEFAULT_FORBIDDEN, CLI_PATH, measure
+
+# Cold starts of the CLI, each in a fresh interpreter: help output has to stay within the start-up
+# budget and must not import the Kubernetes client or the other heavy packages.
+
+
+@pytest.mark.parametrize("args", [["--help"], ["get-status", "--help"], ["create-deployment", "--help"]])
+def test_help_starts_within_budget(args):
+    runs = [measure(args) for _ in range(3)]
+    imported = sorted(set(DEFAULT_FORBIDDEN) & set(runs[-1][1]))
+    assert imported == []
+    assert statistics.median(wall for wall, _ in runs) * 1000 < DEFAULT_BUDGET_MS
+
+
+def test_importing_the_cli_leaves_kubernetes_unimported():
+    check = (
+        "import sys; import k8s_automation; "
+        f"print(','.join(sorted(set({DEFAULT_FORBIDDEN!r}) & set(sys.modules))))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check], cwd=os.path.dirname(CLI_PATH),
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == ""
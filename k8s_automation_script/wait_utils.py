@@ -0,0 +1,164 @@
+import time
+import asyncio
+import logging
+
+import aiohttp
+from kubernetes_asyncio import client, watch
+
+from async_client_utils import AsyncClientContext
+from metrics_utils import RETRIES, ROLLOUT_DURATION
+
+DEFAULT_WAIT_TIMEOUT = 300 # Seconds
+DEFAULT_SCALED_OBJECT_TIMEOUT = 60 # Seconds KEDA gets to report a ScaledObject, so a slow or missing CRD can't hold up a rollout
+
+
+async def wait_for_workload(
+    client_context: AsyncClientContext,
+    namespace: str,
+    deployment_name: str,
+    scaled_object_name: str = None,
+    timeout: float = DEFAULT_WAIT_TIMEOUT,
+    scaled_object_timeout: float = DEFAULT_SCALED_OBJECT_TIMEOUT
+):
+    """
+    Waits for a Deployment rollout and, optionally, for KEDA to reconcile its ScaledObject.
+    Both watches start at the same time. The Deployment result decides on its own: a failed or
+    timed-out rollout returns at once, and the ScaledObject wait never holds up or fails a rollout
+    that is ready. The ScaledObject gets at most scaled_object_timeout seconds (within timeout).
+    Returns a dict with 'deployment_ready' and 'scaled_object_ready' (None when not checked or not reported in time).
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    scaled_object_task = None
+    if scaled_object_name:
+        scaled_object_task = asyncio.create_task(wait_for_scaled_object(
+            client_context.custom_objects, scaled_object_name, namespace, min(deadline, started + scaled_object_timeout)
+        ))
+    try:
+        deployment_ready = await wait_for_deployment(client_context.apps_v1, deployment_name, namespace, deadline)
+        scaled_object_ready = None
+        if deployment_ready and scaled_object_task:
+            try:
+                scaled_object_ready = await scaled_object_task
+            except Exception as e: # e.g. 404 when the KEDA CRDs aren't installed
+                logging.warning("Could not check ScaledObject '%s': %s", scaled_object_name, e)
+        return {"deployment_ready": deployment_ready, "scaled_object_ready": scaled_object_ready}
+    finally:
+        if scaled_object_task and not scaled_object_task.done():
+            scaled_object_task.cancel()
+
+
+async def wait_for_deployment(apps_v1: client.AppsV1Api, name: str, namespace: str, deadline: float):
+    """
+    Returns True as soon as the Deployment has rolled out (same checks as 'kubectl rollout status'),
+    False if it exceeded its progress deadline, and None if our own deadline passed first.
+    """
+    def rollout_state(event_type, deployment):
+        if event_type == "DELETED":
+            return None
+        return _deployment_rollout_state(deployment)
+
+    started = time.monotonic()
+    result = await _watch_until(
+        apps_v1.list_namespaced_deployment, rollout_state, deadline,
+        namespace=namespace, field_selector=f"metadata.name={name}"
+    )
+    ROLLOUT_DURATION.labels({True: "ready", False: "failed", None: "timeout"}[result]).observe(time.monotonic() - started)
+    if result is None:
+        logging.warning("Timed out waiting for deployment '%s' in namespace '%s' to become ready.", name, namespace)
+    elif result is False:
+        logging.error("Deployment '%s' in namespace '%s' exceeded its progress deadline.", name, namespace)
+    return result
+
+
+async def wait_for_scaled_object(custom_api: client.CustomObjectsApi, name: str, namespace: str, deadline: float):
+    """
+    Returns the ScaledObject's Ready condition (True/False) as soon as KEDA reports one,
+    or None if the deadline passes while it is still missing or Unknown.
+    """
+    def ready_state(event_type, scaled_object):
+        if event_type == "DELETED":
+            return None
+        for condition in (scaled_object.get("status") or {}).get("conditions") or []:
+            if condition.get("type") == "Ready" and condition.get("status") in ("True", "False"):
+                return condition["status"] == "True"
+        return None
+
+    result = await _watch_until(
+        custom_api.list_namespaced_custom_object, ready_state, deadline,
+        group="keda.sh", version="v1alpha1", plural="scaledobjects",
+        namespace=namespace, field_selector=f"metadata.name={name}"
+    )
+    if result is None:
+        logging.warning("Timed out waiting for KEDA to report the status of ScaledObject '%s'.", name)
+    elif result is False:
+        logging.warning("ScaledObject '%s' is not ready. Check the KEDA operator logs.", name)
+    return result
+
+
+async def _watch_until(list_func, predicate, deadline: float, **list_kwargs):
+    """
+    Streams watch events from list_func until predicate(event_type, obj) returns something other than None.
+
+    A watch without a resourceVersion starts with an ADDED event for every existing object, so the
+    current state is checked first without a separate GET. When the server closes the stream the
+    watch resumes from the last resourceVersion it saw; on 410 Gone it starts over from a fresh list.
+    """
+    resource_version = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+
+        kwargs = dict(list_kwargs)
+        kwargs["timeout_seconds"] = max(1, int(remaining))
+        kwargs["_request_timeout"] = remaining + 5
+        if resource_version:
+            kwargs["resource_version"] = resource_version
+
+        try:
+            async with watch.Watch().stream(list_func, **kwargs) as stream:
+                async for event in stream:
+                    obj = event["object"]
+                    resource_version = _resource_version(obj) or resource_version
+                    result = predicate(event["type"], obj)
+                    if result is not None:
+                        return result
+                    if time.monotonic() >= deadline:
+                        return None
+        except client.ApiException as e:
+            # An ERROR event or a refused watch; usually 410 Gone: our resourceVersion is too old, start from a fresh list
+            if e.status != 410:
+                raise
+            RETRIES.labels("watch").inc()
+            resource_version = None
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            # The connection went quiet or was dropped; reconnect if there is time left
+            RETRIES.labels("watch").inc()
+
+
+def _resource_version(obj):
+    if isinstance(obj, dict):
+        return (obj.get("metadata") or {}).get("resourceVersion")
+    return obj.metadata.resource_version if obj.metadata else None
+
+
+def _deployment_rollout_state(deployment: client.V1Deployment):
+    status = deployment.status
+    if status is None or (status.observed_generation or 0) < (deployment.metadata.generation or 0):
+        return None
+
+    for condition in status.conditions or []:
+        if condition.type == "Progressing" and condition.reason == "ProgressDeadlineExceeded":
+            return False
+
+    desired = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+    updated = status.updated_replicas or 0
+    if updated < desired:
+        return None
+    if (status.replicas or 0) > updated: # Old replicas are still terminating
+        return None
+    if (status.available_replicas or 0) < updated:
+        return None
+    return True
+